@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import secrets
+import time
+import zlib
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api.executors import run_io
+from api.metrics import stage, timed
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class CacheBackendSettings(BaseSettings):
+    CACHE_BACKEND: str = "postgres"  # Shared cache behind the in-process one: "postgres" or "redis"
+    CACHE_COMPRESSION_LEVEL: int = 6  # zlib level of the values stored in Redis
+    CACHE_LOCK_TIMEOUT_SECONDS: float = 30.0  # Longest wait for another process to finish the same build (Redis)
+    CACHE_LOCK_TTL_SECONDS: float = 60.0  # Expiry of a Redis build lock, so a crashed holder cannot keep it
+    CACHE_LOCK_POLL_SECONDS: float = 0.05
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = CacheBackendSettings()
+
+class CacheBackend:
+    """
+    The cache shared by every worker, holding serialized timetable responses.
+
+    Entries are keyed by the content hash of the draft, the class and the timetable type,
+    so an entry is valid for as long as it exists and a lookup never reads the draft.
+    Lookups that fail are logged and treated as misses.
+    """
+
+    name = "none"
+
+    async def start(self):
+        """Connect to the cache. Called once at application startup."""
+
+    async def close(self):
+        """Disconnect from the cache. Called once at application shutdown."""
+
+    async def get(self, filename: str, class_pattern: str, is_exam: bool, content_hash: str) -> bytes | None:
+        """Get a serialized timetable response, or None on a miss."""
+        raise NotImplementedError
+
+    async def get_many(self, filename: str, classes: list, content_hash: str) -> dict:
+        """
+        Get the responses of many (class_pattern, is_exam) pairs of one draft in one round trip.
+
+        Returns the response of every pair that was found, keyed by the pair.
+        """
+        raise NotImplementedError
+
+    async def add(self, body: bytes, filename: str, class_pattern: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        """Add a serialized timetable response."""
+        raise NotImplementedError
+
+    async def add_many(self, tables: list, filename: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        """Add the (class_pattern, body) responses of many classes of one draft in one round trip."""
+        raise NotImplementedError
+
+    def lock(self, key: str):
+        """
+        Hold the build lock of a key across every process sharing the cache, as an async context manager.
+
+        If the lock cannot be taken (the cache is unavailable or the holder takes too long)
+        the block runs anyway, trading a duplicate build for availability. Yields whether
+        the lock is held.
+        """
+        raise NotImplementedError
+
+def _database():
+    # psycopg2 loads when the backend is first used, not when the app starts
+    from api.config import database
+
+    return database
+
+class PostgresCacheBackend(CacheBackend):
+    """The `timetable_cache` table, through the shared connection pool."""
+
+    name = "postgres"
+
+    async def start(self):
+        await run_io(_database().init_db_pool)
+        await run_io(_database().create_cache_table)
+
+    async def close(self):
+        await run_io(_database().close_db_pool)
+
+    @timed("l2_get")
+    async def get(self, filename: str, class_pattern: str, is_exam: bool, content_hash: str) -> bytes | None:
+        cached = await run_io(_database().get_table_from_cache, filename, class_pattern, is_exam, content_hash)
+        return None if cached is None else cached.encode("utf-8")
+
+    @timed("l2_get")
+    async def get_many(self, filename: str, classes: list, content_hash: str) -> dict:
+        cached = await run_io(_database().get_tables_from_cache, filename, classes, content_hash)
+        return {pair: table.encode("utf-8") for pair, table in cached.items()}
+
+    @timed("l2_set")
+    async def add(self, body: bytes, filename: str, class_pattern: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        await run_io(_database().add_table_to_cache, body.decode("utf-8"), filename, class_pattern, is_exam, content_hash, expire_seconds)
+
+    @timed("l2_set")
+    async def add_many(self, tables: list, filename: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        tables = [(class_pattern, body.decode("utf-8")) for class_pattern, body in tables]
+        await run_io(_database().add_tables_to_cache, tables, filename, is_exam, content_hash, expire_seconds)
+
+    def lock(self, key: str):
+        from api.cache.singleflight import distributed_lock
+
+        return distributed_lock(key)
+
+# Deletes a lock only while it still holds the token of its holder, so an expired lock taken over by another process is left alone
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis through `redis.asyncio` and an explicit connection pool, with zlib-compressed values.
+
+    Keys hold only the content hash, class and type, so drafts with the same content share
+    their entries. Until `start` has connected, every lookup is a miss and no build lock is
+    taken.
+    """
+
+    name = "redis"
+
+    def __init__(self, compression_level: int = 6):
+        self.compression_level = compression_level
+        self._client = None
+        self._errors = ()
+
+    async def start(self):
+        import redis.asyncio as redis
+
+        from api.config.redis_config import create_redis_pool
+
+        client = redis.Redis(connection_pool=create_redis_pool())
+        await client.ping()
+        self._client = client
+        self._errors = (redis.RedisError, zlib.error)
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose(close_connection_pool=True)
+
+    @staticmethod
+    def cache_key(class_pattern: str, is_exam: bool, content_hash: str) -> str:
+        return f"timetable:{content_hash}:{class_pattern.replace(' ', '')}:{'exam' if is_exam else 'lecture'}"
+
+    @timed("l2_get")
+    async def get(self, filename: str, class_pattern: str, is_exam: bool, content_hash: str) -> bytes | None:
+        if self._client is None:
+            return None
+        try:
+            value = await self._client.get(self.cache_key(class_pattern, is_exam, content_hash))
+            return None if value is None else zlib.decompress(value)
+        except self._errors as e:
+            logger.error(f"Error retrieving from Redis: {e}")
+            return None
+
+    @timed("l2_get")
+    async def get_many(self, filename: str, classes: list, content_hash: str) -> dict:
+        if self._client is None or not classes:
+            return {}
+        try:
+            values = await self._client.mget([self.cache_key(class_pattern, is_exam, content_hash) for class_pattern, is_exam in classes])
+            return {pair: zlib.decompress(value) for pair, value in zip(classes, values) if value is not None}
+        except self._errors as e:
+            logger.error(f"Error retrieving many from Redis: {e}")
+            return {}
+
+    async def add(self, body: bytes, filename: str, class_pattern: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        await self.add_many([(class_pattern, body)], filename, is_exam, content_hash, expire_seconds)
+
+    @timed("l2_set")
+    async def add_many(self, tables: list, filename: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+        if self._client is None or not tables:
+            return
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                for class_pattern, body in tables:
+                    value = zlib.compress(body, self.compression_level)
+                    pipe.set(self.cache_key(class_pattern, is_exam, content_hash), value, ex=expire_seconds)
+                await pipe.execute()
+        except self._errors as e:
+            logger.error(f"Error adding to Redis: {e}")
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """A `SET NX PX` lock holding a random token, deleted on release only if it still holds that token."""
+        name = f"lock:{key}"
+        token = secrets.token_hex(16)
+        locked = False
+        if self._client is not None:
+            try:
+                with stage("lock"):
+                    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_SECONDS
+                    ttl = int(settings.CACHE_LOCK_TTL_SECONDS * 1000)
+                    while not (locked := bool(await self._client.set(name, token, nx=True, px=ttl))):
+                        if time.monotonic() >= deadline:
+                            logger.error(f"Timed out waiting for lock {key}")
+                            break
+                        await asyncio.sleep(settings.CACHE_LOCK_POLL_SECONDS)
+            except self._errors as e:
+                logger.error(f"Error acquiring lock {key} in Redis: {e}")
+
+        try:
+            yield locked
+        finally:
+            if locked:
+                try:
+                    await self._client.eval(_RELEASE_LOCK_SCRIPT, 1, name, token)
+                except self._errors as e:
+                    # The lock expires on its own
+                    logger.error(f"Error releasing lock {key} in Redis: {e}")
+
+def create_cache_backend(name: str = settings.CACHE_BACKEND) -> CacheBackend:
+    """Create the cache backend selected by CACHE_BACKEND, without connecting to it."""
+    if name == "postgres":
+        return PostgresCacheBackend()
+    if name == "redis":
+        return RedisCacheBackend(settings.CACHE_COMPRESSION_LEVEL)
+    raise ValueError(f"Unknown cache backend: {name}")
+
+# The shared cache tier of this process
+cache_backend = create_cache_backend()
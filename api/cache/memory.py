@@ -0,0 +1,132 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+load_dotenv()
+
+class MemoryCacheSettings(BaseSettings):
+    L1_MAX_BYTES: int = 64 * 1024 * 1024
+    L1_TTL_SECONDS: float = 600.0
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = MemoryCacheSettings()
+
+class CacheStats:
+    """Hit, miss and eviction counters of a cache tier."""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "tier": self.tier,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+def estimate_size(value) -> int:
+    """Estimate the memory held by a response object, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache with a time-to-live.
+
+    Keys are tuples whose first two items are the draft name and its content hash, so
+    every entry of a draft can be dropped when a new version of it is seen. Entries are
+    evicted oldest-first once the estimated size of all values exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, tier: str = "l1"):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats(tier)
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key):
+        """Get a value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value, size: int | None = None):
+        """Store a value, evicting the least recently used entries to stay within `max_bytes`."""
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def track_version(self, name: str, content_hash: str):
+        """Record the current content hash of a draft, dropping the entries of its older versions."""
+        with self._lock:
+            previous = self._versions.get(name)
+            if previous == content_hash:
+                return
+            self._versions[name] = content_hash
+            if previous is None:
+                return
+            for key in [k for k in self._entries if k[0] == name and k[1] != content_hash]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+# Fully shaped timetable responses, keyed by (draft, content hash, class, is_exam)
+response_cache = LRUCache(settings.L1_MAX_BYTES, settings.L1_TTL_SECONDS)
@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api.extract.content_hash import file_content_hash
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "drafts"
+
+class RegistrySettings(BaseSettings):
+    DRAFTS_WATCH: bool = True  # Watch the drafts folder with inotify instead of stat-ing drafts per request
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = RegistrySettings()
+
+def file_signature(stat: os.stat_result) -> tuple:
+    """The (inode, size, mtime_ns) signature of a file, which changes whenever the file is replaced or written."""
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+class DraftRegistry:
+    """
+    The content hash of every draft, re-hashed only when the file's stat signature changes.
+
+    While the drafts folder is watched, hashes are served from memory without touching the
+    file and the watcher thread re-hashes a draft as soon as it is written. Otherwise every
+    lookup costs one `os.stat` and a draft is only read again when its signature changed.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.watching = False
+        self.hashes_computed = 0
+        self._observer = None
+
+    def peek(self, path: str) -> str | None:
+        """
+        Get the content hash of a draft without reading it, or None if the draft must be re-hashed.
+
+        Raises FileNotFoundError if the draft does not exist.
+        """
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if self.watching and entry is not None:
+            return entry[1]
+        signature = file_signature(os.stat(path))
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        return None
+
+    def content_hash(self, path: str) -> str:
+        """Get the content hash of a draft, hashing it only if it changed since it was last seen."""
+        path = os.path.abspath(path)
+        content_hash = self.peek(path)
+        if content_hash is not None:
+            return content_hash
+        return self._hash_if_changed(path)
+
+    def _hash_if_changed(self, path: str) -> str:
+        with self._lock:
+            signature = file_signature(os.stat(path))
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+            content_hash = file_content_hash(path)
+            # the file may have been written while it was read, keep the signature from before the read
+            self._entries[path] = (signature, content_hash)
+            self.hashes_computed += 1
+            return content_hash
+
+    def invalidate(self, path: str):
+        """Forget the hash of a draft so the next lookup stats and re-hashes it."""
+        self._entries.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def start_watching(self, folder: Path = DRAFTS_FOLDER) -> bool:
+        """
+        Watch the drafts folder with inotify and re-hash drafts as soon as they are written.
+
+        Returns False, leaving lookups to stat every draft, if watchdog is not installed or
+        the folder cannot be watched.
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.error("watchdog is not installed, checking drafts for changes on every request")
+            return False
+
+        registry = self
+
+        class DraftEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path and path.endswith(".xlsx"):
+                        registry._refresh(path)
+
+        try:
+            observer = Observer()
+            observer.schedule(DraftEventHandler(), str(folder), recursive=False)
+            observer.start()
+        except Exception as e:
+            logger.error(f"Error watching drafts, checking drafts for changes on every request: {e}")
+            return False
+
+        # drafts may have changed before the watch was set up
+        for path in list(self._entries):
+            self._refresh(path)
+        self._observer = observer
+        self.watching = True
+        return True
+
+    def stop_watching(self):
+        self.watching = False
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def _refresh(self, path: str):
+        """Re-hash a draft after a change event. Runs on the watcher thread."""
+        self.invalidate(path)
+        try:
+            self._hash_if_changed(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error hashing draft {path}: {e}")
+
+# Content hashes of the drafts served by this process, by absolute path
+draft_registry = DraftRegistry()
@@ -0,0 +1,317 @@
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api.cache.memory import CacheStats
+from api.metrics import stage
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class SharedStoreSettings(BaseSettings):
+    SHARED_STORE_ENABLED: bool = True  # Share built responses and parses between the workers of a host
+    SHARED_STORE_MAX_BYTES: int = 64 * 1024 * 1024  # Capacity of the store of one draft version, allocated as it fills
+    SHARED_STORE_OPEN_FILES: int = 8  # Stores kept mapped by each worker
+    SHARED_STORE_BUILD_WAIT_SECONDS: float = 30.0  # Longest wait for another worker's parse before parsing anyway
+    SHARED_STORE_POLL_SECONDS: float = 0.05
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = SharedStoreSettings()
+
+# Next to the workbook snapshots, so the warm-up deletes both for replaced drafts
+STORE_FOLDER = ".snapshots"
+STORE_SUFFIX = ".wbr"
+LOCK_SUFFIX = ".lock"
+
+STORE_MAGIC = b"WBRS"
+STORE_VERSION = 1
+
+# magic, version, generation, end of the last record
+_HEADER = struct.Struct("<4sIQQ")
+_GENERATION_OFFSET = 8
+_END_OFFSET = 16
+_FIELD = struct.Struct("<Q")
+
+# key length, body length, followed by the key and the body
+_RECORD = struct.Struct("<II")
+
+def store_path(draft_path: str, content_hash: str, suffix: str = STORE_SUFFIX) -> Path:
+    """The path of the shared store (or build lock) of a draft version, next to the draft."""
+    return Path(draft_path).parent / STORE_FOLDER / f"{content_hash}{suffix}"
+
+def store_key(class_pattern: str, is_exam: bool) -> str:
+    kind = "exam" if is_exam else "lecture"
+    return f"{kind}:{class_pattern.replace(' ', '')}"
+
+class ResponseFile:
+    """
+    The serialized responses of one draft version, appended to a memory-mapped file.
+
+    The header holds a generation counter that every append increments after its records
+    are written, so a reader only indexes the file again when the generation changed.
+    Appends take an exclusive `flock` on the file; reads take no lock.
+
+    Records are written with `pwrite` rather than through the map, so a full disk fails the
+    append with an OSError instead of killing the worker with a SIGBUS.
+    """
+
+    def __init__(self, path: Path, buffer: mmap.mmap, inode: int):
+        self.path = path
+        self.inode = inode
+        self.generation = 0
+        self._buffer = buffer
+        self._entries = {}
+        self._indexed = _HEADER.size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: Path, capacity: int, create: bool) -> "ResponseFile | None":
+        """Map a store, creating it if asked to. Returns None if it does not exist or is not initialized yet."""
+        if create:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+        except FileNotFoundError:
+            return None
+
+        try:
+            if create:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size == 0:
+                    # A sparse file, so only the pages holding responses use disk and memory
+                    os.ftruncate(fd, capacity)
+                    os.pwrite(fd, _HEADER.pack(STORE_MAGIC, STORE_VERSION, 0, _HEADER.size), 0)
+                # The map shares the open file, so closing the descriptor would not release the lock
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            stat = os.fstat(fd)
+            if stat.st_size < _HEADER.size:
+                return None
+            buffer = mmap.mmap(fd, stat.st_size)
+        finally:
+            os.close(fd)
+
+        magic, version, _, _ = _HEADER.unpack_from(buffer)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            buffer.close()
+            return None
+        return cls(path, buffer, stat.st_ino)
+
+    def _index(self):
+        """Index the records appended since the last call. Must hold `_lock`."""
+        generation = _FIELD.unpack_from(self._buffer, _GENERATION_OFFSET)[0]
+        if generation == self.generation:
+            return
+        # The end is written before the generation, so every record before it is complete
+        end = _FIELD.unpack_from(self._buffer, _END_OFFSET)[0]
+        offset = self._indexed
+        while offset < end:
+            key_length, body_length = _RECORD.unpack_from(self._buffer, offset)
+            key_start = offset + _RECORD.size
+            body_start = key_start + key_length
+            self._entries[self._buffer[key_start:body_start].decode("utf-8")] = (body_start, body_length)
+            offset = body_start + body_length
+        self._indexed = offset
+        self.generation = generation
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            self._index()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        start, length = entry
+        return self._buffer[start : start + length]
+
+    def add_many(self, items: list) -> int | None:
+        """
+        Append the `(key, body)` pairs that are not in the store yet. Returns the number
+        appended, or None if the file was deleted and created again since it was mapped.
+        """
+        with open(self.path, "rb+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_ino != self.inode:
+                return None
+            with self._lock:
+                self._index()
+                end = self._indexed
+                added = {}
+                for key, body in items:
+                    if key in self._entries or key in added:
+                        continue
+                    encoded = key.encode("utf-8")
+                    body_start = end + _RECORD.size + len(encoded)
+                    if body_start + len(body) > len(self._buffer):
+                        logger.error(f"Shared store {self.path} is full, {len(items) - len(added)} responses not shared")
+                        break
+                    os.pwrite(f.fileno(), _RECORD.pack(len(encoded), len(body)) + encoded + body, end)
+                    added[key] = (body_start, len(body))
+                    end = body_start + len(body)
+
+                # Records are only indexed once they are all written, so a failed append publishes none of them
+                if added:
+                    _FIELD.pack_into(self._buffer, _END_OFFSET, end)
+                    _FIELD.pack_into(self._buffer, _GENERATION_OFFSET, self.generation + 1)
+                    self._entries.update(added)
+                    self._indexed = end
+                    self.generation += 1
+        return len(added)
+
+class SharedResponseStore:
+    """
+    The serialized timetable responses of every draft version, shared by the workers of a host.
+
+    Each content hash has its own memory-mapped file, so every worker reads the same
+    pages of the page cache and a response built by one worker is served by the others
+    without a round trip to the shared cache. Each worker keeps the most recently used
+    stores mapped.
+
+    Reads and appends only touch the page cache, and the file lock is held for the few
+    microseconds of an append, so the store is used from the event loop directly.
+    """
+
+    def __init__(self, capacity: int, max_open: int):
+        self.capacity = capacity
+        self.max_open = max_open
+        self.stats = CacheStats("shared")
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _file(self, draft_path: str, content_hash: str, create: bool) -> ResponseFile | None:
+        with self._lock:
+            file = self._files.get(content_hash)
+            if file is not None:
+                self._files.move_to_end(content_hash)
+                return file
+
+        file = ResponseFile.open(store_path(draft_path, content_hash), self.capacity, create)
+        if file is None:
+            return None
+        with self._lock:
+            file = self._files.setdefault(content_hash, file)
+            self._files.move_to_end(content_hash)
+            # Evicted maps are closed once no reader holds them any more
+            while len(self._files) > self.max_open:
+                self._files.popitem(last=False)
+        return file
+
+    def get(self, draft_path: str, class_pattern: str, is_exam: bool, content_hash: str) -> bytes | None:
+        """Get a serialized response, or None if no worker of this host stored it."""
+        if not settings.SHARED_STORE_ENABLED:
+            return None
+        try:
+            file = self._file(draft_path, content_hash, create=False)
+            body = file.get(store_key(class_pattern, is_exam)) if file is not None else None
+        except (OSError, ValueError, UnicodeDecodeError, struct.error) as e:
+            self.stats.errors += 1
+            logger.error(f"Error reading shared store of {content_hash}: {e}")
+            return None
+
+        if body is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return body
+
+    def add_many(self, tables: list, draft_path: str, is_exam: bool, content_hash: str) -> int:
+        """Store the `(class_pattern, body)` pairs of one timetable type. Returns the number stored."""
+        if not settings.SHARED_STORE_ENABLED or not tables:
+            return 0
+        items = [(store_key(class_pattern, is_exam), body) for class_pattern, body in tables]
+        try:
+            for _ in range(2):
+                file = self._file(draft_path, content_hash, create=True)
+                if file is None:
+                    return 0
+                added = file.add_many(items)
+                if added is not None:
+                    return added
+                # The store was pruned and created again, by the warm-up of another worker
+                with self._lock:
+                    if self._files.get(content_hash) is file:
+                        del self._files[content_hash]
+            return 0
+        except (OSError, ValueError, struct.error) as e:
+            self.stats.errors += 1
+            logger.error(f"Error writing shared store of {content_hash}: {e}")
+            return 0
+
+    def add(self, body: bytes, draft_path: str, class_pattern: str, is_exam: bool, content_hash: str) -> int:
+        return self.add_many([(class_pattern, body)], draft_path, is_exam, content_hash)
+
+    def prune(self, folder: Path, keep: set) -> list:
+        """Delete the stores and build locks of draft versions that are no longer kept, and forget their maps."""
+        removed = []
+        with self._lock:
+            for content_hash in [content_hash for content_hash in self._files if content_hash not in keep]:
+                del self._files[content_hash]
+
+        for suffix in (STORE_SUFFIX, LOCK_SUFFIX):
+            for path in (Path(folder) / STORE_FOLDER).glob(f"*{suffix}"):
+                if path.stem not in keep:
+                    try:
+                        path.unlink()
+                        removed.append(path)
+                    except OSError as e:
+                        logger.error(f"Error deleting shared store {path}: {e}")
+        return removed
+
+shared_store = SharedResponseStore(settings.SHARED_STORE_MAX_BYTES, settings.SHARED_STORE_OPEN_FILES)
+
+@asynccontextmanager
+async def build_lock(draft_path: str, content_hash: str):
+    """
+    Hold the lock of the workers of this host for building a draft version.
+
+    The lock is an `flock` on a file next to the draft, released when its holder closes it
+    or exits. Waiting polls without blocking the event loop. If the lock cannot be taken
+    in time the block runs anyway, trading a duplicate parse for availability. Yields
+    whether the lock is held.
+    """
+    if not settings.SHARED_STORE_ENABLED:
+        yield False
+        return
+
+    fd = None
+    try:
+        with stage("lock"):
+            path = store_path(draft_path, content_hash, LOCK_SUFFIX)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            deadline = time.monotonic() + settings.SHARED_STORE_BUILD_WAIT_SECONDS
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.error(f"Timed out waiting for the build lock of {content_hash}, building anyway")
+                        os.close(fd)
+                        fd = None
+                        break
+                    await asyncio.sleep(settings.SHARED_STORE_POLL_SECONDS)
+    except OSError as e:
+        logger.error(f"Error acquiring build lock of {content_hash}: {e}")
+        if fd is not None:
+            os.close(fd)
+            fd = None
+
+    try:
+        yield fd is not None
+    finally:
+        if fd is not None:
+            os.close(fd)
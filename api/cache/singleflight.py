@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from api.executors import run_io
+from api.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single call.
+
+    The first caller for a key starts the call as its own task and every caller that
+    arrives while it is running awaits that same task, so they all share its result (or
+    its exception). A caller that goes away does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def in_flight(self, key) -> bool:
+        """Whether a call for the key is currently running."""
+        return key in self._calls
+
+    async def do(self, key, func):
+        """Run `func()` once for all concurrent callers with the same key and return its result."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+@asynccontextmanager
+async def distributed_lock(key: str):
+    """
+    Hold a cross-process lock for the duration of the block.
+
+    The lock is a PostgreSQL advisory lock, so every worker and container sharing the
+    cache database agrees on a single builder. If the lock cannot be taken (the database
+    is unavailable or the holder takes too long) the block runs anyway, trading a
+    duplicate build for availability. Yields whether the lock is held.
+    """
+    # psycopg2 loads with the first build, not when the app starts
+    from api.config.database import acquire_advisory_lock, release_advisory_lock
+
+    conn = None
+    try:
+        with stage("lock"):
+            conn = await run_io(acquire_advisory_lock, key)
+    except Exception as e:
+        logger.error(f"Error acquiring build lock {key}: {e}")
+
+    try:
+        yield conn is not None
+    finally:
+        if conn is not None:
+            await run_io(release_advisory_lock, conn, key)
@@ -1,10 +1,17 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor, execute_values
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 import logging
+import threading
+import time
 import os
 
+from api.metrics import stage
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -15,6 +22,13 @@ class DatabaseSettings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
+    DB_POOL_MIN: int = 4  # Connections kept open between requests
+    DB_POOL_MAX: int = 10  # Connections open at the same time for queries, callers wait beyond this
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # Longest wait for a free connection before the query fails
+    DB_LOCK_POOL_MAX: int = 4  # Connections holding build locks, kept below IO_THREADS
+    DB_POOL_HEALTHCHECK_SECONDS: float = 30.0  # Idle time after which a connection is pinged before reuse
+    DB_LOCK_TIMEOUT_SECONDS: float = 30.0  # Longest wait for another process to finish the same build
+    DB_LOCK_POLL_SECONDS: float = 0.05
 
     class Config:
         env_file = ".env"
@@ -22,6 +36,34 @@ class DatabaseSettings(BaseSettings):
 
 settings = DatabaseSettings()
 
+PREPARED_STATEMENTS = {
+    "timetable_cache_get": """
+        PREPARE timetable_cache_get (text) AS
+        SELECT cache_data FROM timetable_cache
+        WHERE cache_key = $1 AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+    """,
+    "timetable_cache_put": """
+        PREPARE timetable_cache_put (text, text, text, timestamp) AS
+        INSERT INTO timetable_cache (cache_key, cache_data, hash_value, expires_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (cache_key)
+        DO UPDATE SET cache_data = EXCLUDED.cache_data, hash_value = EXCLUDED.hash_value, expires_at = EXCLUDED.expires_at
+    """,
+}
+
+class PooledConnection(psycopg2.extensions.connection):
+    """A connection that remembers its prepared statements and when it was last used."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = False
+        self.last_used = time.monotonic()
+
+_pool = None
+_pool_slots = None
+_lock_slots = None
+_pool_lock = threading.Lock()
+
 def get_db_connection():
     try:
         conn = psycopg2.connect(
@@ -37,52 +79,203 @@ def get_db_connection():
         logger.error(f"Error connecting to PostgreSQL: {e}")
         raise
 
-def create_cache_table():
-    """Create the cache table if it doesn't exist."""
+def init_db_pool():
+    """Create the connection pool. Called once at application startup."""
+    global _pool, _pool_slots, _lock_slots
+    with _pool_lock:
+        if _pool is not None:
+            return
+        try:
+            # The build locks have their own connections, so a lock holder always finds one for its queries
+            _pool = psycopg2.pool.ThreadedConnectionPool(
+                settings.DB_POOL_MIN,
+                settings.DB_POOL_MAX + settings.DB_LOCK_POOL_MAX,
+                host=settings.DB_HOST,
+                port=settings.DB_PORT,
+                database=settings.DB_NAME,
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                cursor_factory=RealDictCursor,
+                connection_factory=PooledConnection,
+            )
+        except psycopg2.Error as e:
+            logger.error(f"Error creating PostgreSQL connection pool: {e}")
+            raise
+        _pool_slots = threading.BoundedSemaphore(settings.DB_POOL_MAX)
+        _lock_slots = threading.BoundedSemaphore(settings.DB_LOCK_POOL_MAX)
+
+def close_db_pool():
+    """Close every pooled connection. Called once at application shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+def _is_healthy(conn) -> bool:
+    """Check a pooled connection before handing it out, pinging it if it sat idle for a while."""
+    if conn.closed:
+        return False
+    if time.monotonic() - conn.last_used < settings.DB_POOL_HEALTHCHECK_SECONDS:
+        return True
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS timetable_cache (
-            id SERIAL PRIMARY KEY,
-            cache_key VARCHAR(255) UNIQUE NOT NULL,
-            cache_data TEXT,
-            hash_value VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP
-        );
-        """
-        
-        cursor.execute(create_table_query)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _prepare(conn):
+    """Prepare the cache statements once per connection."""
+    if conn.prepared:
+        return
+    with conn.cursor() as cursor:
+        for statement in PREPARED_STATEMENTS.values():
+            cursor.execute(statement)
+    conn.commit()
+    conn.prepared = True
+
+@contextmanager
+def db_connection(prepare: bool = True):
+    """
+    Borrow a healthy connection from the pool, waiting for one if all of them are in use.
+
+    Raises `psycopg2.pool.PoolError` if none is free within DB_POOL_TIMEOUT_SECONDS. The
+    transaction is committed when the block exits normally and rolled back otherwise.
+    Connections that fail at the connection level are discarded instead of returned.
+    """
+    if _pool is None:
+        init_db_pool()
+
+    if not _pool_slots.acquire(timeout=settings.DB_POOL_TIMEOUT_SECONDS):
+        raise psycopg2.pool.PoolError("timed out waiting for a connection")
+    conn = None
+    broken = False
+    try:
+        with stage("db_connect"):
+            conn = _pool.getconn()
+            if not _is_healthy(conn):
+                _pool.putconn(conn, close=True)
+                conn = _pool.getconn()
+            if prepare:
+                _prepare(conn)
+        yield conn
         conn.commit()
-        cursor.close()
-        conn.close()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        if conn is not None and not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if conn is not None:
+            conn.last_used = time.monotonic()
+            _pool.putconn(conn, close=broken or bool(conn.closed))
+        _pool_slots.release()
+
+def acquire_advisory_lock(key: str):
+    """
+    Take a session-level PostgreSQL advisory lock for a key, waiting for its holder if needed.
+
+    Returns the pooled connection that holds the lock, which must be passed to
+    `release_advisory_lock`, or None if the lock was not acquired within DB_LOCK_TIMEOUT_SECONDS
+    or every lock connection is in use.
+    """
+    if _pool is None:
+        init_db_pool()
+
+    # Waiting here would hold an I/O thread that the lock holders need for their queries
+    if not _lock_slots.acquire(blocking=False):
+        return None
+    conn = None
+    try:
+        with stage("db_connect"):
+            conn = _pool.getconn()
+            if not _is_healthy(conn):
+                _pool.putconn(conn, close=True)
+                conn = _pool.getconn()
+        conn.autocommit = True
+
+        deadline = time.monotonic() + settings.DB_LOCK_TIMEOUT_SECONDS
+        with conn.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(hashtextextended(%s, 0)) AS locked", (key,))
+                if cursor.fetchone()["locked"]:
+                    return conn
+                if time.monotonic() >= deadline:
+                    logger.error(f"Timed out waiting for lock {key}")
+                    break
+                time.sleep(settings.DB_LOCK_POLL_SECONDS)
+    except Exception:
+        if conn is not None:
+            _pool.putconn(conn, close=True)
+        _lock_slots.release()
+        raise
+
+    conn.autocommit = False
+    _pool.putconn(conn)
+    _lock_slots.release()
+    return None
+
+def release_advisory_lock(conn, key: str):
+    """Release a lock taken with `acquire_advisory_lock` and return its connection to the pool."""
+    broken = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", (key,))
+        conn.autocommit = False
+    except psycopg2.Error as e:
+        # closing the session releases its locks as well
+        logger.error(f"Error releasing lock {key}: {e}")
+        broken = True
+    finally:
+        conn.last_used = time.monotonic()
+        _pool.putconn(conn, close=broken or bool(conn.closed))
+        _lock_slots.release()
+
+def create_cache_table():
+    """Create the cache table if it doesn't exist. Called once at application startup."""
+    try:
+        with db_connection(prepare=False) as conn:
+            cursor = conn.cursor()
+
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS timetable_cache (
+                id SERIAL PRIMARY KEY,
+                cache_key VARCHAR(255) UNIQUE NOT NULL,
+                cache_data TEXT,
+                hash_value VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP
+            );
+            """
+
+            cursor.execute(create_table_query)
+            cursor.close()
         logger.info("Cache table created successfully")
     except Exception as e:
         logger.error(f"Error creating cache table: {e}")
         raise
 
-def get_table_from_cache(filename: str, class_pattern: str, is_exam: bool) -> str | None:
+def create_cache_key_from_parameters(filename: str, class_pattern: str, is_exam: bool, content_hash: str) -> str:
+    """Generate a consistent cache key including the file version and the timetable type."""
+    return f"{filename}-{content_hash}-{class_pattern.replace(' ', '')}-{'exam' if is_exam else 'lecture'}"
+
+def get_table_from_cache(filename: str, class_pattern: str, is_exam: bool, content_hash: str) -> str | None:
     """
     Get a timetable (lecture or exam) from the PostgreSQL cache.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cache_key = f"{filename}-{class_pattern.replace(' ', '')}-{'exam' if is_exam else 'lecture'}"
-        
-        select_query = """
-        SELECT cache_data FROM timetable_cache 
-        WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
-        """
-        
-        cursor.execute(select_query, (cache_key,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
+        cache_key = create_cache_key_from_parameters(filename, class_pattern, is_exam, content_hash)
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("EXECUTE timetable_cache_get (%s)", (cache_key,))
+            result = cursor.fetchone()
+            cursor.close()
+
         if result:
             return result['cache_data']
         return None
@@ -90,34 +283,95 @@ def get_table_from_cache(filename: str, class_pattern: str, is_exam: bool) -> st
         logger.error(f"Error retrieving from cache: {e}")
         return None
 
-def add_table_to_cache(table: str, filename: str, class_pattern: str, is_exam: bool, expire_seconds: int = 3600):
+def get_tables_from_cache(filename: str, classes: list, content_hash: str) -> dict:
+    """
+    Get the timetables of many classes from one file from the PostgreSQL cache in a single query.
+
+    `classes` is a list of (class_pattern, is_exam) pairs. Returns the cached table of every
+    pair that was found, keyed by the pair.
+    """
+    if not classes:
+        return {}
+
+    try:
+        keys = {
+            create_cache_key_from_parameters(filename, class_pattern, is_exam, content_hash): (class_pattern, is_exam)
+            for class_pattern, is_exam in classes
+        }
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT cache_key, cache_data FROM timetable_cache
+                WHERE cache_key = ANY(%s) AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+                """,
+                (list(keys),),
+            )
+            results = cursor.fetchall()
+            cursor.close()
+
+        return {keys[row['cache_key']]: row['cache_data'] for row in results}
+    except Exception as e:
+        logger.error(f"Error retrieving many from cache: {e}")
+        return {}
+
+def add_table_to_cache(table: str, filename: str, class_pattern: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
     """
     Add a timetable (lecture or exam) to the PostgreSQL cache.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cache_key = f"{filename}-{class_pattern.replace(' ', '')}-{'exam' if is_exam else 'lecture'}"
-        
+        cache_key = create_cache_key_from_parameters(filename, class_pattern, is_exam, content_hash)
+
         # Calculate expiration time
         from datetime import datetime, timedelta
         expires_at = datetime.now() + timedelta(seconds=expire_seconds)
-        
+
+        # For simplicity, we'll use a simple hash of the data as the hash_value
+        import hashlib
+        hash_value = hashlib.md5(table.encode()).hexdigest()
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "EXECUTE timetable_cache_put (%s, %s, %s, %s)",
+                (cache_key, table, hash_value, expires_at),
+            )
+            cursor.close()
+    except Exception as e:
+        logger.error(f"Error adding to cache: {e}")
+
+def add_tables_to_cache(tables: list, filename: str, is_exam: bool, content_hash: str, expire_seconds: int = 3600):
+    """
+    Bulk add the timetables of many classes from one file to the PostgreSQL cache.
+
+    `tables` is a list of (class_pattern, table) pairs, written in a single statement. Pairs
+    with the same cache key are written once, with the last table, as a single statement
+    cannot update a row twice.
+    """
+    if not tables:
+        return
+
+    try:
+        from datetime import datetime, timedelta
+        expires_at = datetime.now() + timedelta(seconds=expire_seconds)
+
+        import hashlib
+        rows = {}
+        for class_pattern, table in tables:
+            cache_key = create_cache_key_from_parameters(filename, class_pattern, is_exam, content_hash)
+            rows[cache_key] = (cache_key, table, hashlib.md5(table.encode()).hexdigest(), expires_at)
+
         upsert_query = """
         INSERT INTO timetable_cache (cache_key, cache_data, hash_value, expires_at)
-        VALUES (%s, %s, %s, %s)
-        ON CONFLICT (cache_key) 
+        VALUES %s
+        ON CONFLICT (cache_key)
         DO UPDATE SET cache_data = EXCLUDED.cache_data, hash_value = EXCLUDED.hash_value, expires_at = EXCLUDED.expires_at
         """
-        
-        # For simplicity, we'll use a simple hash of the data as the hash_value
-        import hashlib
-        hash_value = hashlib.md5(table.encode()).hexdigest()
-        
-        cursor.execute(upsert_query, (cache_key, table, hash_value, expires_at))
-        conn.commit()
-        cursor.close()
-        conn.close()
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, upsert_query, list(rows.values()))
+            cursor.close()
     except Exception as e:
-        logger.error(f"Error adding to cache: {e}")
\ No newline at end of file
+        logger.error(f"Error bulk adding to cache: {e}")
@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSettings(BaseSettings):
+    IO_THREADS: int = 8
+    PARSE_WORKERS: int = 2
+    PARSE_QUEUE_DEPTH: int = 8  # Parse jobs allowed in flight before new ones are rejected
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = ExecutorSettings()
+
+class ParseQueueFull(Exception):
+    """Raised when too many parse jobs are already queued on the process pool."""
+
+_io_executor = None
+_parse_executor = None
+_parse_in_flight = 0
+
+# Set while this process is being profiled, so parses run on its own threads where the sampler sees them
+parse_inline = False
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool used for blocking database, cache and file I/O."""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=settings.IO_THREADS, thread_name_prefix="io")
+    return _io_executor
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    """Get the bounded process pool used for Excel parsing."""
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ProcessPoolExecutor(max_workers=settings.PARSE_WORKERS)
+    return _parse_executor
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking I/O call on the I/O thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # Like asyncio.to_thread, the call sees the context of the request, so its stages are timed for it
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+async def run_parse(func, *args):
+    """
+    Run a CPU-heavy parse on the process pool without blocking the event loop.
+
+    Raises ParseQueueFull instead of queueing when PARSE_QUEUE_DEPTH jobs are already in flight.
+    """
+    global _parse_in_flight
+    if _parse_in_flight >= settings.PARSE_QUEUE_DEPTH:
+        raise ParseQueueFull(f"{_parse_in_flight} parse jobs already in flight")
+
+    _parse_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        executor = get_io_executor() if parse_inline else get_parse_executor()
+        return await loop.run_in_executor(executor, func, *args)
+    finally:
+        _parse_in_flight -= 1
+
+def shutdown_executors():
+    """Shut down the I/O and parse pools."""
+    global _io_executor, _parse_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
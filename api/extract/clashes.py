@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import regex as re
+
+from api.extract.extract_exam_table import ExamIndex
+from api.extract.venue_index import VenueIndex
+
+# rooms that hold any number of classes at once, such as the virtual learning environment
+VIRTUAL_ROOMS = {"VLE"}
+
+# the classes and groups of a cell, e.g. "EL 372", "CY 1A 172", "MN 2A, 2B, 2C 254" or "CE/RN 459"
+_CLASS_GROUPS = re.compile(
+    r"(?<![A-Za-z])((?:[A-Z]{2,3}\s*[,/]\s*)*[A-Z]{2,3})\s*([1-9])(?:([A-Z](?:\s*,\s*[1-9][A-Z])*)|\d{2})(?![A-Za-z0-9])"
+)
+_DEPT_SEPARATOR = re.compile(r"\s*[,/]\s*")
+_GROUP_LETTER = re.compile(r"[A-Z]")
+_COURSE_NUMBER = re.compile(r"(?<!\d)\d{3}(?!\d)")
+
+
+def find_class_groups(text: str) -> dict:
+    """
+    Find the classes of a timetable cell and the groups of each class it is for.
+
+    Parameters
+    ----------
+    text : str
+        The content of the cell.
+
+    Returns
+    -------
+    dict
+        The groups of every "dept year" class in the cell, or None for a class whose
+        whole year attends. E.g. {'MN 2': frozenset({'A', 'B'}), 'EL 3': None}
+    """
+    classes = {}
+    for match in _CLASS_GROUPS.finditer(text):
+        groups = frozenset(_GROUP_LETTER.findall(match.group(3))) if match.group(3) else None
+        for dept in _DEPT_SEPARATOR.split(match.group(1)):
+            token = f"{dept} {match.group(2)}"
+            if token in classes and (classes[token] is None or groups is None):
+                classes[token] = None
+            else:
+                classes[token] = groups | classes.get(token, frozenset()) if groups is not None else None
+    return classes
+
+
+def _slot(venues: VenueIndex, slot_id: int) -> dict:
+    day, start, end = venues.slots[slot_id]
+    return {"day": day, "start": start, "end": end}
+
+
+def lecture_clashes(venues: VenueIndex) -> dict:
+    """
+    Find the classes and rooms that are booked twice in the same slot of a lecture timetable.
+
+    The slots of every (class, groups, courses) combination are held as a bitset over the
+    week, so two combinations of a class clash wherever the AND of their bitsets is set.
+    A class clashes when groups that overlap, or the whole year, have two different
+    courses at once; the same course held in several rooms is not a clash. Room bookings
+    are counted on the room by slot grid and every cell with two or more bookings of
+    different courses is a room clash.
+
+    Parameters
+    ----------
+    venues : VenueIndex
+        The room index of the workbook.
+
+    Returns
+    -------
+    dict
+        The class clashes and room clashes, each with its slot and bookings, ordered by slot.
+    """
+    courses = [frozenset(_COURSE_NUMBER.findall(booking["value"])) for booking in venues.bookings]
+
+    # bitset of the slots of every class, groups and courses combination, and its bookings
+    masks = {}
+    for booking_id, booking in enumerate(venues.bookings):
+        for token, groups in find_class_groups(booking["value"]).items():
+            key = (groups, courses[booking_id])
+            mask, booking_ids = masks.setdefault(token, {}).get(key, (0, []))
+            booking_ids.append(booking_id)
+            masks[token][key] = (mask | 1 << venues.booking_slots[booking_id], booking_ids)
+
+    class_clashes = []
+    for token, combinations in masks.items():
+        combinations = list(combinations.items())
+        clashing = {}
+        for i, ((groups, course), (mask, booking_ids)) in enumerate(combinations):
+            for (other_groups, other_course), (other_mask, other_ids) in combinations[i + 1 :]:
+                overlap = mask & other_mask
+                if not overlap or course == other_course:
+                    continue
+                if groups is not None and other_groups is not None and not groups & other_groups:
+                    continue
+                for booking_id in booking_ids + other_ids:
+                    slot_id = venues.booking_slots[booking_id]
+                    if overlap >> slot_id & 1:
+                        clashing.setdefault(slot_id, set()).add(booking_id)
+        for slot_id, booking_ids in clashing.items():
+            class_clashes.append((slot_id, token, sorted(booking_ids)))
+
+    room_ids = np.array(venues.booking_rooms, dtype=np.intp)
+    slot_ids = np.array(venues.booking_slots, dtype=np.intp)
+    counts = np.zeros(venues.occupied.shape, dtype=np.int32)
+    np.add.at(counts, (room_ids, slot_ids), 1)
+    virtual = [i for i, room in enumerate(venues.rooms) if room in VIRTUAL_ROOMS]
+    counts[virtual] = 0
+
+    room_clashes = []
+    for room_id, slot_id in np.argwhere(counts > 1).tolist():
+        booking_ids = np.flatnonzero((room_ids == room_id) & (slot_ids == slot_id)).tolist()
+        if len({courses[i] for i in booking_ids}) > 1:
+            room_clashes.append((slot_id, venues.rooms[room_id], booking_ids))
+
+    return {
+        "class_clashes": [
+            {"class": token, **_slot(venues, slot_id), "bookings": [venues.bookings[i] for i in booking_ids]}
+            for slot_id, token, booking_ids in sorted(class_clashes)
+        ],
+        "room_clashes": [
+            {"room": room, **_slot(venues, slot_id), "bookings": [venues.bookings[i] for i in booking_ids]}
+            for slot_id, room, booking_ids in sorted(room_clashes)
+        ],
+    }
+
+
+def exam_clashes(index: ExamIndex, max_papers_per_day: int) -> dict:
+    """
+    Find the classes with two papers in the same period, or too many papers on one day, of an exam timetable.
+
+    Distinct papers are counted on a class by day grid and a class by period grid, so every
+    check is a single comparison over the grid.
+
+    Parameters
+    ----------
+    index : ExamIndex
+        The preprocessed exam timetable.
+    max_papers_per_day : int
+        The number of papers a class may write on one day.
+
+    Returns
+    -------
+    dict
+        The period clashes and the overloaded days, ordered by day.
+    """
+    table = index.table[index.table["CLASS"].map(lambda value: isinstance(value, str))]
+    # a paper written in several halls is listed once per hall, not always spelled the same way
+    course = table["COURSE NO"].astype(str).str.replace(r"\s+", "", regex=True)
+    table = table[~pd.concat([table[["CLASS", "DATE", "START"]], course], axis=1).duplicated()]
+    classes, class_ids = np.unique(table["CLASS"].to_numpy(dtype=str), return_inverse=True)
+    day_ids, days = table["DATE"].factorize()
+    period_ids, periods = table["START"].factorize()
+    period_ids = day_ids * len(periods) + period_ids
+
+    per_day = np.zeros((len(classes), len(days)), dtype=np.int32)
+    np.add.at(per_day, (class_ids, day_ids), 1)
+    per_period = np.zeros((len(classes), len(days) * len(periods)), dtype=np.int32)
+    np.add.at(per_period, (class_ids, period_ids), 1)
+
+    def papers(rows) -> list:
+        return [
+            {
+                "course_no": None if pd.isna(row["COURSE NO"]) else str(row["COURSE NO"]),
+                "course_name": None if pd.isna(row["COURSE NAME"]) else str(row["COURSE NAME"]),
+                "start": row["START"],
+                "end": row["END"],
+            }
+            for _, row in table[rows].iterrows()
+        ]
+
+    period_clashes = [
+        {
+            "class": str(classes[class_id]),
+            "day": days[period_id // len(periods)],
+            "papers": papers((class_ids == class_id) & (period_ids == period_id)),
+        }
+        for period_id, class_id in sorted((p, c) for c, p in np.argwhere(per_period > 1).tolist())
+    ]
+    overloaded_days = [
+        {
+            "class": str(classes[class_id]),
+            "day": days[day_id],
+            "papers": papers((class_ids == class_id) & (day_ids == day_id)),
+        }
+        for day_id, class_id in sorted((d, c) for c, d in np.argwhere(per_day > max_papers_per_day).tolist())
+    ]
+    return {"period_clashes": period_clashes, "overloaded_days": overloaded_days}
@@ -0,0 +1,10 @@
+import hashlib
+
+from api.metrics import timed
+
+
+@timed("hash")
+def file_content_hash(filename: str) -> str:
+    """Get the MD5 hash of a file's content."""
+    with open(filename, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
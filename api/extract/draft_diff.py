@@ -0,0 +1,110 @@
+from api.extract.extract_lectures_table import compile_class_pattern
+from api.extract.workbook_index import WorkbookIndex
+
+
+def _grid_columns(index: WorkbookIndex) -> dict:
+    """Group the (room, value) of every cell of a workbook by (day, slot), in row order."""
+    columns = {}
+    for grid_id, row, slot, value in index.cells:
+        grid = index.grids[grid_id]
+        columns.setdefault((grid.day, str(grid.slots[slot])), []).append((str(grid.rooms[row]), str(value)))
+    return columns
+
+
+def _layout(index: WorkbookIndex) -> list | None:
+    """The time slot columns every class timetable of a workbook is laid out on, or None if it has none."""
+    try:
+        return index._columns().to_list()
+    except ValueError:
+        return None
+
+
+class DraftDiff:
+    """
+    The cells that differ between two versions of a lecture workbook.
+
+    Cells are compared by day, room and time slot rather than by row, so inserting or
+    deleting a row only shows up as changes of its own cells. Cells that keep their room
+    but move past each other in a slot are reported as well, as they change the order of
+    the lines of that slot. When the days or the time slots the
+    timetables are laid out on differ, every class timetable is laid out differently and
+    the diff is structural: every class counts as changed.
+
+    Parameters
+    ----------
+    old : WorkbookIndex
+        The earlier version of the workbook.
+    new : WorkbookIndex
+        The later version of the workbook.
+    """
+
+    def __init__(self, old: WorkbookIndex, new: WorkbookIndex):
+        self.old_hash = old.content_hash
+        self.new_hash = new.content_hash
+        self.structural = [grid.day for grid in old.grids] != [grid.day for grid in new.grids] or _layout(old) != _layout(new)
+
+        old_columns = _grid_columns(old)
+        new_columns = _grid_columns(new)
+        self.changes = []
+        for day, slot in dict.fromkeys([*old_columns, *new_columns]):
+            before = old_columns.get((day, slot), [])
+            after = new_columns.get((day, slot), [])
+            if before == after:
+                continue
+
+            changed_rooms = set()
+            for room in dict.fromkeys(room for room, _ in [*before, *after]):
+                old_values = [value for r, value in before if r == room]
+                new_values = [value for r, value in after if r == room]
+                if sorted(old_values) != sorted(new_values):
+                    changed_rooms.add(room)
+                    self.changes.append({"day": day, "room": room, "slot": slot, "old": old_values, "new": new_values})
+
+            # the lines of a slot follow the row order, so unchanged cells that moved past each other count as well
+            kept_before = [cell for cell in before if cell[0] not in changed_rooms]
+            kept_after = [cell for cell in after if cell[0] not in changed_rooms]
+            for (old_room, old_value), (new_room, new_value) in zip(kept_before, kept_after):
+                if (old_room, old_value) != (new_room, new_value):
+                    self.changes.append({"day": day, "room": new_room, "slot": slot, "old": [old_value], "new": [new_value]})
+
+    def class_changes(self, class_pattern: str) -> list:
+        """
+        Get the changed cells that belong to a class in either version.
+
+        Parameters
+        ----------
+        class_pattern : str
+            The class to look up. E.g. 'EL 3'
+
+        Returns
+        -------
+        list
+            The changed cells of the class, in the order of the sheets.
+        """
+        expression = compile_class_pattern(class_pattern)
+        return [
+            change
+            for change in self.changes
+            if any(expression.search(str(value)) for value in (*change["old"], *change["new"]))
+        ]
+
+    def changed_classes(self, class_patterns: list) -> list:
+        """
+        Get the classes whose timetable differs between the two versions.
+
+        A class timetable is built only from the cells that match the class, so a class
+        whose cells are all unchanged has the same timetable in both versions.
+
+        Parameters
+        ----------
+        class_patterns : list
+            The classes to check. E.g. ['EL 3', 'CE 4']
+
+        Returns
+        -------
+        list
+            The classes that changed, in the order they were given.
+        """
+        if self.structural:
+            return list(class_patterns)
+        return [class_pattern for class_pattern in class_patterns if self.class_changes(class_pattern)]
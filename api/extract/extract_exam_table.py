@@ -1,58 +1,237 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import openpyxl
 import pandas as pd
+import regex as re
 
-def get_exam_timetable(filename, class_pattern) -> pd.DataFrame:
+from api.cache.registry import draft_registry
+from api.extract.content_hash import file_content_hash
+from api.metrics import timed
+
+_CLASS_TOKEN = re.compile(r"^([A-Z]{2,3})\s*([1-9])")
+
+
+def _read_exam_sheet(filename) -> pd.DataFrame:
+    """Read the first sheet of an examination timetable without headers."""
+    return pd.read_excel(
+        filename,
+        sheet_name=0,
+        header=None
+    )
+
+
+def is_exam_workbook(filename) -> bool:
     """
-    Process an examination timetable Excel file and return a filtered DataFrame.
+    Check whether an Excel file is an examination timetable.
+
+    Examination timetables have a header row with both a CLASS and a PERIOD column in
+    their first sheet, lecture timetables have the days as sheets instead.
+    """
+    workbook = openpyxl.load_workbook(filename, read_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(max_row=10, values_only=True):
+            if "CLASS" in row and "PERIOD" in row:
+                return True
+        return False
+    finally:
+        workbook.close()
+
+
+def get_exam_classes(filename) -> list:
+    """
+    Get every distinct class in an examination timetable.
 
     Parameters:
     filename (str): Path to the Excel file
-    class_pattern (str): Pattern to filter classes (e.g., 'CE 4')
 
     Returns:
-    pd.DataFrame: Processed and filtered timetable DataFrame
+    list: The sorted "dept year" class tokens (e.g., ['CE 4', 'EL 3'])
     """
+    df = _read_exam_sheet(filename)
+    df = df.iloc[3:-3].reset_index(drop=True)
+    df.columns = df.iloc[0]
 
-    # read the Excel file
-    df = pd.read_excel(
-        filename,
-        sheet_name=0,
-        header=None
-    )
+    tokens = set()
+    for value in df['CLASS'][1:].dropna().astype(str):
+        match = _CLASS_TOKEN.match(value.strip())
+        if match:
+            tokens.add(f"{match.group(1)} {match.group(2)}")
+    return sorted(tokens)
+
+# map PERIOD to START and END times
+PERIOD_TIMES = {
+    'M': ('7:00 AM', '10:00 AM'),
+    'A': ('11:00 AM', '2:00 PM'),
+    'E': ('3:00 PM', '6:00 PM')
+}
+
+# the columns of the header row every examination timetable has
+EXAM_COLUMNS = ['NO', 'CLASS', 'DATE', 'PERIOD']
+
+# number of preprocessed examination timetables kept in memory, keyed by content hash
+MAX_CACHED_EXAMS = 8
+
+
+class NotAnExamTimetable(ValueError):
+    """Raised when a workbook has no examination table, such as a lecture timetable."""
+
+
+def format_date_with_suffix(date) -> str:
+    """Format a date as e.g. 'Monday, 14th April 2025'."""
+    day = date.day
+    suffix = 'th' if 11 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+    return date.strftime(f"%A, {day}{suffix} %B %Y")
 
+
+def _clean_exam_table(df) -> pd.DataFrame:
+    """
+    Clean a raw examination sheet into one row per exam, with START, END and formatted DATE columns.
+
+    Parameters:
+    df (pd.DataFrame): The raw first sheet of the examination timetable, without headers
+
+    Returns:
+    pd.DataFrame: The exams with a valid period, in sheet order
+    """
     # clean the DataFrame by removing the first and last 3 rows and setting headers
     df_cleaned = df.iloc[3:-3].reset_index(drop=True)
+    if df_cleaned.empty:
+        raise NotAnExamTimetable("No exam header row found")
     df_cleaned.columns = df_cleaned.iloc[0]
+    missing = [column for column in EXAM_COLUMNS if column not in df_cleaned.columns]
+    if missing:
+        raise NotAnExamTimetable(f"Missing exam columns: {', '.join(missing)}")
     df_cleaned = df_cleaned[1:].reset_index(drop=True)
 
-    # map PERIOD to START and END times
-    period_mapping = {
-        'M': ('7:00 AM', '10:00 AM'),
-        'A': ('11:00 AM', '2:00 PM'),
-        'E': ('3:00 PM', '6:00 PM')
-    }
-
     # conver the 'PERIOD' column to string type to handle NaN vals
-    df_cleaned['PERIOD'] = df_cleaned['PERIOD'].astype(str)
-    df_cleaned = df_cleaned[df_cleaned['PERIOD'].isin(period_mapping.keys())]
+    periods = df_cleaned['PERIOD'].astype(str)
+    valid = periods.isin(PERIOD_TIMES.keys())
+    df_cleaned = df_cleaned[valid].copy()
+    periods = periods[valid]
 
-    # apply the mapping for valid periods
-    df_cleaned['START'], df_cleaned['END'] = zip(*df_cleaned['PERIOD'].map(period_mapping))
+    # map the periods to their times in one pass per column
+    df_cleaned['START'] = periods.map({period: times[0] for period, times in PERIOD_TIMES.items()})
+    df_cleaned['END'] = periods.map({period: times[1] for period, times in PERIOD_TIMES.items()})
+    df_cleaned = df_cleaned.drop(columns=['PERIOD', 'NO'])
 
-    # remove the PERIOD column
-    df_cleaned = df_cleaned.drop(columns=['PERIOD'])
+    # format every distinct date once, exams share a handful of dates
+    dates = pd.to_datetime(df_cleaned['DATE'])
+    formatted = {date: format_date_with_suffix(date) for date in dates.drop_duplicates()}
+    df_cleaned['DATE'] = dates.map(formatted).astype(object)
 
-    # format date helper function
-    def format_date_with_suffix(date):
-        day = date.day
-        suffix = 'th' if 11 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
-        return date.strftime(f"%A, {day}{suffix} %B %Y")
+    return df_cleaned
 
-    # process dates
-    df_cleaned['DATE'] = pd.to_datetime(df_cleaned['DATE'])
-    df_cleaned['DATE'] = df_cleaned['DATE'].apply(format_date_with_suffix)
 
-    # filter by class pattern
-    filtered_df = df_cleaned[df_cleaned['CLASS'].str.startswith(class_pattern)]
-    filtered_df = filtered_df.drop(columns=['NO'])
+def _prefix_end(prefix: str) -> str:
+    """The smallest string greater than every string starting with a prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
 
-    return filtered_df
+
+class ExamIndex:
+    """
+    A preprocessed examination timetable that serves class lookups without rescanning the sheet.
+
+    The classes of every exam are kept sorted next to their row positions, so the exams of
+    a class are the contiguous range of classes starting with it, found by binary search.
+
+    Parameters:
+    content_hash (str): The MD5 hash of the workbook the index was built from
+    table (pd.DataFrame): The cleaned exams, as returned by `_clean_exam_table`
+    """
+
+    def __init__(self, content_hash: str, table: pd.DataFrame):
+        self.content_hash = content_hash
+        self.table = table
+
+        classes = table['CLASS'].to_numpy(dtype=object)
+        positions = np.flatnonzero([isinstance(value, str) for value in classes])
+        keys = np.array(classes[positions].tolist(), dtype=str)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._positions = positions[order]
+
+    @classmethod
+    def from_file(cls, filename, content_hash: str | None = None) -> "ExamIndex":
+        """Read and preprocess an examination timetable Excel file once."""
+        if content_hash is None:
+            content_hash = file_content_hash(filename)
+        return cls(content_hash, _clean_exam_table(_read_exam_sheet(filename)))
+
+    @timed("match")
+    def lookup(self, class_pattern) -> pd.DataFrame:
+        """
+        Get the exams of the classes starting with a pattern, in sheet order.
+
+        Parameters:
+        class_pattern (str): Pattern to filter classes (e.g., 'CE 4')
+
+        Returns:
+        pd.DataFrame: The exams of the class
+        """
+        if not class_pattern:
+            return self.table.iloc[np.sort(self._positions)]
+        start = np.searchsorted(self._keys, class_pattern, side="left")
+        end = np.searchsorted(self._keys, _prefix_end(class_pattern), side="left")
+        return self.table.iloc[np.sort(self._positions[start:end])]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_exam_index(content_hash: str) -> ExamIndex | None:
+    """Get an already preprocessed examination timetable by content hash, if it is in memory."""
+    with _cache_lock:
+        index = _cache.get(content_hash)
+        if index is not None:
+            _cache.move_to_end(content_hash)
+        return index
+
+
+def add_exam_index(index: ExamIndex):
+    """Keep a preprocessed examination timetable in memory, evicting the least recently used ones."""
+    with _cache_lock:
+        _cache[index.content_hash] = index
+        _cache.move_to_end(index.content_hash)
+        while len(_cache) > MAX_CACHED_EXAMS:
+            _cache.popitem(last=False)
+
+
+def get_exam_index(filename, content_hash: str | None = None) -> ExamIndex:
+    """
+    Get the preprocessed examination timetable of a file, reading it only if its content has not been seen before.
+
+    Without a content hash, the draft registry gets it from the stat signature of the file,
+    so a lookup of a preprocessed file reads no Excel.
+
+    Parameters:
+    filename (str): Path to the Excel file
+    content_hash (str, optional): The MD5 hash of the file, if the caller already has it
+
+    Returns:
+    ExamIndex: The preprocessed examination timetable
+    """
+    if content_hash is None:
+        content_hash = draft_registry.content_hash(filename)
+    index = cached_exam_index(content_hash)
+    if index is None:
+        index = ExamIndex.from_file(filename, content_hash)
+        add_exam_index(index)
+    return index
+
+
+def get_exam_timetable(filename, class_pattern) -> pd.DataFrame:
+    """
+    Process an examination timetable Excel file and return a filtered DataFrame.
+
+    Parameters:
+    filename (str): Path to the Excel file
+    class_pattern (str): Pattern to filter classes (e.g., 'CE 4')
+
+    Returns:
+    pd.DataFrame: Processed and filtered timetable DataFrame
+    """
+    return get_exam_index(filename).lookup(class_pattern)
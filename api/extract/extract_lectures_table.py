@@ -1,8 +1,18 @@
 import regex as re
+import numpy as np
 import pandas as pd
+from functools import lru_cache
 from icalendar import Event, Calendar
 from datetime import datetime, timedelta
+import hashlib
 import openpyxl
+from openpyxl.utils.cell import range_boundaries
+# _read_sheet_grid uses openpyxl internals (this parser, the sheet's _get_source and _shared_strings, the workbook's
+# _date_formats and _timedelta_formats), so openpyxl is pinned and an upgrade must pass the full-load parity test
+from openpyxl.worksheet._reader import WorkSheetParser
+
+# weekday number of every day sheet, as used by datetime.weekday()
+WEEKDAYS = {"Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3, "Friday": 4, "Saturday": 5, "Sunday": 6}
 
 
 def _get_time_row(df: pd.DataFrame) -> pd.Series:
@@ -24,19 +34,20 @@ def _get_time_row(df: pd.DataFrame) -> pd.Series:
             return row
 
 
-def _get_daily_table(df: pd.DataFrame, class_pattern: str) -> pd.DataFrame:
-    """Get the simplified dataframe for a given class."""
-    df = df.copy()
-
-    time_row = _get_time_row(df)
-    new_cols = time_row[1].to_list()
-    new_cols.pop(0)
-    new_cols.insert(0, "Classroom")
-    df.columns = new_cols
+def _build_class_pattern(class_pattern: str) -> str:
+    """
+    Build the regular expression used to find a class in the timetable cells.
 
-    df.set_index("Classroom", inplace=True)
-    df = df.iloc[time_row[0] + 1 :]
+    Parameters
+    ----------
+    class_pattern : str
+        The class to build the expression for. E.g. 'EL 3'
 
+    Returns
+    -------
+    str
+        The combined expression of every supported way a class is written.
+    """
     dept, year = class_pattern.split()
 
     patterns = [
@@ -59,14 +70,171 @@ def _get_daily_table(df: pd.DataFrame, class_pattern: str) -> pd.DataFrame:
         fr"{dept}(?:\s*[,/]\s*[A-Z]{{2,3}})+\s+{year}[0-9]{{2}}"
     ]
 
-    combined_pattern = '|'.join(f'({pattern})' for pattern in patterns)
+    return '|'.join(f'({pattern})' for pattern in patterns)
+
+
+@lru_cache(maxsize=512)
+def compile_class_pattern(class_pattern: str) -> re.Pattern:
+    """
+    Compile the case-insensitive expression of a class once, keeping the most recently used ones.
+
+    Parameters
+    ----------
+    class_pattern : str
+        The class to compile the expression for. E.g. 'EL 3'
+
+    Returns
+    -------
+    regex.Pattern
+        The compiled expression built by `_build_class_pattern`.
+    """
+    return re.compile(_build_class_pattern(class_pattern), re.IGNORECASE)
+
+
+def _match_cells(df: pd.DataFrame, expression: re.Pattern) -> np.ndarray:
+    """
+    Search every cell of a dataframe for an expression, searching each distinct text only once.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe to search.
+    expression : regex.Pattern
+        The compiled expression to search for.
+
+    Returns
+    -------
+    numpy.ndarray
+        A boolean array shaped like the dataframe, True where the text of the cell matches.
+    """
+    values = df.to_numpy(dtype=object)
+    codes, texts = pd.factorize(pd.Series(values.ravel(), dtype=object).astype(str))
+    found = np.fromiter((expression.search(text) is not None for text in texts), dtype=bool, count=len(texts))
+    return found[codes].reshape(values.shape)
+
+
+def _get_daily_table(df: pd.DataFrame, class_pattern: str) -> pd.DataFrame:
+    """Get the simplified dataframe for a given class."""
+    df = df.copy()
+
+    time_row = _get_time_row(df)
+    new_cols = time_row[1].to_list()
+    new_cols.pop(0)
+    new_cols.insert(0, "Classroom")
+    df.columns = new_cols
 
-    df = df.mask(~df.map(lambda x: bool(re.search(combined_pattern, str(x), re.IGNORECASE))))
+    df.set_index("Classroom", inplace=True)
+    df = df.iloc[time_row[0] + 1 :]
+
+    expression = compile_class_pattern(class_pattern)
+
+    df = df.mask(~_match_cells(df, expression))
     df = df.dropna(how="all")
 
     return df
 
 
+def _read_sheet_grid(sheet) -> np.ndarray:
+    """
+    Stream the cells of a read-only worksheet into a grid, resolving its merged cells.
+
+    Read-only worksheets do not expose their merged cells, so the sheet XML is parsed
+    directly with openpyxl's own worksheet parser, which converts the values exactly as a
+    full load does and collects the merge ranges on the way. As in a full load, only the
+    top-left cell of a merged range keeps the value; two-column merges also copy it to
+    their bottom-right cell.
+
+    Parameters
+    ----------
+    sheet : openpyxl.worksheet._read_only.ReadOnlyWorksheet
+        The worksheet to read.
+
+    Returns
+    -------
+    numpy.ndarray
+        The value of every cell, None for empty cells, starting at cell A1.
+    """
+    workbook = sheet.parent
+    source = sheet._get_source()
+    try:
+        parser = WorkSheetParser(
+            source,
+            sheet._shared_strings,
+            epoch=workbook.epoch,
+            date_formats=workbook._date_formats,
+            timedelta_formats=workbook._timedelta_formats,
+        )
+        cells = [(cell["row"], cell["column"], cell["value"]) for _, row in parser.parse() for cell in row]
+    finally:
+        source.close()
+
+    merges = [range_boundaries(merged.ref) for merged in parser.merged_cells.mergeCell] if parser.merged_cells else []
+    n_rows = max([row for row, _, _ in cells] + [max_row for _, _, _, max_row in merges], default=0)
+    n_cols = max([col for _, col, _ in cells] + [max_col for _, _, max_col, _ in merges], default=0)
+
+    grid = np.full((n_rows, n_cols), None, dtype=object)
+    for row, col, value in cells:
+        grid[row - 1, col - 1] = value
+
+    for min_col, min_row, max_col, max_row in merges:
+        merged_value = grid[min_row - 1, min_col - 1]
+        grid[min_row - 1 : max_row, min_col - 1 : max_col] = None
+        grid[min_row - 1, min_col - 1] = merged_value
+        if max_col - min_col == 1:
+            grid[max_row - 1, max_col - 1] = merged_value
+
+    return grid
+
+
+def _iter_daily_frames(filename: str):
+    """
+    Read the sheets of an excel file into dataframes, one sheet at a time.
+
+    The workbook is opened in read-only mode and every sheet is streamed from its XML, so
+    the memory held is proportional to a single sheet rather than the whole workbook.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file to read.
+
+    Yields
+    ------
+    tuple
+        The name and the raw dataframe of each sheet, in workbook order.
+    """
+    workbook = openpyxl.load_workbook(filename, read_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            grid = _read_sheet_grid(sheet)
+            if not len(grid):
+                yield sheet.title, pd.DataFrame()
+                continue
+            df = pd.DataFrame(grid[1:].tolist(), columns=grid[0].tolist())
+            yield sheet.title, df.dropna(axis=1, how="all")
+    finally:
+        workbook.close()
+
+
+def _read_daily_frames(filename: str) -> dict:
+    """
+    Read every sheet of an excel file into a dataframe.
+
+    Two-column merged cells are split so that both columns carry the merged value.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file to read.
+
+    Returns
+    -------
+    dict
+        A dictionary of the raw dataframe for each sheet.
+    """
+    return dict(_iter_daily_frames(filename))
+
+
 def _get_all_daily_tables(filename: str, class_pattern: str) -> dict:
     """
     Get all the daily tables from an excel file.
@@ -83,47 +251,26 @@ def _get_all_daily_tables(filename: str, class_pattern: str) -> dict:
     dict
         A dictionary of the daily tables for each class.
     """
-    # filename += ".xlsx"
-
-    workbook = openpyxl.load_workbook(filename)
-    dfs = {}
-    for sheet in workbook.sheetnames:
-        merged_cells = workbook[sheet].merged_cells.ranges
-        for mc in merged_cells.copy():
-            if mc.max_col - mc.min_col == 1:
-                merged_value = workbook[sheet].cell(mc.min_row, mc.min_col).value
-                workbook[sheet].unmerge_cells(mc.coord)
-                workbook[sheet].cell(mc.min_row, mc.min_col).value = merged_value
-                workbook[sheet].cell(mc.max_row, mc.max_col).value = merged_value
-
-        data = workbook[sheet].values
-        header = next(data)
-        df = pd.DataFrame(data, columns=header)
-        df = df.dropna(axis=1, how="all")
-
-        dfs[sheet] = _get_daily_table(df, class_pattern)
-
-    return dfs
+    return {
+        sheet: _get_daily_table(df, class_pattern)
+        for sheet, df in _read_daily_frames(filename).items()
+    }
 
 
-def get_time_table(filename: str, class_pattern: str) -> pd.DataFrame:
+def _merge_daily_tables(daily_tables: dict) -> pd.DataFrame:
     """
-    Get the complete time table for a particular class for all days.
+    Merge the daily tables of a class into a single time table.
 
     Parameters
     ----------
-    filename : str
-        The filename of the excel file. This file contains every class with the days as the sheet names.
-    class_pattern : str
-        The class to get the complete time table for. E.g. 'EL 3'
+    daily_tables : dict
+        The daily tables for a class, as returned by `_get_all_daily_tables`.
 
     Returns
     -------
     pandas.DataFrame
-        The complete time table for the given class.
+        The complete time table with the days as the index and the periods as the columns.
     """
-    daily_tables = _get_all_daily_tables(filename, class_pattern)
-
     days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
     for key, value in daily_tables.items():
         if key.title() in days:
@@ -154,17 +301,30 @@ def get_time_table(filename: str, class_pattern: str) -> pd.DataFrame:
     return final_df
 
 
-def convert_to_24hour(time_str, is_end_time=False):
-    """Convert time to 24-hour format considering class schedule rules."""
-    hours, minutes = map(int, time_str.split(':'))
+def get_time_table(filename: str, class_pattern: str) -> pd.DataFrame:
+    """
+    Get the complete time table for a particular class for all days.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file. This file contains every class with the days as the sheet names.
+    class_pattern : str
+        The class to get the complete time table for. E.g. 'EL 3'
+
+    Returns
+    -------
+    pandas.DataFrame
+        The complete time table for the given class.
 
-    # For start times: hours <= 11 are AM, hours >= 12 are PM
-    # For end times: all times are PM
-    if is_end_time or hours <= 7:
-        if hours != 12:
-            hours += 12
+    Notes
+    -----
+    The workbook is parsed once per content hash and every later lookup is served from
+    the in-memory :class:`~api.extract.workbook_index.WorkbookIndex`.
+    """
+    from api.extract.workbook_index import get_workbook_index
 
-    return f"{hours:02d}:{minutes:02d}"
+    return get_workbook_index(filename).time_table(class_pattern)
 
 
 def generate_calendar(timetable, start_date, end_date):
@@ -175,8 +335,8 @@ def generate_calendar(timetable, start_date, end_date):
         timetable (list): A list of dictionaries representing the timetable data. Each dictionary contains the following keys:
             - day (str): The name of the day.
             - data (list): A list of dictionaries representing the class events for the day. Each dictionary contains the following keys:
-                - start (str): The start time of the class in the format 'HH:MM'.
-                - end (str): The end time of the class in the format 'HH:MM'.
+                - start (str): The start time of the class in the 24-hour format 'HH:MM'.
+                - end (str): The end time of the class in the 24-hour format 'HH:MM'.
                 - value (str): The name of the class.
 
         start_date (str): The start date of the calendar in the format 'YYYY-MM-DD'.
@@ -185,52 +345,45 @@ def generate_calendar(timetable, start_date, end_date):
     Returns:
         bytes
 
-    This function generates a calendar of class events based on the provided timetable within the specified date range.
-    It iterates over the timetable data, checks if the day matches the current date, and adds class events to the calendar.
-    The resulting calendar is saved as an ICS file named 'class_schedule.ics'.
+    Every class becomes a single event on its first date in the range, repeated weekly until
+    the end date with an RRULE, so the size and cost of the calendar do not depend on the
+    length of the range. The calendar is returned serialized and nothing is written to disk.
     """
-    data = timetable
-
     cal = Calendar()
     cal.add('version', '2.0')
     cal.add('prodid', '-//Class Schedule Generator//EN')
 
     start_date = datetime.strptime(start_date, "%Y-%m-%d")
     end_date = datetime.strptime(end_date, "%Y-%m-%d")
+    until = end_date.replace(hour=23, minute=59, second=59)
+    stamp = datetime.now()
+
+    for day in timetable:
+        weekday = WEEKDAYS.get(day["day"])
+        if weekday is None:
+            continue
+
+        first_date = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+        if first_date > end_date:
+            continue
+
+        for class_info in day["data"]:
+            if not class_info["value"]:
+                continue
+
+            start_hour, start_minute = map(int, class_info["start"].split(":"))
+            end_hour, end_minute = map(int, class_info["end"].split(":"))
+            summary = class_info["value"].replace("\n", " ")
+            uid = hashlib.md5(f"{day['day']}|{class_info['start']}|{class_info['end']}|{summary}".encode()).hexdigest()
+
+            event = Event()
+            event.add("uid", f"{uid}@easechaos")
+            event.add("summary", summary)
+            event.add("dtstart", first_date.replace(hour=start_hour, minute=start_minute))
+            event.add("dtend", first_date.replace(hour=end_hour, minute=end_minute))
+            event.add('dtstamp', stamp)
+            event.add("rrule", {"freq": "weekly", "until": until})
 
+            cal.add_component(event)
 
-    current_date = start_date
-    while current_date <= end_date:
-        day_name = current_date.strftime("%A")
-        for day in data:
-            if day["day"] == day_name:
-                for class_info in day["data"]:
-                    if class_info["value"]:
-                        event = Event()
-
-                        start_time_24h = convert_to_24hour(class_info["start"])
-                        end_time_24h = convert_to_24hour(class_info["end"], is_end_time=True)
-
-                        start_time = datetime.strptime(start_time_24h, "%H:%M")
-                        end_time = datetime.strptime(end_time_24h, "%H:%M")
-
-                        event_start = current_date.replace(
-                            hour=start_time.hour,
-                            minute=start_time.minute
-                        )
-                        event_end = current_date.replace(
-                            hour=end_time.hour,
-                            minute=end_time.minute
-                        )
-
-                        event.add("summary", class_info["value"].replace("\n", " "))
-                        event.add("dtstart", event_start)
-                        event.add("dtend", event_end)
-                        event.add('dtstamp', datetime.now())
-
-                        cal.add_component(event)
-        current_date += timedelta(days=1)
-
-    with open("class_schedule.ics", "wb") as f:
-        f.write(cal.to_ical())
     return cal.to_ical()
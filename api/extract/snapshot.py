@@ -0,0 +1,328 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from api.extract.workbook_index import DayGrid, WorkbookIndex
+
+logger = logging.getLogger(__name__)
+
+# folder next to the drafts holding the snapshot of every parsed workbook, by content hash
+SNAPSHOT_FOLDER = ".snapshots"
+SNAPSHOT_SUFFIX = ".wbi"
+# written instead of a snapshot that could not be written, so the other workers parse the workbook without waiting for one
+SKIPPED_SUFFIX = ".skipped"
+
+SNAPSHOT_MAGIC = b"WBIX"
+SNAPSHOT_VERSION = 2
+
+# magic, format version and the length of the JSON metadata that follows
+_HEADER = struct.Struct("<4sIQ")
+_ALIGNMENT = 8
+
+# the columns of the cell table, in file order
+_CELL_COLUMNS = {
+    "cell_grid": np.int32,
+    "cell_row": np.int32,
+    "cell_slot": np.int32,
+    "cell_text": np.int32,
+    "text_offsets": np.int64,
+    "text_blob": np.uint8,
+    "text_kind": np.uint8,
+}
+
+_LABEL_TYPES = (str, int, float, type(None))
+
+# the types a cell value can have, by the kind stored for its text, such as the room capacities of some drafts
+_CELL_TYPES = (str, int, float)
+
+
+def snapshot_path(filename: str, content_hash: str) -> Path:
+    """
+    Get the path of the snapshot of a workbook, next to the workbook itself.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file.
+    content_hash : str
+        The MD5 hash of the workbook.
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the snapshot.
+    """
+    return Path(filename).parent / SNAPSHOT_FOLDER / f"{content_hash}{SNAPSHOT_SUFFIX}"
+
+
+def snapshot_skipped(filename: str, content_hash: str) -> bool:
+    """
+    Check whether the parse of a workbook could not write its snapshot.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file.
+    content_hash : str
+        The MD5 hash of the workbook.
+
+    Returns
+    -------
+    bool
+        Whether the workbook was parsed without writing a snapshot.
+    """
+    return snapshot_path(filename, content_hash).with_suffix(SKIPPED_SUFFIX).exists()
+
+
+class SnapshotCells(Sequence):
+    """
+    The (grid, row, slot, value) cells of a workbook, read from a memory-mapped snapshot.
+
+    The columns are NumPy views of the mapped file and the text of a cell is decoded only
+    when it is accessed, so every worker that maps the same snapshot shares a single copy
+    of the data through the page cache. Numeric values are stored as their text with a
+    kind that turns them back into the number they were.
+
+    Parameters
+    ----------
+    buffer : mmap.mmap
+        The mapped snapshot file.
+    columns : dict
+        The NumPy view of every column of the cell table.
+    """
+
+    def __init__(self, buffer: mmap.mmap, columns: dict):
+        self._buffer = buffer
+        self._grid = columns["cell_grid"]
+        self._row = columns["cell_row"]
+        self._slot = columns["cell_slot"]
+        self._text = columns["cell_text"]
+        self._offsets = columns["text_offsets"]
+        self._blob = columns["text_blob"]
+        self._kind = columns["text_kind"]
+
+    def __len__(self) -> int:
+        return len(self._grid)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        text = self._text[i]
+        start, end = self._offsets[text], self._offsets[text + 1]
+        return (
+            int(self._grid[i]),
+            int(self._row[i]),
+            int(self._slot[i]),
+            _CELL_TYPES[self._kind[text]](self._blob[start:end].tobytes().decode("utf-8")),
+        )
+
+
+def _can_snapshot(index: WorkbookIndex) -> bool:
+    """Check that every value of a workbook survives the snapshot format unchanged."""
+    if isinstance(index.cells, SnapshotCells):
+        return False
+    if not all(type(value) in _CELL_TYPES for _, _, _, value in index.cells):
+        return False
+    labels = [label for grid in index.grids for label in (*grid.slots, *grid.rooms)]
+    return all(type(label) in _LABEL_TYPES for label in labels)
+
+
+def write_snapshot(index: WorkbookIndex, path: Path) -> bool:
+    """
+    Write the snapshot of a parsed workbook, replacing any previous one atomically.
+
+    Cell values are interned into a single string table, with the kind of every entry,
+    and the cells are stored as columns of integers pointing into it. Workbooks with
+    values the format cannot hold exactly, such as dates in the grid, are not written.
+
+    Parameters
+    ----------
+    index : WorkbookIndex
+        The parsed workbook.
+    path : pathlib.Path
+        Where to write the snapshot.
+
+    Returns
+    -------
+    bool
+        Whether the snapshot was written.
+    """
+    if not _can_snapshot(index):
+        return False
+
+    # keyed by type as well, so the text "160" and the number 160 stay apart
+    texts = {}
+    for _, _, _, value in index.cells:
+        texts.setdefault((type(value), value), len(texts))
+    encoded = [repr(value).encode("utf-8") if kind is float else str(value).encode("utf-8") for kind, value in texts]
+
+    columns = {
+        "cell_grid": np.array([cell[0] for cell in index.cells], dtype=np.int32),
+        "cell_row": np.array([cell[1] for cell in index.cells], dtype=np.int32),
+        "cell_slot": np.array([cell[2] for cell in index.cells], dtype=np.int32),
+        "cell_text": np.array([texts[type(cell[3]), cell[3]] for cell in index.cells], dtype=np.int32),
+        "text_offsets": np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64),
+        "text_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "text_kind": np.array([_CELL_TYPES.index(kind) for kind, _ in texts], dtype=np.uint8),
+    }
+
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        layout[name] = [offset, len(array)]
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    metadata = json.dumps({
+        "content_hash": index.content_hash,
+        "grids": [{"day": grid.day, "slots": grid.slots, "rooms": grid.rooms} for grid in index.grids],
+        "columns": layout,
+    }).encode("utf-8")
+    metadata += b" " * (-(_HEADER.size + len(metadata)) % _ALIGNMENT)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(metadata)))
+            f.write(metadata)
+            for array in columns.values():
+                data = array.tobytes()
+                f.write(data + b"\0" * (-len(data) % _ALIGNMENT))
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        logger.error(f"Error writing workbook snapshot {path}: {e}")
+        return False
+
+
+def read_snapshot(path: Path, content_hash: str) -> WorkbookIndex | None:
+    """
+    Map the snapshot of a workbook read-only and build its index.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path of the snapshot.
+    content_hash : str
+        The MD5 hash the snapshot must have been written for.
+
+    Returns
+    -------
+    WorkbookIndex or None
+        The index of the workbook, or None if there is no usable snapshot.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    except OSError as e:
+        logger.error(f"Error opening workbook snapshot {path}: {e}")
+        return None
+
+    try:
+        magic, version, metadata_length = _HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        data_start = _HEADER.size + metadata_length
+        metadata = json.loads(buffer[_HEADER.size : data_start])
+        if metadata["content_hash"] != content_hash:
+            return None
+
+        columns = {
+            name: np.frombuffer(buffer, dtype=dtype, count=metadata["columns"][name][1], offset=data_start + metadata["columns"][name][0])
+            for name, dtype in _CELL_COLUMNS.items()
+        }
+        grids = [DayGrid(grid["day"], grid["slots"], grid["rooms"]) for grid in metadata["grids"]]
+        return WorkbookIndex(content_hash, grids, SnapshotCells(buffer, columns))
+    except (struct.error, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Ignoring unreadable workbook snapshot {path}: {e}")
+        return None
+
+
+def parse_workbook(filename: str, content_hash: str) -> WorkbookIndex:
+    """
+    Parse a workbook and write its snapshot so later cold starts can map it instead.
+
+    If the snapshot cannot be written, an empty marker is written in its place.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file.
+    content_hash : str
+        The MD5 hash of the workbook.
+
+    Returns
+    -------
+    WorkbookIndex
+        The index of the workbook.
+    """
+    index = WorkbookIndex.from_file(filename, content_hash)
+    path = snapshot_path(filename, content_hash)
+    if not write_snapshot(index, path):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.with_suffix(SKIPPED_SUFFIX).touch()
+        except OSError as e:
+            logger.error(f"Error marking workbook snapshot {path} as skipped: {e}")
+    return index
+
+
+def load_workbook_index(filename: str, content_hash: str) -> WorkbookIndex:
+    """
+    Get the index of a workbook from its snapshot, parsing the workbook only if there is none.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file.
+    content_hash : str
+        The MD5 hash of the workbook.
+
+    Returns
+    -------
+    WorkbookIndex
+        The index of the workbook.
+    """
+    index = read_snapshot(snapshot_path(filename, content_hash), content_hash)
+    if index is None:
+        index = parse_workbook(filename, content_hash)
+    return index
+
+
+def prune_snapshots(folder: Path, keep: set) -> list:
+    """
+    Delete the snapshots, and the markers of skipped snapshots, of workbook versions that
+    are no longer in the drafts folder.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        The drafts folder.
+    keep : set
+        The content hashes of the current drafts.
+
+    Returns
+    -------
+    list
+        The paths of the deleted snapshots.
+    """
+    removed = []
+    paths = [path for suffix in (SNAPSHOT_SUFFIX, SKIPPED_SUFFIX) for path in (Path(folder) / SNAPSHOT_FOLDER).glob(f"*{suffix}")]
+    for path in paths:
+        if path.stem not in keep:
+            try:
+                path.unlink()
+                removed.append(path)
+            except OSError as e:
+                logger.error(f"Error deleting workbook snapshot {path}: {e}")
+    return removed
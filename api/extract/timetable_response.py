@@ -0,0 +1,255 @@
+import json
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from api.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def lectures_convert_to_24hour(time_str: str, previous_was_pm: bool = False) -> str:
+    """Convert time to 24-hour format based on class schedule rules."""
+    if not time_str or not time_str.strip():
+        raise ValueError("Time string cannot be empty")
+
+    try:
+        hours, minutes = map(int, time_str.strip().split(':'))
+    except ValueError as e:
+        raise e
+
+    if not previous_was_pm:
+        if 7 <= hours <= 11:
+                   return f"{hours}:{minutes:02d}"
+        elif hours == 12:
+                return f"12:{minutes:02d}"
+        else:
+            return f"{hours + 12}:{minutes:02d}"
+    else:
+        if hours == 12:
+            return f"12:{minutes:02d}"
+        elif hours <= 7:
+            return f"{hours + 12}:{minutes:02d}"
+        return f"{hours}:{minutes:02d}"
+
+
+def exams_convert_to_24hour(time_str: str, previous_was_pm: bool = False) -> str:
+    """Convert time to 24-hour format based on class schedule rules."""
+    if not time_str or not time_str.strip():
+        raise ValueError("Time string cannot be empty")
+
+    try:
+        time_str = time_str.strip().upper()
+        is_pm = 'PM' in time_str
+        time_clean = time_str.replace('AM', '').replace('PM', '').strip()
+        hours, minutes = map(int, time_clean.split(':'))
+
+        if is_pm and hours != 12:
+            hours += 12
+        elif not is_pm and hours == 12:
+            hours = 0
+
+        return f"{hours:02d}:{minutes:02d}"
+    except ValueError as e:
+        logger.error(f"Error converting time: {time_str} - {e}")
+        raise
+
+
+def shape_exam_table(json_data: list) -> list:
+    """Reshape the records of an exam table into one entry per exam, in 24-hour time."""
+    table_data = []
+    for entry in json_data:
+        date = entry.get('DATE')
+        if not date:
+            continue
+
+        try:
+            start_24h = exams_convert_to_24hour(entry.get('START', ''))
+            end_24h = exams_convert_to_24hour(entry.get('END', ''))
+        except ValueError as e:
+            logger.error(f"Invalid time format in exam entry: {entry} - {e}")
+            continue
+
+        table_data.append({
+            "day": date,
+            "data": [{
+                "start": start_24h,
+                "end": end_24h,
+                "value": entry.get('COURSE NAME', ''),
+                "class": entry.get('CLASS', ''),
+                "location": entry.get('LECTURE HALL', ''),
+                "invigilator": entry.get('INVIGILATOR (UPDATED)', '')
+            }]
+        })
+
+    return table_data
+
+
+def shape_lecture_table(json_data: list) -> list:
+    """Reshape the records of a lecture table into the slots of every day, merging consecutive equal slots."""
+    table_data = []
+    for index, day in enumerate(json_data):
+        day_data = []
+        current_slot = None
+        previous_was_pm = False
+
+        for key, value in day.items():
+            if not key or not isinstance(key, str):
+                continue
+
+            time_parts = key.split("-")
+            if len(time_parts) < 2:
+                continue
+
+            start = time_parts[0].strip()
+            end = time_parts[-1].strip()
+
+            if not start or not end:
+                continue
+
+            try:
+                start_24h = lectures_convert_to_24hour(start)
+                start_hour = int(start_24h.split(':')[0])
+                is_pm = start_hour >= 12
+                end_24h = lectures_convert_to_24hour(end, previous_was_pm)
+
+                if current_slot and current_slot["value"] == value and current_slot["end"] == start_24h:
+                    current_slot["end"] = end_24h
+                else:
+                    if current_slot:
+                        day_data.append(current_slot)
+                    current_slot = {"start": start_24h, "end": end_24h, "value": value}
+
+                previous_was_pm = is_pm
+            except ValueError as e:
+                logger.error(f"Error processing lecture time slot {key}: {e}")
+                continue
+
+        if current_slot:
+            day_data.append(current_slot)
+
+        table_data.append({"day": DAYS[index], "data": day_data})
+
+    return table_data
+
+
+@lru_cache(maxsize=64)
+def lecture_slots(columns: tuple) -> tuple:
+    """
+    Map the time slot headers of a lecture workbook to 24-hour start and end times, once per workbook.
+
+    Every class of a workbook shares the same headers, so the conversion of
+    `shape_lecture_table` runs once and is reused by every lookup.
+
+    Returns the positions of the usable slot columns, their start and end times, and
+    whether each slot starts when the previous one ends.
+    """
+    # the keys the records JSON of a table with these columns would have
+    keys = json.loads(pd.DataFrame([[None] * len(columns)], columns=list(columns)).to_json(orient="records"))[0]
+
+    positions, starts, ends = [], [], []
+    previous_was_pm = False
+    for position, key in enumerate(keys):
+        if not key or not isinstance(key, str):
+            continue
+
+        time_parts = key.split("-")
+        if len(time_parts) < 2:
+            continue
+
+        start = time_parts[0].strip()
+        end = time_parts[-1].strip()
+
+        if not start or not end:
+            continue
+
+        try:
+            start_24h = lectures_convert_to_24hour(start)
+            is_pm = int(start_24h.split(':')[0]) >= 12
+            end_24h = lectures_convert_to_24hour(end, previous_was_pm)
+        except ValueError as e:
+            logger.error(f"Error processing lecture time slot {key}: {e}")
+            continue
+
+        positions.append(position)
+        starts.append(start_24h)
+        ends.append(end_24h)
+        previous_was_pm = is_pm
+
+    starts = np.array(starts, dtype=object)
+    ends = np.array(ends, dtype=object)
+    return np.array(positions, dtype=np.intp), starts, ends, ends[:-1] == starts[1:]
+
+
+def shape_lecture_frame(table: pd.DataFrame) -> list:
+    """
+    Reshape a lecture table into the slots of every day, merging consecutive equal slots.
+
+    Produces the same data as `shape_lecture_table` on the records of the table, merging
+    slots as runs over the day by slot matrix instead of slot by slot.
+    """
+    positions, starts, ends, joins = lecture_slots(tuple(table.columns))
+    values = table.to_numpy(dtype=object)[:, positions]
+    values[pd.isna(values)] = None
+
+    # a slot continues the run of the previous one if it holds the same value and starts when it ends
+    continues = (values[:, 1:] == values[:, :-1]).astype(bool) & joins
+
+    table_data = []
+    for index, row in enumerate(values):
+        day_data = []
+        if len(row):
+            run_starts = np.concatenate(([0], np.flatnonzero(~continues[index]) + 1))
+            run_ends = np.append(run_starts[1:] - 1, len(row) - 1)
+            day_data = [
+                {"start": starts[start], "end": ends[end], "value": row[start]}
+                for start, end in zip(run_starts.tolist(), run_ends.tolist())
+            ]
+        table_data.append({"day": DAYS[index], "data": day_data})
+
+    return table_data
+
+
+def render_response(table_data: list, content_hash: str) -> bytes:
+    """
+    Serialize a timetable response exactly as FastAPI's JSONResponse would.
+
+    The bytes are cached and served as they are, so a cache hit does no JSON work.
+    """
+    return json.dumps(
+        {"data": table_data, "version": content_hash},
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+@timed("transform")
+def build_response(table: str, is_exam: bool, content_hash: str) -> bytes:
+    """Build the serialized response of a timetable from the records JSON of its table."""
+    json_data = json.loads(table)
+    table_data = shape_exam_table(json_data) if is_exam else shape_lecture_table(json_data)
+    return render_response(table_data, content_hash)
+
+
+@timed("transform")
+def lecture_response(table: pd.DataFrame, content_hash: str) -> bytes:
+    """Build the serialized response of a lecture timetable straight from its table."""
+    return render_response(shape_lecture_frame(table), content_hash)
+
+
+def with_version(body: bytes, old_hash: str, new_hash: str) -> bytes | None:
+    """
+    Move a serialized timetable response to a new version of its draft without decoding it.
+
+    Returns None if the response does not end with the old version, as `render_response` writes it.
+    """
+    old_tail = f',"version":"{old_hash}"}}'.encode("utf-8")
+    if not body.endswith(old_tail):
+        return None
+    return body[: -len(old_tail)] + f',"version":"{new_hash}"}}'.encode("utf-8")
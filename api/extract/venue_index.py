@@ -0,0 +1,195 @@
+import numpy as np
+import regex as re
+
+from api.extract.timetable_response import DAYS, lecture_slots
+from api.extract.workbook_index import WorkbookIndex, find_class_tokens
+
+_WHITESPACE = re.compile(r"\s+")
+
+# the lecturer written after the course number, e.g. "GM 1A 174  QUAICOE" or "CY 158 (P) APPIAH AGYARKO"
+_TRAILING_LECTURER = re.compile(r"\d{3}\s*(?:\([A-Za-z]+\)\s*)?([^\d()]*)$")
+_LECTURER_SEPARATOR = re.compile(r"\s*(?:/|&|,)\s*")
+
+
+def normalize_name(name) -> str:
+    """Collapse the whitespace of a room or lecturer name, or return '' if it is not a name."""
+    if not isinstance(name, str):
+        return ""
+    return _WHITESPACE.sub(" ", name).strip()
+
+
+def find_lecturers(text: str) -> list:
+    """
+    Find the lecturers of a timetable cell.
+
+    Lecturers are written on the last line of a cell, or after the course number when
+    the cell is a single line.
+
+    Parameters
+    ----------
+    text : str
+        The content of the cell.
+
+    Returns
+    -------
+    list
+        The names of the lecturers, in the order they are written. E.g. ['ADOMAKO-ANSAH', 'AGYEKUM']
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        names = lines[-1]
+    else:
+        match = _TRAILING_LECTURER.search(text)
+        if match is None:
+            return []
+        names = match.group(1)
+    return [name for name in map(normalize_name, _LECTURER_SEPARATOR.split(names)) if len(name) > 1]
+
+
+class VenueIndex:
+    """
+    The rooms and lecturers of a parsed lecture workbook, indexed for reverse lookups.
+
+    Every cell that holds a class becomes a booking of its room at its slot. The bookings
+    are grouped by room and by lecturer, and the occupancy of every room at every slot of
+    the week is kept as a boolean room by slot matrix, so occupancy, free rooms and
+    utilization are answered from precomputed tables instead of scanning the workbook.
+
+    Parameters
+    ----------
+    index : WorkbookIndex
+        The parsed workbook.
+    """
+
+    def __init__(self, index: WorkbookIndex):
+        self.content_hash = index.content_hash
+
+        # the (day, start, end) of every slot of the week, and the slot number of every sheet column
+        self.slots = []
+        slot_ids = {}
+        rooms = set()
+        for grid_id, grid in enumerate(index.grids):
+            if grid.day not in DAYS:
+                continue
+            positions, starts, ends, _ = lecture_slots(tuple(grid.slots))
+            for position, start, end in zip(positions.tolist(), starts, ends):
+                slot_ids[(grid_id, position)] = len(self.slots)
+                self.slots.append((grid.day, start, end))
+            rooms.update(filter(None, map(normalize_name, grid.rooms)))
+
+        self.rooms = sorted(rooms)
+        room_ids = {room: i for i, room in enumerate(self.rooms)}
+        self._slot_ids = {(day, start): i for i, (day, start, _) in enumerate(self.slots)}
+
+        # the bookings, with the room and slot number of each booking alongside
+        self.bookings = []
+        self.booking_rooms = []
+        self.booking_slots = []
+        self._room_bookings = {room: [] for room in self.rooms}
+        self._lecturer_bookings = {}
+        self.occupied = np.zeros((len(self.rooms), len(self.slots)), dtype=bool)
+        for grid_id, row, slot, value in index.cells:
+            slot_id = slot_ids.get((grid_id, slot))
+            room = normalize_name(index.grids[grid_id].rooms[row])
+            if slot_id is None or not room or not isinstance(value, str):
+                continue
+            classes = find_class_tokens(value)
+            if not classes:
+                continue
+
+            day, start, end = self.slots[slot_id]
+            lecturers = find_lecturers(value)
+            booking = {
+                "day": day,
+                "start": start,
+                "end": end,
+                "room": room,
+                "value": normalize_name(value),
+                "classes": sorted(classes),
+                "lecturers": lecturers,
+            }
+            self.bookings.append(booking)
+            self.booking_rooms.append(room_ids[room])
+            self.booking_slots.append(slot_id)
+            self._room_bookings[room].append(booking)
+            for lecturer in lecturers:
+                self._lecturer_bookings.setdefault(lecturer.casefold(), (lecturer, []))[1].append(booking)
+            self.occupied[room_ids[room], slot_id] = True
+
+        self._free_rooms = [
+            [self.rooms[i] for i in np.flatnonzero(~self.occupied[:, slot_id]).tolist()]
+            for slot_id in range(len(self.slots))
+        ]
+        booked_slots = self.occupied.sum(axis=1).tolist()
+        self._utilization = [
+            {
+                "room": room,
+                "booked_slots": booked,
+                "total_slots": len(self.slots),
+                "utilization": round(booked / len(self.slots), 4) if self.slots else 0.0,
+            }
+            for room, booked in zip(self.rooms, booked_slots)
+        ]
+
+    def room_occupancy(self, room: str) -> list | None:
+        """
+        Get the bookings of a room over the week.
+
+        Parameters
+        ----------
+        room : str
+            The name of the room. E.g. 'LH 1'
+
+        Returns
+        -------
+        list or None
+            The bookings of the room, ordered by day and slot, or None if there is no such room.
+        """
+        return self._room_bookings.get(normalize_name(room))
+
+    def free_rooms(self, day: str, start: str) -> list | None:
+        """
+        Get the rooms that are free during a slot.
+
+        Parameters
+        ----------
+        day : str
+            The day of the slot. E.g. 'Monday'
+        start : str
+            The 24-hour start time of the slot, as in the timetable responses. E.g. '7:00' or '13:30'
+
+        Returns
+        -------
+        list or None
+            The names of the free rooms, sorted, or None if there is no such slot.
+        """
+        hours, _, minutes = start.strip().partition(":")
+        slot_id = self._slot_ids.get((day.title(), f"{hours.lstrip('0') or '0'}:{minutes}"))
+        if slot_id is None:
+            return None
+        return self._free_rooms[slot_id]
+
+    def utilization(self) -> list:
+        """Get the number of booked slots of every room and the share of the week it is in use, by room name."""
+        return self._utilization
+
+    def lecturers(self) -> list:
+        """Get the name of every lecturer in the workbook, sorted."""
+        return sorted(name for name, _ in self._lecturer_bookings.values())
+
+    def lecturer_occupancy(self, lecturer: str) -> list | None:
+        """
+        Get the bookings of a lecturer over the week.
+
+        Parameters
+        ----------
+        lecturer : str
+            The name of the lecturer, in any case. E.g. 'Quaicoe'
+
+        Returns
+        -------
+        list or None
+            The bookings of the lecturer, ordered by day and slot, or None if there is no such lecturer.
+        """
+        entry = self._lecturer_bookings.get(normalize_name(lecturer).casefold())
+        return None if entry is None else entry[1]
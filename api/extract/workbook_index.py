@@ -0,0 +1,322 @@
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import regex as re
+
+from api.cache.registry import draft_registry
+from api.extract.content_hash import file_content_hash
+from api.extract.extract_lectures_table import (
+    _get_time_row,
+    _iter_daily_frames,
+    compile_class_pattern,
+)
+from api.metrics import timed
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# number of parsed workbooks kept in memory, keyed by content hash
+MAX_CACHED_WORKBOOKS = 8
+
+_LETTERS = re.compile(r"[^\W\d_]+")
+_DIGITS = re.compile(r"\d+")
+_WHITESPACE = re.compile(r"\s+")
+_DEPT_SEPARATOR = re.compile(r"\s*[,/]\s*")
+
+# course codes such as "EL 3B", "EL 372", "MC 3A, MC 3B" or "CE/RN 459"
+_COURSE_CODE = re.compile(
+    r"(?<![A-Za-z])((?:[A-Z]{2,3}\s*[,/]\s*)*[A-Z]{2,3})\s*([1-9])(?:[A-Z]|\d{2})(?![A-Za-z0-9])"
+)
+
+
+def find_class_tokens(text: str) -> set:
+    """
+    Find the classes mentioned in a timetable cell.
+
+    Parameters
+    ----------
+    text : str
+        The content of the cell.
+
+    Returns
+    -------
+    set
+        The "dept year" class tokens in the cell. E.g. {'EL 3', 'CE 4'}
+    """
+    tokens = set()
+    for match in _COURSE_CODE.finditer(text):
+        for dept in _DEPT_SEPARATOR.split(match.group(1)):
+            tokens.add(f"{dept} {match.group(2)}")
+    return tokens
+
+
+class NotALectureTimetable(ValueError):
+    """Raised when a workbook has no lecture grid to index, such as an exam timetable."""
+
+
+class DayGrid:
+    """
+    The normalized grid of a single day sheet.
+
+    Parameters
+    ----------
+    day : str
+        The name of the sheet.
+    slots : list
+        The time slot headers of the sheet, in column order.
+    rooms : list
+        The classroom of every row below the time row, in row order.
+    """
+
+    def __init__(self, day: str, slots: list, rooms: list):
+        self.day = day
+        self.slots = slots
+        self.rooms = rooms
+
+
+class WorkbookIndex:
+    """
+    A parsed lecture workbook that serves class lookups from memory.
+
+    Every non-empty cell of every day sheet is stored once as a (day, room, slot, text)
+    entry, ordered by day, slot and room. An inverted index from the letter and digit
+    tokens of each cell to the cells containing them narrows a class lookup down to a
+    handful of candidates before the class expression is applied.
+
+    Parameters
+    ----------
+    content_hash : str
+        The MD5 hash of the workbook the index was built from.
+    grids : list of DayGrid
+        The grid of every sheet, in workbook order.
+    cells : list of tuple
+        The (grid, row, slot, value) entry of every non-empty cell.
+    """
+
+    def __init__(self, content_hash: str, grids: list, cells: list):
+        self.content_hash = content_hash
+        self.grids = grids
+        self.cells = cells
+
+        self._letter_tokens = {}
+        self._digit_tokens = {}
+        for cell_id, (_, _, _, value) in enumerate(cells):
+            text = str(value)
+            for token in _LETTERS.findall(text):
+                self._letter_tokens.setdefault(token.casefold(), set()).add(cell_id)
+            for token in _DIGITS.findall(text):
+                self._digit_tokens.setdefault(token, set()).add(cell_id)
+
+    @classmethod
+    def from_frames(cls, frames: dict, content_hash: str) -> "WorkbookIndex":
+        """
+        Build the index from the raw sheet dataframes of a workbook.
+
+        Parameters
+        ----------
+        frames : dict or iterable
+            The raw dataframe of every sheet, as returned by `_read_daily_frames`, or
+            the (sheet, dataframe) pairs streamed by `_iter_daily_frames`.
+        content_hash : str
+            The MD5 hash of the workbook.
+
+        Returns
+        -------
+        WorkbookIndex
+            The index of the workbook.
+        """
+        grids = []
+        cells = []
+        for sheet, df in frames.items() if isinstance(frames, dict) else frames:
+            time_row = _get_time_row(df)
+            if time_row is None:
+                raise NotALectureTimetable(f"No time row found in sheet: {sheet}")
+
+            body = df.iloc[time_row[0] + 1 :]
+            grid = DayGrid(
+                day=sheet,
+                slots=time_row[1].to_list()[1:],
+                rooms=body.iloc[:, 0].to_list(),
+            )
+
+            values = body.iloc[:, 1:].to_numpy(dtype=object)
+            slot_ids, row_ids = np.nonzero(pd.notna(values).T)
+            grid_id = len(grids)
+            cells.extend(
+                (grid_id, row, slot, values[row, slot])
+                for slot, row in zip(slot_ids.tolist(), row_ids.tolist())
+            )
+            grids.append(grid)
+
+        return cls(content_hash, grids, cells)
+
+    @classmethod
+    def from_file(cls, filename: str, content_hash: str | None = None) -> "WorkbookIndex":
+        """Parse a workbook from disk and build its index."""
+        if content_hash is None:
+            content_hash = file_content_hash(filename)
+        return cls.from_frames(_iter_daily_frames(filename), content_hash)
+
+    def _candidates(self, class_pattern: str):
+        """Get the cells that may match a class, or None if every cell must be searched."""
+        dept, year = class_pattern.split()
+        if not (dept.isascii() and dept.isalpha() and year.isascii() and year.isdigit()):
+            return None
+
+        dept = dept.casefold()
+        candidates = set()
+        for token, cell_ids in self._letter_tokens.items():
+            if dept in token:
+                candidates |= cell_ids
+        with_year = set()
+        for token, cell_ids in self._digit_tokens.items():
+            if year in token:
+                with_year |= cell_ids
+        return candidates & with_year
+
+    @timed("match")
+    def match(self, class_pattern: str) -> list:
+        """
+        Get the cells that belong to a class.
+
+        Parameters
+        ----------
+        class_pattern : str
+            The class to look up. E.g. 'EL 3'
+
+        Returns
+        -------
+        list
+            The ids of the matching cells, ordered by day, slot and room.
+        """
+        expression = compile_class_pattern(class_pattern)
+        candidates = self._candidates(class_pattern)
+        cell_ids = range(len(self.cells)) if candidates is None else sorted(candidates)
+        return [i for i in cell_ids if expression.search(str(self.cells[i][3]))]
+
+    def class_tokens(self) -> list:
+        """Get every distinct class mentioned in the workbook, sorted."""
+        tokens = set()
+        for _, _, _, value in self.cells:
+            if isinstance(value, str):
+                tokens |= find_class_tokens(value)
+        return sorted(tokens)
+
+    @cached_property
+    def venues(self):
+        """The room and lecturer index of the workbook, built on first use and kept with the workbook."""
+        from api.extract.venue_index import VenueIndex
+
+        return VenueIndex(self)
+
+    def _columns(self) -> pd.Index:
+        for grid in self.grids:
+            if grid.day.title() in DAYS:
+                return pd.Index(grid.slots, dtype=object)
+        raise ValueError(f"No sheet found for any of the days: {DAYS}")
+
+    def time_table(self, class_pattern: str) -> pd.DataFrame:
+        """
+        Get the complete time table for a class for all days.
+
+        Parameters
+        ----------
+        class_pattern : str
+            The class to get the complete time table for. E.g. 'EL 3'
+
+        Returns
+        -------
+        pandas.DataFrame
+            The complete time table, identical to the one built from the raw sheets.
+        """
+        columns = self._columns()
+
+        groups = {}
+        for cell_id in self.match(class_pattern):
+            grid_id, _, slot, _ = self.cells[cell_id]
+            groups.setdefault((grid_id, slot), []).append(cell_id)
+
+        entries = []
+        for (grid_id, slot), cell_ids in groups.items():
+            grid = self.grids[grid_id]
+            values = [self.cells[i][3] for i in cell_ids]
+            if not any(values):
+                continue
+            lines = [
+                f"{_WHITESPACE.sub(' ', value.strip())} ({grid.rooms[self.cells[i][1]]})"
+                for i, value in zip(cell_ids, values)
+            ]
+            entries.append((grid, slot, "\n".join(lines)))
+
+        column_positions = {label: i for i, label in enumerate(columns)}
+        if columns.is_unique and all(
+            grid.day in DAYS
+            and len(set(grid.slots)) == len(grid.slots)
+            and grid.slots[slot] in column_positions
+            for grid, slot, _ in entries
+        ):
+            matrix = np.full((len(DAYS), len(columns)), np.nan, dtype=object)
+            for grid, slot, text in entries:
+                matrix[DAYS.index(grid.day), column_positions[grid.slots[slot]]] = text
+            return pd.DataFrame(matrix, index=DAYS, columns=columns)
+
+        # sheets that do not line up with the day rows fall back to label assignment
+        final_df = pd.DataFrame(columns=columns, index=DAYS)
+        for grid, slot, text in entries:
+            final_df.loc[grid.day, grid.slots[slot]] = text
+        return final_df
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_workbook_index(content_hash: str) -> WorkbookIndex | None:
+    """Get an already parsed workbook index by content hash, if it is in memory."""
+    with _cache_lock:
+        index = _cache.get(content_hash)
+        if index is not None:
+            _cache.move_to_end(content_hash)
+        return index
+
+
+def add_workbook_index(index: WorkbookIndex):
+    """Keep a parsed workbook index in memory, evicting the least recently used ones."""
+    with _cache_lock:
+        _cache[index.content_hash] = index
+        _cache.move_to_end(index.content_hash)
+        while len(_cache) > MAX_CACHED_WORKBOOKS:
+            _cache.popitem(last=False)
+
+
+def get_workbook_index(filename: str, content_hash: str | None = None) -> WorkbookIndex:
+    """
+    Get the index of a workbook, parsing it only if its content has not been seen before.
+
+    A workbook that is not in memory is mapped from its snapshot when one was written for
+    its content, and parsed otherwise. Without a content hash, the draft registry gets it
+    from the stat signature of the file, so a lookup of a parsed workbook reads no Excel.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the excel file.
+    content_hash : str, optional
+        The MD5 hash of the workbook, if the caller already has it.
+
+    Returns
+    -------
+    WorkbookIndex
+        The index of the workbook.
+    """
+    from api.extract.snapshot import load_workbook_index
+
+    if content_hash is None:
+        content_hash = draft_registry.content_hash(filename)
+    index = cached_workbook_index(content_hash)
+    if index is None:
+        index = load_workbook_index(filename, content_hash)
+        add_workbook_index(index)
+    return index
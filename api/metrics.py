@@ -0,0 +1,186 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+load_dotenv()
+
+class MetricsSettings(BaseSettings):
+    METRICS_ENABLED: bool = True  # Time the stages of every request and serve them on /metrics
+    SERVER_TIMING_ENABLED: bool = False  # Add the stage timings of every request to its Server-Timing header
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = MetricsSettings()
+
+# Upper bounds of the latency histograms, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """A Prometheus histogram with one label, observed from any thread."""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: tuple = BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float):
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list:
+        """The lines of the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: (list(counts), total) for value, (counts, total) in self._series.items()}
+        for value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+stage_seconds = Histogram("easechaos_stage_seconds", "Time spent in each stage of serving a timetable.", "stage")
+request_seconds = Histogram("easechaos_request_seconds", "Time to the end of each response, by route.", "route")
+
+# Stages are timed while either the metrics or the Server-Timing header is enabled
+enabled = settings.METRICS_ENABLED or settings.SERVER_TIMING_ENABLED
+
+# The stage timings of the current request, while its Server-Timing header is collected
+_request_stages = ContextVar("request_stages", default=None)
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        stage_seconds.observe(self.name, seconds)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0.0) + seconds
+        return False
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+def stage(name: str):
+    """
+    Time a block as a stage of the current request.
+
+    The time is added to the stage histogram and, when enabled, to the Server-Timing header
+    of the request. While timing is disabled the block runs under a shared no-op context.
+    """
+    return _Stage(name) if enabled else _NO_STAGE
+
+def timed(name: str):
+    """
+    Time every call of a function or coroutine function as a stage.
+
+    Whether to time is decided when the function is decorated, so a disabled timer leaves
+    the function as it is.
+    """
+    def decorate(func):
+        if not enabled:
+            return func
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                with _Stage(name):
+                    return await func(*args, **kwargs)
+            return timed_coroutine
+
+        @functools.wraps(func)
+        def timed_function(*args, **kwargs):
+            with _Stage(name):
+                return func(*args, **kwargs)
+        return timed_function
+    return decorate
+
+def server_timing(stages: dict, total_seconds: float) -> str:
+    """The Server-Timing header of the stages of a request, in milliseconds."""
+    metrics = [f"{name};dur={seconds * 1e3:.3f}" for name, seconds in stages.items()]
+    metrics.append(f"total;dur={total_seconds * 1e3:.3f}")
+    return ", ".join(metrics)
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request by route and, when enabled, send its stage timings in a Server-Timing header.
+
+    The header is added when the response starts, so the stages of a streamed body that run
+    after it are only counted in the histograms.
+    """
+
+    def __init__(self, app, server_timing: bool = settings.SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        stages = {} if self.server_timing else None
+        token = _request_stages.set(stages)
+
+        async def send_with_timing(message):
+            if stages is not None and message["type"] == "http.response.start":
+                header = server_timing(stages, time.perf_counter() - started)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send if stages is None else send_with_timing)
+        finally:
+            _request_stages.reset(token)
+            # Every route has a fixed path, so paths only label the requests that matched one
+            route = scope["path"] if "endpoint" in scope else "unmatched"
+            request_seconds.observe(route, time.perf_counter() - started)
+
+def render_metrics(cache_stats: list) -> str:
+    """Render the stage and request histograms and the counters of the cache tiers in the Prometheus text format."""
+    lines = [*stage_seconds.render(), *request_seconds.render()]
+    for counter in ("hits", "misses", "evictions", "errors"):
+        name = f"easechaos_cache_{counter}_total"
+        lines.append(f"# HELP {name} Cache {counter} of each cache tier.")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f'{name}{{tier="{stats.tier}"}} {getattr(stats, counter)}' for stats in cache_stats)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api import executors
+
+load_dotenv()
+
+class ProfilerSettings(BaseSettings):
+    PROFILER_TOKEN: str = ""  # Admin token of the profiler endpoint, which is disabled while this is empty
+    PROFILER_INTERVAL_MS: float = 5.0  # Default time between two samples
+    PROFILER_MAX_SECONDS: float = 120.0  # Longest profile, in either mode
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = ProfilerSettings()
+
+# Innermost frames of threads that are waiting rather than working, so their samples are dropped
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "wait"),
+}
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+@functools.lru_cache(maxsize=4096)
+def _short_filename(filename: str) -> str:
+    """A file relative to the longest entry of sys.path that contains it, like the module it defines."""
+    folders = [folder for folder in sys.path if folder and filename.startswith(os.path.join(folder, ""))]
+    return os.path.relpath(filename, max(folders, key=len)) if folders else filename
+
+def frame_name(code) -> str:
+    """The name of a function in a stack, with its file and first line."""
+    return f"{code.co_name} ({_short_filename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Sample the Python stacks of every thread of this process from a background thread.
+
+    Samples of a thread whose innermost frame is waiting (for I/O, a lock or a queue) are
+    dropped, so the profile shows where the threads spent CPU and blocking calls.
+    Identical stacks are counted together.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.sample_count += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (code.co_filename.rpartition("/")[2], code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.samples[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, one `thread;outer;...;inner count` line per stack, for flame graph tools."""
+        stacks = Counter()
+        for (thread, stack), count in self.samples.items():
+            stacks[";".join([thread, *map(frame_name, stack)])] += count
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def speedscope(self, name: str) -> dict:
+        """The samples as a speedscope file, with one sampled profile per thread weighted in seconds."""
+        frames = {}
+        profiles = {}
+        for (thread, stack), count in sorted(self.samples.items(), key=lambda item: item[0][0]):
+            profile = profiles.setdefault(thread, {"samples": [], "weights": []})
+            profile["samples"].append([frames.setdefault(frame_name(code), len(frames)) for code in stack])
+            profile["weights"].append(count * self.interval_seconds)
+
+        duration = (self.stopped or time.perf_counter()) - self.started
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "easechaos",
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    **profile,
+                }
+                for thread, profile in profiles.items()
+            ],
+        }
+
+class ProfileSession:
+    """A running profile, ended after a wall-clock window or a number of profiled requests."""
+
+    def __init__(self, interval_seconds: float, requests: int | None):
+        self.profiler = SamplingProfiler(interval_seconds)
+        self.requests_left = requests
+        self.requests_done = 0
+        self._done = asyncio.Event()
+
+    def request_done(self):
+        self.requests_done += 1
+        if self.requests_left is not None:
+            self.requests_left -= 1
+            if self.requests_left <= 0:
+                self._done.set()
+
+    async def wait(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._done.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+# The running profile of this process, if any
+session = None
+
+def request_done():
+    """Count a finished timetable request towards the running profile, if there is one."""
+    if session is not None:
+        session.request_done()
+
+async def profile(seconds: float, requests: int | None = None, interval_seconds: float | None = None) -> SamplingProfiler:
+    """
+    Sample this process for a wall-clock window, or until a number of timetable requests finished within it.
+
+    While the profile runs, drafts are parsed on the I/O threads of this process instead of
+    the parse pool, so their pandas and openpyxl frames are sampled as well.
+
+    Raises ProfilerBusy if another profile is running.
+    """
+    global session
+    if session is not None:
+        raise ProfilerBusy("A profile is already running")
+
+    session = ProfileSession(interval_seconds or settings.PROFILER_INTERVAL_MS / 1e3, requests)
+    executors.parse_inline = True
+    session.profiler.start()
+    try:
+        await session.wait(seconds)
+    finally:
+        profiler = session.profiler
+        await asyncio.to_thread(profiler.stop)
+        executors.parse_inline = False
+        session = None
+    return profiler
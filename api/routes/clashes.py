@@ -0,0 +1,74 @@
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic_settings import BaseSettings
+from api.cache.memory import response_cache
+from api.executors import ParseQueueFull, run_io
+from api.routes.timetable import get_exam_index, get_workbook_index, resolve_draft
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+class ClashSettings(BaseSettings):
+    CLASH_MAX_PAPERS_PER_DAY: int = 2  # Papers a class may write on one exam day before it is reported
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = ClashSettings()
+
+def _lecture_report(index) -> bytes:
+    from api.extract.clashes import lecture_clashes
+
+    report = {"version": index.content_hash, **lecture_clashes(index.venues)}
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _exam_report(index, max_papers_per_day: int) -> bytes:
+    from api.extract.clashes import exam_clashes
+
+    report = {"version": index.content_hash, "max_papers_per_day": max_papers_per_day, **exam_clashes(index, max_papers_per_day)}
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+@router.get("/clashes")
+async def clashes_endpoint(filename: str, is_exam: bool = False, max_papers_per_day: int | None = Query(default=None, ge=1)):
+    """
+    Endpoint for the clash report of a whole draft: double-booked classes and rooms of a lecture
+    timetable, or same-period papers and overloaded days of an exam timetable
+    """
+    if max_papers_per_day is None:
+        max_papers_per_day = settings.CLASH_MAX_PAPERS_PER_DAY
+
+    base_filename, file_path, content_hash = await resolve_draft(filename)
+
+    # Reports are computed once per draft version and dropped with its other cached responses
+    response_cache.track_version(base_filename, content_hash)
+    report_key = (base_filename, content_hash, "clashes", is_exam, max_papers_per_day if is_exam else None)
+    body = response_cache.get(report_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
+    from api.extract.extract_exam_table import NotAnExamTimetable
+    from api.extract.workbook_index import NotALectureTimetable
+
+    try:
+        if is_exam:
+            index = await get_exam_index(file_path, content_hash)
+            body = await run_io(_exam_report, index, max_papers_per_day)
+        else:
+            index = await get_workbook_index(file_path, content_hash)
+            body = await run_io(_lecture_report, index)
+    except ParseQueueFull as e:
+        logger.error(f"Rejected clash report, parser is busy: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The timetable parser is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except (NotAnExamTimetable, NotALectureTimetable) as e:
+        logger.error(f"Error finding clashes in {filename}: {e}")
+        raise HTTPException(status_code=422, detail=f"{filename} is not a{'n exam' if is_exam else ' lecture'} timetable")
+
+    response_cache.set(report_key, body, size=len(body))
+    return Response(content=body, media_type="application/json")
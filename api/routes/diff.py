@@ -0,0 +1,92 @@
+import json
+import logging
+import re
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, HTTPException, Response
+from api.cache.memory import response_cache
+from api.executors import ParseQueueFull, run_io
+from api.routes.timetable import get_workbook_index, resolve_draft
+
+if TYPE_CHECKING:
+    from api.extract.workbook_index import WorkbookIndex
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Versions are the MD5 hashes of drafts, and name their snapshot files
+VERSION_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+def _previous_version(file_path: str, content_hash: str) -> "WorkbookIndex | None":
+    """Get an earlier version of a draft from memory or from its snapshot, if it is still available."""
+    from api.extract.snapshot import read_snapshot, snapshot_path
+    from api.extract.workbook_index import cached_workbook_index
+
+    return cached_workbook_index(content_hash) or read_snapshot(snapshot_path(file_path, content_hash), content_hash)
+
+def _diff_report(old: "WorkbookIndex", new: "WorkbookIndex", class_pattern: str | None) -> bytes:
+    from api.extract.draft_diff import DraftDiff
+
+    diff = DraftDiff(old, new)
+    report = {"version": new.content_hash, "since": old.content_hash, "structural": diff.structural}
+    if class_pattern is None:
+        classes = sorted(set(old.class_tokens()) | set(new.class_tokens()))
+        changed = diff.changed_classes(classes)
+        report.update({"change_count": len(diff.changes), "changed_classes": changed, "changes": diff.changes})
+    else:
+        changes = diff.class_changes(class_pattern)
+        report.update({
+            "class_pattern": class_pattern,
+            "changed": diff.structural or bool(changes),
+            "change_count": len(changes),
+            "changes": changes,
+        })
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+@router.get("/diff")
+async def diff_endpoint(filename: str, since: str | None = None, base: str | None = None, class_pattern: str | None = None):
+    """
+    Endpoint for the cells and classes that changed in a lecture draft, either since an earlier
+    version of the same draft or compared to another draft
+    """
+    if (since is None) == (base is None):
+        raise HTTPException(status_code=422, detail="Give either the version to diff since or the base draft to diff against")
+    if since is not None and not VERSION_PATTERN.fullmatch(since):
+        raise HTTPException(status_code=422, detail="since must be the version of a draft, a 32-character MD5 hash")
+    if class_pattern is not None and len(class_pattern.split()) != 2:
+        raise HTTPException(status_code=422, detail="class_pattern must be a department and a year, e.g. EL 3")
+
+    base_filename, file_path, content_hash = await resolve_draft(filename)
+    if base is not None:
+        _, base_path, since = await resolve_draft(base)
+
+    response_cache.track_version(base_filename, content_hash)
+    report_key = (base_filename, content_hash, "diff", since, class_pattern and class_pattern.replace(" ", ""))
+    body = response_cache.get(report_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
+    from api.extract.workbook_index import NotALectureTimetable
+
+    try:
+        new = await get_workbook_index(file_path, content_hash)
+        if base is not None:
+            old = await get_workbook_index(base_path, since)
+        else:
+            old = await run_io(_previous_version, file_path, since)
+            if old is None:
+                raise HTTPException(status_code=404, detail=f"Version {since} of {filename} is no longer available")
+        body = await run_io(_diff_report, old, new, class_pattern)
+    except ParseQueueFull as e:
+        logger.error(f"Rejected draft diff, parser is busy: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The timetable parser is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except NotALectureTimetable as e:
+        logger.error(f"Error diffing {filename}: {e}")
+        raise HTTPException(status_code=422, detail="Diffs are only available for lecture timetables")
+
+    response_cache.set(report_key, body, size=len(body))
+    return Response(content=body, media_type="application/json")
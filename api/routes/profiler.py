@@ -0,0 +1,47 @@
+import hmac
+import json
+import logging
+from typing import Literal
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from api import profiler
+from api.profiler import ProfilerBusy, settings
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+def check_admin_token(token: str | None):
+    """Reject requests without the admin token, and hide the endpoint while no token is configured."""
+    if not settings.PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode("utf-8"), settings.PROFILER_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profile")
+async def profile_endpoint(
+    seconds: float = Query(default=10.0, gt=0),
+    requests: int | None = Query(default=None, ge=1),
+    output_format: Literal["collapsed", "speedscope"] = Query(default="collapsed", alias="format"),
+    interval_ms: float | None = Query(default=None, ge=1, le=1000),
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Admin endpoint for sampling this worker for a number of seconds, or until the given number
+    of timetable requests finished, and returning the stacks it spent its time in
+    """
+    check_admin_token(x_admin_token)
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"Profiles are limited to {settings.PROFILER_MAX_SECONDS:g} seconds")
+
+    try:
+        result = await profiler.profile(seconds, requests, interval_ms and interval_ms / 1e3)
+    except ProfilerBusy as e:
+        logger.error(f"Rejected profile: {e}")
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+
+    headers = {"X-Profile-Samples": str(result.sample_count)}
+    if output_format == "speedscope":
+        body = json.dumps(result.speedscope("easeCHAOS worker profile"), separators=(",", ":"))
+        headers["Content-Disposition"] = 'attachment; filename="profile.speedscope.json"'
+        return Response(content=body, media_type="application/json", headers=headers)
+    return Response(content=result.collapsed(), media_type="text/plain", headers=headers)
@@ -1,25 +1,46 @@
 import os
 import logging
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from api.extract.extract_lectures_table import get_time_table
-from api.extract.extract_exam_table import get_exam_timetable
-import json
+from pydantic_settings import BaseSettings
+from urllib.parse import quote
+from api.executors import ParseQueueFull, run_io, run_parse
+from api.cache.singleflight import SingleFlight
+from api.cache.memory import CacheStats, response_cache
+from api.cache.registry import draft_registry
+from api.cache.shared import build_lock, shared_store
+from api.metrics import stage
+from api import profiler
 from pathlib import Path
-import hashlib
+from datetime import date
+from typing import TYPE_CHECKING
+import asyncio
+import json
 
-from api.config.database import (
-    get_table_from_cache,
-    add_table_to_cache,
-    create_cache_table,
-)
+from api.cache.backends import cache_backend
 
 current_script_path = Path(__file__)
 project_root_path = current_script_path.parents[1]
 DRAFTS_FOLDER = project_root_path / "drafts"
 
+# pandas, openpyxl and the other parsing libraries load on the first parse, not when the app starts
+if TYPE_CHECKING:
+    from api.extract.extract_exam_table import ExamIndex
+    from api.extract.workbook_index import WorkbookIndex
+
 router = APIRouter()
 
+class TimetableSettings(BaseSettings):
+    HTTP_MAX_AGE_SECONDS: int = 60  # How long clients and CDNs may reuse a timetable without revalidating
+    BATCH_MAX_CLASSES: int = 500  # Classes allowed in one batch request
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = TimetableSettings()
+
 class TimeTableRequest(BaseModel):
     """
     Represents a request for a timetable (lecture or exam).
@@ -28,166 +49,401 @@ class TimeTableRequest(BaseModel):
     class_pattern: str
     is_exam: bool = False
 
-def get_json_table(request: TimeTableRequest):
+class BatchClass(BaseModel):
+    """
+    A class in a batch timetable request.
+    """
+    class_pattern: str
+    is_exam: bool = False
+
+class BatchTimeTableRequest(BaseModel):
+    """
+    Represents a request for the timetables of many classes from one file.
+    """
+    filename: str
+    classes: list[BatchClass]
+
+def _exam_response(index: "ExamIndex", class_pattern: str) -> bytes:
+    """Build the serialized response of an exam timetable from a preprocessed exam workbook."""
+    from api.extract.timetable_response import build_response
+
+    table = index.lookup(class_pattern).to_json(orient="records")
+    return build_response(table, True, index.content_hash)
+
+def _lecture_response(index: "WorkbookIndex", class_pattern: str) -> bytes:
+    """Build the serialized response of a lecture timetable from a parsed workbook."""
+    from api.extract.timetable_response import lecture_response
+
+    return lecture_response(index.time_table(class_pattern), index.content_hash)
+
+# Concurrent cold builds of the same workbook or class share a single build
+_builds = SingleFlight()
+
+# Lookups in the shared cache backend, behind the in-process response cache
+l2_stats = CacheStats("l2")
+
+async def _parse_workbook(full_path: str, content_hash: str) -> "WorkbookIndex":
+    from api.extract.snapshot import parse_workbook, read_snapshot, snapshot_path, snapshot_skipped
+    from api.extract.workbook_index import add_workbook_index
+
+    # Map the snapshot written by an earlier parse, in this or another worker, before parsing
+    path = snapshot_path(full_path, content_hash)
+    with stage("snapshot_read"):
+        index = await run_io(read_snapshot, path, content_hash)
+    skipped = index is None and await run_io(snapshot_skipped, full_path, content_hash)
+    if index is None and not skipped:
+        # One worker of the host parses, the others wait for it and map its snapshot
+        async with build_lock(full_path, content_hash) as locked:
+            if locked:
+                with stage("snapshot_read"):
+                    index = await run_io(read_snapshot, path, content_hash)
+                skipped = index is None and await run_io(snapshot_skipped, full_path, content_hash)
+            if index is None and not skipped:
+                with stage("parse"):
+                    index = await run_parse(parse_workbook, full_path, content_hash)
+    if index is None:
+        # The parse that held the lock wrote no snapshot, so the lock would only queue the parses of the others
+        with stage("parse"):
+            index = await run_parse(parse_workbook, full_path, content_hash)
+    add_workbook_index(index)
+    return index
+
+async def get_workbook_index(full_path: str, content_hash: str) -> "WorkbookIndex":
+    """Get the parsed lecture workbook, mapping its snapshot or parsing it in the process pool on first use."""
+    from api.extract.workbook_index import cached_workbook_index
+
+    index = cached_workbook_index(content_hash)
+    if index is None:
+        index = await _builds.do(
+            ("workbook", content_hash),
+            lambda: _parse_workbook(full_path, content_hash),
+        )
+    return index
+
+async def _parse_exams(full_path: str, content_hash: str) -> "ExamIndex":
+    from api.extract.extract_exam_table import ExamIndex, add_exam_index
+
+    with stage("parse"):
+        index = await run_parse(ExamIndex.from_file, full_path, content_hash)
+    add_exam_index(index)
+    return index
+
+async def get_exam_index(full_path: str, content_hash: str) -> "ExamIndex":
+    """Get the preprocessed exam workbook, reading it in the process pool on first use."""
+    from api.extract.extract_exam_table import cached_exam_index
+
+    index = cached_exam_index(content_hash)
+    if index is None:
+        index = await _builds.do(
+            ("exams", content_hash),
+            lambda: _parse_exams(full_path, content_hash),
+        )
+    return index
+
+async def _build_response(request: TimeTableRequest, base_filename: str, full_path: str, content_hash: str) -> bytes:
+    """
+    Build a serialized response and add it to the cache, holding the cross-process build lock for its key.
+    """
+    kind = "exam" if request.is_exam else "lecture"
+    lock_key = f"timetable:{content_hash}:{request.class_pattern.replace(' ', '')}:{kind}"
+
+    async with cache_backend.lock(lock_key) as locked:
+        if locked:
+            # Another worker may have built the response while we waited for the lock
+            cached = await cache_backend.get(base_filename, request.class_pattern, request.is_exam, content_hash)
+            if cached is not None:
+                return cached
+
+        if request.is_exam:
+            index = await get_exam_index(full_path, content_hash)
+            body = await run_io(_exam_response, index, request.class_pattern)
+        else:
+            index = await get_workbook_index(full_path, content_hash)
+            body = await run_io(_lecture_response, index, request.class_pattern)
+        shared_store.add(body, full_path, request.class_pattern, request.is_exam, content_hash)
+        await cache_backend.add(body, base_filename, request.class_pattern, request.is_exam, content_hash)  # Use base_filename for cache
+
+    return body
+
+async def get_json_table(request: TimeTableRequest, content_hash: str) -> bytes:
     """
-    Get the timetable in JSON format (either lecture or exam).
+    Get the serialized JSON response of a timetable (either lecture or exam).
+
+    The cache holds the final `{"data": ..., "version": ...}` payload, so a hit is returned
+    as it is. Responses stored by any worker of this host are read from the shared store
+    before asking the shared cache. Cache I/O runs on the I/O thread pool and Excel parsing
+    on the process pool, so the event loop keeps serving other requests while a response is
+    built. Concurrent misses for the same file version, class and type wait for one shared build.
     """
     # Normalize filename once here
     base_filename = request.filename.replace(".xlsx", "")  # Strip any .xlsx
     filename = f"{base_filename}.xlsx"  # Add it back once
-    table = get_table_from_cache(base_filename, request.class_pattern, request.is_exam)  # Use base_filename for cache key
+    full_path = os.path.join(DRAFTS_FOLDER, filename)
+    cached = shared_store.get(full_path, request.class_pattern, request.is_exam, content_hash)
+    if cached is not None:
+        return cached
 
-    if table is None:
-        full_path = os.path.join(DRAFTS_FOLDER, filename)
-        if not os.path.exists(full_path):
-            raise FileNotFoundError(f"Timetable file not found: {full_path}")
+    cached = await cache_backend.get(base_filename, request.class_pattern, request.is_exam, content_hash)  # Use base_filename for cache key
 
-        if request.is_exam:
-            table = get_exam_timetable(full_path, request.class_pattern).to_json(orient="records")
-        else:
-            table = get_time_table(full_path, request.class_pattern).to_json(orient="records")
-        add_table_to_cache(table, base_filename, request.class_pattern, request.is_exam)  # Use base_filename for cache
+    if cached is not None:
+        l2_stats.hits += 1
+        shared_store.add(cached, full_path, request.class_pattern, request.is_exam, content_hash)
+        return cached
+
+    l2_stats.misses += 1
+    if not os.path.exists(full_path):
+        raise FileNotFoundError(f"Timetable file not found: {full_path}")
 
-    return json.loads(table)
+    key = (content_hash, request.class_pattern.replace(" ", ""), request.is_exam)
+    return await _builds.do(
+        key,
+        lambda: _build_response(request, base_filename, full_path, content_hash),
+    )
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
-def lectures_convert_to_24hour(time_str: str, previous_was_pm: bool = False) -> str:
-    """Convert time to 24-hour format based on class schedule rules."""
-    if not time_str or not time_str.strip():
-        raise ValueError("Time string cannot be empty")
+def timetable_etag(content_hash: str, class_pattern: str, is_exam: bool) -> str:
+    """The strong ETag of a timetable response, which changes with the draft content, the class and the type."""
+    kind = "exam" if is_exam else "lecture"
+    return f'"{content_hash}-{kind}-{quote(class_pattern.replace(" ", ""), safe="")}"'
 
-    try:
-        hours, minutes = map(int, time_str.strip().split(':'))
-    except ValueError as e:
-        raise e
-
-    if not previous_was_pm:
-        if 7 <= hours <= 11:
-                   return f"{hours}:{minutes:02d}"
-        elif hours == 12:
-                return f"12:{minutes:02d}"
-        else:
-            return f"{hours + 12}:{minutes:02d}"
-    else:
-        if hours == 12:
-            return f"12:{minutes:02d}"
-        elif hours <= 7:
-            return f"{hours + 12}:{minutes:02d}"
-        return f"{hours}:{minutes:02d}"
-
-def exams_convert_to_24hour(time_str: str, previous_was_pm: bool = False) -> str:
-    """Convert time to 24-hour format based on class schedule rules."""
-    if not time_str or not time_str.strip():
-        raise ValueError("Time string cannot be empty")
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, using the weak comparison HTTP asks for."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+async def resolve_draft(filename: str) -> tuple:
+    """
+    Get the base name, path and content hash of a draft, hashing it only if it changed.
+
+    Raises FileNotFoundError if the draft does not exist.
+    """
+    base_filename = filename.replace(".xlsx", "")  # Strip any .xlsx
+    file_path = os.path.join(DRAFTS_FOLDER, f"{base_filename}.xlsx")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Timetable file not found: {file_path}")
+
+    content_hash = draft_registry.peek(file_path)
+    if content_hash is None:
+        content_hash = await run_io(draft_registry.content_hash, file_path)
+    return base_filename, file_path, content_hash
+
+async def cached_json_table(request: TimeTableRequest, base_filename: str, content_hash: str) -> bytes:
+    """
+    Get the serialized JSON response of a timetable from the in-process cache, building it on a miss.
+    """
+    response_cache.track_version(base_filename, content_hash)
+    response_key = (base_filename, content_hash, request.class_pattern.replace(" ", ""), request.is_exam)
+    body = response_cache.get(response_key)
+    if body is not None:
+        return body
 
     try:
-        time_str = time_str.strip().upper()
-        is_pm = 'PM' in time_str
-        time_clean = time_str.replace('AM', '').replace('PM', '').strip()
-        hours, minutes = map(int, time_clean.split(':'))
+        body = await get_json_table(request, content_hash)
+    except ParseQueueFull as e:
+        logger.error(f"Rejected timetable request, parser is busy: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The timetable parser is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    response_cache.set(response_key, body, size=len(body))
+    return body
+
+async def time_table_response(request: TimeTableRequest, if_none_match: str | None = None) -> Response:
+    """
+    Serve a timetable (lecture or exam), or a bodyless 304 when the client already has this version.
+    """
+    # The version is served from memory, the draft is only read again when it changed
+    base_filename, _, content_hash = await resolve_draft(request.filename)
 
-        if is_pm and hours != 12:
-            hours += 12
-        elif not is_pm and hours == 12:
-            hours = 0
+    headers = {
+        "ETag": timetable_etag(content_hash, request.class_pattern, request.is_exam),
+        "Cache-Control": f"public, max-age={settings.HTTP_MAX_AGE_SECONDS}",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
 
-        return f"{hours:02d}:{minutes:02d}"
-    except ValueError as e:
-        logger.error(f"Error converting time: {time_str} - {e}")
-        raise
+    body = await cached_json_table(request, base_filename, content_hash)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/get_time_table")
-async def get_time_table_endpoint(request: TimeTableRequest):
-    """Endpoint for generating a parsed JSON timetable (lecture or exam) and recording clashes"""
-    # Initialize the cache table if it doesn't exist
-    create_cache_table()
-    
-    base_filename = request.filename.replace(".xlsx", "")  # Strip any .xlsx
-    filename = f"{base_filename}.xlsx"  # Add it back once
-    _ = get_table_from_cache(base_filename, request.class_pattern, request.is_exam)
+async def get_time_table_endpoint(request: TimeTableRequest, if_none_match: str | None = Header(default=None)):
+    """Endpoint for generating a parsed JSON timetable (lecture or exam), the clashes of a draft are reported by /clashes"""
+    try:
+        return await time_table_response(request, if_none_match)
+    finally:
+        profiler.request_done()
+
+@router.get("/get_time_table")
+async def get_time_table_query_endpoint(
+    filename: str,
+    class_pattern: str,
+    is_exam: bool = False,
+    if_none_match: str | None = Header(default=None),
+):
+    """The timetable endpoint with query parameters, so shared caches and CDNs can store the responses."""
+    request = TimeTableRequest(filename=filename, class_pattern=class_pattern, is_exam=is_exam)
+    try:
+        return await time_table_response(request, if_none_match)
+    finally:
+        profiler.request_done()
+
+def _calendar(body: bytes, start_date: date, end_date: date) -> bytes:
+    """Build the ICS calendar of a serialized lecture timetable response."""
+    from api.extract.extract_lectures_table import generate_calendar
+
+    return generate_calendar(json.loads(body)["data"], start_date.isoformat(), end_date.isoformat())
+
+@router.get("/calendar.ics")
+async def calendar_endpoint(
+    filename: str,
+    class_pattern: str,
+    start_date: date,
+    end_date: date,
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Endpoint for exporting the lecture timetable of a class as an ICS calendar, with one weekly
+    recurring event per class between the start and end dates.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=422, detail="end_date must not be before start_date")
 
-    file_path = os.path.join(DRAFTS_FOLDER, filename)
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Timetable file not found: {file_path}")
+    base_filename, _, content_hash = await resolve_draft(filename)
 
-    with open(file_path, "rb") as f:
-        content_hash = hashlib.md5(f.read()).hexdigest()
-
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-    json_data = get_json_table(request)
-
-    if request.is_exam:
-        table_data = []
-        for entry in json_data:
-            date = entry.get('DATE')
-            if not date:
-                continue
-
-            try:
-                start_24h = exams_convert_to_24hour(entry.get('START', ''))
-                end_24h = exams_convert_to_24hour(entry.get('END', ''))
-            except ValueError as e:
-                logger.error(f"Invalid time format in exam entry: {entry} - {e}")
-                continue
-
-            table_data.append({
-                "day": date,
-                "data": [{
-                    "start": start_24h,
-                    "end": end_24h,
-                    "value": entry.get('COURSE NAME', ''),
-                    "class": entry.get('CLASS', ''),
-                    "location": entry.get('LECTURE HALL', ''),
-                    "invigilator": entry.get('INVIGILATOR (UPDATED)', '')
-                }]
-            })
-    else:
-        table_data = []
-        for index, day in enumerate(json_data):
-            day_data = []
-            current_slot = None
-            previous_was_pm = False
-
-            for key, value in day.items():
-                if not key or not isinstance(key, str):
-                    continue
+    etag = timetable_etag(content_hash, class_pattern, False)
+    headers = {
+        "ETag": f'{etag[:-1]}-{start_date.isoformat()}-{end_date.isoformat()}"',
+        "Cache-Control": f"public, max-age={settings.HTTP_MAX_AGE_SECONDS}",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # Calendars share the response cache and its version tracking, under a longer key
+    calendar_key = (base_filename, content_hash, class_pattern.replace(" ", ""), "ics", start_date, end_date)
+    body = response_cache.get(calendar_key)
+    if body is None:
+        request = TimeTableRequest(filename=filename, class_pattern=class_pattern)
+        table = await cached_json_table(request, base_filename, content_hash)
+        body = await run_io(_calendar, table, start_date, end_date)
+        response_cache.set(calendar_key, body, size=len(body))
+
+    headers["Content-Disposition"] = f'attachment; filename="{quote(class_pattern.replace(" ", ""), safe="")}.ics"'
+    return Response(content=body, media_type="text/calendar", headers=headers)
+
+def _batch_line(class_pattern: str, is_exam: bool, body: bytes) -> bytes:
+    """An NDJSON line of a batch response, splicing the class into the serialized timetable response."""
+    prefix = json.dumps({"class_pattern": class_pattern, "is_exam": is_exam, "status": 200}, ensure_ascii=False, separators=(",", ":"))
+    return f"{prefix[:-1]},".encode("utf-8") + body[1:] + b"\n"
+
+def _batch_error_line(class_pattern: str, is_exam: bool, status: int, detail: str) -> bytes:
+    line = {"class_pattern": class_pattern, "is_exam": is_exam, "status": status, "detail": detail}
+    return json.dumps(line, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+async def _stream_batch(classes: list, base_filename: str, full_path: str, content_hash: str):
+    """
+    Stream the timetable of every class as an NDJSON line, as soon as each one is ready.
 
-                time_parts = key.split("-")
-                if len(time_parts) < 2:
-                    continue
+    Cached responses are sent first, the in-process cache and the shared store of the host
+    before a single multi-get from the shared cache. The remaining classes are built from one
+    parse of the workbook and written back to the caches in bulk once the batch is done.
+    """
+    response_cache.track_version(base_filename, content_hash)
+
+    misses = []
+    for class_pattern, is_exam in classes:
+        key = (base_filename, content_hash, class_pattern.replace(" ", ""), is_exam)
+        body = response_cache.get(key)
+        if body is None:
+            body = shared_store.get(full_path, class_pattern, is_exam, content_hash)
+            if body is not None:
+                response_cache.set(key, body, size=len(body))
+        if body is None:
+            misses.append((class_pattern, is_exam))
+        else:
+            yield _batch_line(class_pattern, is_exam, body)
 
-                start = time_parts[0].strip()
-                end = time_parts[-1].strip()
+    if not misses:
+        return
 
-                if not start or not end:
-                    continue
+    cached = await cache_backend.get_many(base_filename, misses, content_hash)
+    l2_stats.hits += len(cached)
+    l2_stats.misses += len(misses) - len(cached)
+    shared = {False: [], True: []}
+    for (class_pattern, is_exam), body in cached.items():
+        response_cache.set((base_filename, content_hash, class_pattern.replace(" ", ""), is_exam), body, size=len(body))
+        shared[is_exam].append((class_pattern, body))
+        yield _batch_line(class_pattern, is_exam, body)
 
-                try:
-                    start_24h = lectures_convert_to_24hour(start)
-                    start_hour = int(start_24h.split(':')[0])
-                    is_pm = start_hour >= 12
-                    end_24h = lectures_convert_to_24hour(end, previous_was_pm)
-
-                    if current_slot and current_slot["value"] == value and current_slot["end"] == start_24h:
-                        current_slot["end"] = end_24h
-                    else:
-                        if current_slot:
-                            day_data.append(current_slot)
-                        current_slot = {"start": start_24h, "end": end_24h, "value": value}
-
-                    previous_was_pm = is_pm
-                except ValueError as e:
-                    logger.error(f"Error processing lecture time slot {key}: {e}")
-                    continue
+    remaining = [(class_pattern, is_exam) for class_pattern, is_exam in misses if (class_pattern, is_exam) not in cached]
 
-            if current_slot:
-                day_data.append(current_slot)
+    async def build(class_pattern: str, is_exam: bool) -> bytes:
+        if is_exam:
+            return await run_io(_exam_response, await get_exam_index(full_path, content_hash), class_pattern)
+        return await run_io(_lecture_response, await get_workbook_index(full_path, content_hash), class_pattern)
 
-            table_data.append({"day": days[index], "data": day_data})
+    tasks = {asyncio.ensure_future(build(*item)): item for item in remaining}
+
+    built = {False: [], True: []}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                class_pattern, is_exam = tasks[task]
+                try:
+                    body = task.result()
+                except ParseQueueFull:
+                    yield _batch_error_line(class_pattern, is_exam, 503, "The timetable parser is busy, please retry shortly")
+                    continue
+                except Exception as e:
+                    logger.error(f"Error building batch timetable for {class_pattern} in {base_filename}: {e}")
+                    yield _batch_error_line(class_pattern, is_exam, 500, "Error building the timetable")
+                    continue
 
+                built[is_exam].append((class_pattern, body))
+                response_cache.set((base_filename, content_hash, class_pattern.replace(" ", ""), is_exam), body, size=len(body))
+                yield _batch_line(class_pattern, is_exam, body)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    for is_exam, tables in built.items():
+        shared_store.add_many(shared[is_exam] + tables, full_path, is_exam, content_hash)
+        if tables:
+            await cache_backend.add_many(tables, base_filename, is_exam, content_hash)
+
+@router.post("/get_time_tables")
+async def get_time_tables_endpoint(request: BatchTimeTableRequest):
+    """Endpoint for streaming the timetables of many classes from one file as NDJSON, one line per class"""
+    if len(request.classes) > settings.BATCH_MAX_CLASSES:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_CLASSES} classes can be requested at once")
+
+    base_filename, file_path, content_hash = await resolve_draft(request.filename)
+
+    # Each class is answered once, in the order and spelling it was first asked for, as spaces are not part of its cache key
+    classes = {}
+    for item in request.classes:
+        classes.setdefault((item.class_pattern.replace(" ", ""), item.is_exam), (item.class_pattern, item.is_exam))
+    classes = list(classes.values())
+    return StreamingResponse(
+        _stream_batch(classes, base_filename, file_path, content_hash),
+        media_type="application/x-ndjson",
+        headers={"X-Timetable-Version": content_hash},
+    )
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit, miss and eviction counters of the in-process (l1), host (shared) and shared cache (l2) tiers."""
     return {
-        "data": table_data,
-        "version": content_hash,
+        "tiers": [response_cache.stats.as_dict(), shared_store.stats.as_dict(), l2_stats.as_dict()],
+        "l2_backend": cache_backend.name,
+        "l1_entries": len(response_cache),
+        "l1_bytes": response_cache.size,
     }
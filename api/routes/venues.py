@@ -0,0 +1,73 @@
+import logging
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, HTTPException
+from api.executors import ParseQueueFull, run_io
+from api.routes.timetable import get_workbook_index, resolve_draft
+
+if TYPE_CHECKING:
+    from api.extract.venue_index import VenueIndex
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+async def get_venue_index(filename: str) -> "VenueIndex":
+    """
+    Get the room and lecturer index of a lecture draft, built from the same parse as its class timetables.
+    """
+    from api.extract.workbook_index import NotALectureTimetable
+
+    _, file_path, content_hash = await resolve_draft(filename)
+    try:
+        index = await get_workbook_index(file_path, content_hash)
+        # Built once per workbook version and kept with the parsed workbook
+        return await run_io(lambda: index.venues)
+    except ParseQueueFull as e:
+        logger.error(f"Rejected room lookup, parser is busy: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The timetable parser is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except NotALectureTimetable as e:
+        logger.error(f"Error indexing rooms of {filename}: {e}")
+        raise HTTPException(status_code=422, detail="Room and lecturer lookups are only available for lecture timetables")
+
+@router.get("/rooms")
+async def rooms_endpoint(filename: str):
+    """Endpoint for the utilization of every room in a lecture draft over the week"""
+    venues = await get_venue_index(filename)
+    return {"version": venues.content_hash, "rooms": venues.utilization()}
+
+@router.get("/rooms/occupancy")
+async def room_occupancy_endpoint(filename: str, room: str):
+    """Endpoint for everything booked in a room over the week"""
+    venues = await get_venue_index(filename)
+    bookings = venues.room_occupancy(room)
+    if bookings is None:
+        raise HTTPException(status_code=404, detail=f"Room not found: {room}")
+    return {"version": venues.content_hash, "room": room, "data": bookings}
+
+@router.get("/rooms/free")
+async def free_rooms_endpoint(filename: str, day: str, start: str):
+    """Endpoint for the rooms that are free during a slot, given as a day and a 24-hour start time"""
+    venues = await get_venue_index(filename)
+    rooms = venues.free_rooms(day, start)
+    if rooms is None:
+        raise HTTPException(status_code=404, detail=f"No slot starts at {start} on {day}")
+    return {"version": venues.content_hash, "day": day.title(), "start": start, "rooms": rooms}
+
+@router.get("/lecturers")
+async def lecturers_endpoint(filename: str):
+    """Endpoint for the name of every lecturer in a lecture draft"""
+    venues = await get_venue_index(filename)
+    return {"version": venues.content_hash, "lecturers": venues.lecturers()}
+
+@router.get("/lecturers/occupancy")
+async def lecturer_occupancy_endpoint(filename: str, lecturer: str):
+    """Endpoint for every class a lecturer teaches over the week"""
+    venues = await get_venue_index(filename)
+    bookings = venues.lecturer_occupancy(lecturer)
+    if bookings is None:
+        raise HTTPException(status_code=404, detail=f"Lecturer not found: {lecturer}")
+    return {"version": venues.content_hash, "lecturer": lecturer, "data": bookings}
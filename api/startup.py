@@ -0,0 +1,98 @@
+import asyncio
+import importlib
+import logging
+import time
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api.cache.backends import cache_backend
+from api.cache.registry import draft_registry, settings as registry_settings
+from api.executors import shutdown_executors
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class StartupSettings(BaseSettings):
+    STARTUP_PRELOAD: bool = True  # Import the parsing libraries in the background before reporting ready
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = StartupSettings()
+
+# The modules the first parse needs, with pandas, numpy, openpyxl, regex, icalendar and psycopg2
+PRELOAD_MODULES = (
+    "api.extract.snapshot",
+    "api.extract.extract_exam_table",
+    "api.extract.timetable_response",
+    "api.extract.extract_lectures_table",
+    "api.extract.venue_index",
+    "api.extract.clashes",
+    "api.extract.draft_diff",
+    "api.config.database",
+)
+
+_imported = time.perf_counter()
+
+# What the worker has done since it started, reported by the readiness probe
+worker_status = {
+    "ready": False,
+    "cache_backend": cache_backend.name,
+    "cache_backend_connected": None,
+    "preloaded": False,
+    "seconds_to_ready": None,
+}
+
+_tasks = []
+
+def preload_modules():
+    """Import the parsing libraries, so the first request that needs them does not wait for them."""
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+async def _start_worker():
+    # Connect to the shared cache backend once per process
+    try:
+        await cache_backend.start()
+        worker_status["cache_backend_connected"] = True
+    except Exception as e:
+        worker_status["cache_backend_connected"] = False
+        logger.error(f"Cache backend {cache_backend.name} unavailable at startup, serving without cache: {e}")
+
+    # Re-hash drafts when they are written instead of checking them on every request
+    if registry_settings.DRAFTS_WATCH:
+        await asyncio.to_thread(draft_registry.start_watching)
+
+    if settings.STARTUP_PRELOAD:
+        await asyncio.to_thread(preload_modules)
+        worker_status["preloaded"] = True
+
+    worker_status["ready"] = True
+    worker_status["seconds_to_ready"] = round(time.perf_counter() - _imported, 3)
+
+    # Publish every new or changed draft to the cache before students ask for it. Readiness does not wait for it: it runs
+    # in one worker per host and takes seconds per draft, and until then a cold draft costs one parse per host
+    warmup = await asyncio.to_thread(importlib.import_module, "api.warmup")
+    if warmup.settings.WARMUP_ENABLED:
+        _tasks.append(asyncio.create_task(warmup.watch_drafts()))
+
+def start_worker():
+    """
+    Get the worker ready in the background, so it answers liveness probes as soon as it serves.
+
+    Connects the cache backend, starts watching the drafts and imports the parsing libraries,
+    then reports ready and starts the warm-up.
+    """
+    _tasks.append(asyncio.create_task(_start_worker()))
+
+async def stop_worker():
+    """Stop the background tasks and release the cache backend, the pools and the drafts watch."""
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
+    draft_registry.stop_watching()
+    await cache_backend.close()
+    shutdown_executors()
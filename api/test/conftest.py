@@ -0,0 +1,17 @@
+import os
+
+# The settings classes require the connection variables to be present at import time
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+os.environ.setdefault("DB_NAME", "easechaos")
+os.environ.setdefault("DB_USER", "postgres")
+os.environ.setdefault("DB_PASSWORD", "password")
+
+import pytest  # noqa: E402
+
+from api.cache.memory import response_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    response_cache.clear()
@@ -0,0 +1,170 @@
+import asyncio
+import zlib
+
+import pytest
+
+from api.cache import backends
+from api.cache.backends import PostgresCacheBackend, RedisCacheBackend, create_cache_backend
+
+
+class FakePipeline:
+    def __init__(self, store: dict):
+        self.store = store
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value, ex))
+
+    async def execute(self):
+        for key, value, _ in self.commands:
+            self.store[key] = value
+
+
+class FakeRedis:
+    """The part of the redis.asyncio client the backend uses, over a dict."""
+
+    def __init__(self):
+        self.store = {}
+        self.expiry = {}
+        self.pipelines = []
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        self.expiry[key] = px
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        if self.store.get(key) != token:
+            return 0
+        del self.store[key]
+        return 1
+
+    def pipeline(self, transaction=True):
+        pipe = FakePipeline(self.store)
+        self.pipelines.append(pipe)
+        return pipe
+
+
+@pytest.fixture
+def redis_backend():
+    backend = RedisCacheBackend()
+    backend._client = FakeRedis()
+    backend._errors = (zlib.error,)
+    return backend
+
+
+def test_redis_backend_keys_by_hash_and_compresses(redis_backend):
+    body = b'{"data":[],"version":"abc"}' * 20
+
+    asyncio.run(redis_backend.add(body, "Draft_1", "EL 3", False, "abc", expire_seconds=60))
+
+    stored = redis_backend._client.store["timetable:abc:EL3:lecture"]
+    assert len(stored) < len(body)
+    assert zlib.decompress(stored) == body
+    assert redis_backend._client.pipelines[0].commands[0][2] == 60
+    # another draft with the same content shares the entry, another version does not
+    assert asyncio.run(redis_backend.get("Draft_2", "EL 3", False, "abc")) == body
+    assert asyncio.run(redis_backend.get("Draft_1", "EL 3", False, "def")) is None
+
+
+def test_redis_backend_batches_lookups(redis_backend):
+    asyncio.run(redis_backend.add_many([("EL 3", b"el"), ("CE 4", b"ce")], "Draft_1", False, "abc"))
+
+    tables = asyncio.run(redis_backend.get_many("Draft_1", [("EL 3", False), ("CE 4", True), ("CE 4", False)], "abc"))
+
+    assert tables == {("EL 3", False): b"el", ("CE 4", False): b"ce"}
+    assert len(redis_backend._client.pipelines) == 1
+
+
+def test_redis_backend_misses_until_started():
+    backend = RedisCacheBackend()
+
+    assert asyncio.run(backend.get("Draft_1", "EL 3", False, "abc")) is None
+    assert asyncio.run(backend.get_many("Draft_1", [("EL 3", False)], "abc")) == {}
+
+
+def test_redis_backend_treats_corrupt_values_as_misses(redis_backend):
+    redis_backend._client.store["timetable:abc:EL3:lecture"] = b"not zlib"
+
+    assert asyncio.run(redis_backend.get("Draft_1", "EL 3", False, "abc")) is None
+
+
+def test_redis_lock_is_held_by_one_process_at_a_time(redis_backend, monkeypatch):
+    monkeypatch.setattr(backends.settings, "CACHE_LOCK_TIMEOUT_SECONDS", 0.1)
+    store = redis_backend._client.store
+
+    async def run():
+        async with redis_backend.lock("timetable:abc:EL3:lecture") as first:
+            held = dict(store)
+            async with redis_backend.lock("timetable:abc:EL3:lecture") as second:
+                pass
+            async with redis_backend.lock("timetable:abc:CE4:lecture") as other:
+                pass
+        async with redis_backend.lock("timetable:abc:EL3:lecture") as third:
+            pass
+        return first, second, other, third, held
+
+    first, second, other, third, held = asyncio.run(run())
+
+    assert (first, second, other, third) == (True, False, True, True)
+    assert list(held) == ["lock:timetable:abc:EL3:lecture"]
+    assert redis_backend._client.expiry["lock:timetable:abc:EL3:lecture"] == backends.settings.CACHE_LOCK_TTL_SECONDS * 1000
+    assert store == {}
+
+
+def test_redis_lock_release_leaves_a_lock_taken_over_by_another_process(redis_backend):
+    async def run():
+        async with redis_backend.lock("timetable:abc:EL3:lecture") as locked:
+            # The lock expired and another process took it
+            redis_backend._client.store["lock:timetable:abc:EL3:lecture"] = "other"
+        return locked
+
+    assert asyncio.run(run()) is True
+    assert redis_backend._client.store == {"lock:timetable:abc:EL3:lecture": "other"}
+
+
+def test_redis_lock_is_not_taken_until_started():
+    async def run():
+        async with RedisCacheBackend().lock("timetable:abc:EL3:lecture") as locked:
+            return locked
+
+    assert asyncio.run(run()) is False
+
+
+def test_postgres_backend_round_trips_bytes(mocker):
+    get = mocker.patch("api.config.database.get_table_from_cache", return_value='{"version":"abc"}')
+    add = mocker.patch("api.config.database.add_table_to_cache")
+    backend = PostgresCacheBackend()
+
+    assert asyncio.run(backend.get("Draft_1", "EL 3", False, "abc")) == b'{"version":"abc"}'
+    asyncio.run(backend.add(b'{"version":"abc"}', "Draft_1", "EL 3", False, "abc"))
+
+    get.assert_called_once_with("Draft_1", "EL 3", False, "abc")
+    assert add.call_args.args == ('{"version":"abc"}', "Draft_1", "EL 3", False, "abc", 3600)
+
+
+def test_create_cache_backend():
+    assert isinstance(create_cache_backend("postgres"), PostgresCacheBackend)
+    assert isinstance(create_cache_backend("redis"), RedisCacheBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend("memcached")
+
+
+def test_redis_config_does_not_connect_on_import():
+    import api.config.redis_config as redis_config
+
+    assert not hasattr(redis_config, "r")
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.extract.clashes import exam_clashes, find_class_groups, lecture_clashes
+from api.extract.extract_exam_table import ExamIndex
+from api.extract.venue_index import VenueIndex
+from api.extract.workbook_index import DayGrid, WorkbookIndex
+import api.extract.clashes as clashes_module
+import api.routes.clashes as clashes_routes
+
+EXAM_DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1_ex.xlsx")
+
+SLOTS = ["7:00-8:00", "8:00-9:00", "9:00-10:00"]
+
+app = FastAPI()
+app.include_router(clashes_routes.router)
+
+client = TestClient(app)
+
+
+def _venues(cells: list) -> VenueIndex:
+    grids = [DayGrid("Monday", SLOTS, ["LH 1", "LH 2", "LH 3", "VLE", "VLE"])]
+    return VenueIndex(WorkbookIndex("test", grids, cells))
+
+
+@pytest.mark.parametrize("text, classes", [
+    ("EL 372\nANNAN", {"EL 3": None}),
+    ("CY 1A 172 (P)\nARYEH", {"CY 1": frozenset("A")}),
+    ("MN 2A, 2B, 2C 254\nKUNKYIN-SAADAARI", {"MN 2": frozenset("ABC")}),
+    ("CE 1B, CE 1A 158\nAGYARKO", {"CE 1": frozenset("AB")}),
+    ("CE/RN 459\nASARE", {"CE 4": None, "RN 4": None}),
+])
+def test_find_class_groups(text, classes):
+    assert find_class_groups(text) == classes
+
+
+def test_lecture_clashes_find_overlapping_groups():
+    venues = _venues([
+        (0, 0, 0, "EL 372\nANNAN"),
+        (0, 1, 0, "EL 3A 374\nATTACHIE"),
+        (0, 0, 1, "EL 3A 374\nATTACHIE"),
+        (0, 1, 1, "EL 3B 376\nOHENE ADU"),
+        (0, 0, 2, "EL 372\nANNAN"),
+        (0, 1, 2, "EL 372\nANNAN"),
+    ])
+
+    report = lecture_clashes(venues)
+
+    # the whole year clashes with group A, groups A and B do not, and the same course in two rooms does not
+    assert [(clash["class"], clash["start"]) for clash in report["class_clashes"]] == [("EL 3", "7:00")]
+    assert [booking["room"] for booking in report["class_clashes"][0]["bookings"]] == ["LH 1", "LH 2"]
+    assert report["room_clashes"] == []
+
+
+def test_lecture_clashes_find_shared_rooms():
+    venues = _venues([
+        (0, 0, 0, "EL 372\nANNAN"),
+        (0, 0, 0, "CE 274\nASARE"),
+        (0, 3, 1, "MN 154\nAFFUL"),
+        (0, 4, 1, "GL 152\nAKENDOLA"),
+    ])
+
+    report = lecture_clashes(venues)
+
+    assert [(clash["room"], clash["start"]) for clash in report["room_clashes"]] == [("LH 1", "7:00")]
+
+
+def test_exam_clashes_count_distinct_papers():
+    index = ExamIndex.from_file(EXAM_DRAFT, "test")
+
+    report = exam_clashes(index, 1)
+
+    for clash in report["period_clashes"]:
+        assert len({paper["course_no"].replace(" ", "") for paper in clash["papers"]}) > 1
+        assert len({paper["start"] for paper in clash["papers"]}) == 1
+    for day in report["overloaded_days"]:
+        assert len(day["papers"]) > 1
+    assert exam_clashes(index, 99)["overloaded_days"] == []
+
+
+def test_clashes_endpoint_rejects_the_other_timetable_type():
+    lectures = client.get("/clashes", params={"filename": "Draft_1_ex.xlsx"})
+    exams = client.get("/clashes", params={"filename": "Draft_1.xlsx", "is_exam": True})
+
+    assert lectures.status_code == exams.status_code == 422
+    assert lectures.json()["detail"] == "Draft_1_ex.xlsx is not a lecture timetable"
+    assert exams.json()["detail"] == "Draft_1.xlsx is not an exam timetable"
+
+
+def test_clashes_endpoint_caches_report(mocker):
+    lecture_clashes_spy = mocker.spy(clashes_module, "lecture_clashes")
+
+    first = client.get("/clashes", params={"filename": "Draft_1.xlsx"})
+    second = client.get("/clashes", params={"filename": "Draft_1"})
+    exams = client.get("/clashes", params={"filename": "Draft_1_ex.xlsx", "is_exam": True, "max_papers_per_day": 1})
+
+    assert first.status_code == 200
+    assert set(first.json()) == {"version", "class_clashes", "room_clashes"}
+    assert second.content == first.content
+    assert lecture_clashes_spy.call_count == 1
+    assert exams.status_code == 200
+    assert exams.json()["max_papers_per_day"] == 1
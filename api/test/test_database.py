@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+import pytest
+
+from api.cache import shared
+from api.cache.backends import PostgresCacheBackend
+from api.config import database
+from api.routes import timetable
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.query = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.fail_queries:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.query = query.strip()
+        self.conn.queries.append(self.query)
+
+    def fetchone(self):
+        if "pg_try_advisory_lock" in self.query:
+            return {"locked": True}
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.prepared = False
+        self.last_used = time.monotonic()
+        self.autocommit = False
+        self.fail_queries = False
+        self.queries = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """A stand-in for psycopg2's ThreadedConnectionPool that records what is returned to it."""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.maxconn = maxconn
+        self.idle = []
+        self.created = []
+        self.returned = []
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        with self._lock:
+            if self.used == self.maxconn:
+                raise psycopg2.pool.PoolError("connection pool exhausted")
+            self.used += 1
+            if self.idle:
+                return self.idle.pop()
+            conn = FakeConnection()
+            self.created.append(conn)
+            return conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            self.used -= 1
+        self.returned.append((conn, close))
+        if close:
+            conn.closed = 1
+        else:
+            self.idle.append(conn)
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", FakePool)
+    monkeypatch.setattr(database, "_pool", None)
+    monkeypatch.setattr(database, "_pool_slots", None)
+    monkeypatch.setattr(database, "_lock_slots", None)
+    monkeypatch.setattr(database.settings, "DB_POOL_MAX", 2)
+    monkeypatch.setattr(database.settings, "DB_LOCK_POOL_MAX", 2)
+    database.init_db_pool()
+    return database._pool
+
+
+def test_connections_are_prepared_once_and_reused(pool):
+    with database.db_connection() as first:
+        pass
+    with database.db_connection() as second:
+        pass
+
+    assert first is second
+    assert len(pool.created) == 1
+    assert first.queries == [statement.strip() for statement in database.PREPARED_STATEMENTS.values()]
+    assert pool.returned == [(first, False), (first, False)]
+
+
+def test_broken_connection_is_discarded(pool):
+    with pytest.raises(psycopg2.OperationalError):
+        with database.db_connection(prepare=False) as conn:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    assert pool.returned == [(conn, True)]
+    assert pool.idle == []
+    with database.db_connection(prepare=False) as fresh:
+        assert fresh is not conn
+
+
+def test_idle_connection_is_pinged_and_replaced_when_dead(pool):
+    with database.db_connection(prepare=False) as conn:
+        pass
+    conn.last_used -= database.settings.DB_POOL_HEALTHCHECK_SECONDS + 1
+
+    with database.db_connection(prepare=False) as pinged:
+        pass
+
+    assert pinged is conn
+    assert conn.queries == ["SELECT 1"]
+
+    conn.last_used -= database.settings.DB_POOL_HEALTHCHECK_SECONDS + 1
+    conn.fail_queries = True
+    with database.db_connection(prepare=False) as replaced:
+        pass
+
+    assert replaced is not conn
+    assert (conn, True) in pool.returned
+
+
+def test_caller_waits_while_the_pool_is_exhausted(pool):
+    release = threading.Event()
+    held = threading.Barrier(3)
+    waited = []
+
+    def hold():
+        with database.db_connection(prepare=False):
+            held.wait()
+            release.wait()
+
+    def borrow():
+        started = time.monotonic()
+        with database.db_connection(prepare=False):
+            waited.append(time.monotonic() - started)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in holders:
+        thread.start()
+    held.wait()
+
+    waiter = threading.Thread(target=borrow)
+    waiter.start()
+    time.sleep(0.2)
+    assert waited == []
+    release.set()
+    waiter.join(5)
+    for thread in holders:
+        thread.join(5)
+
+    assert len(waited) == 1 and waited[0] >= 0.2
+    assert len(pool.created) == 2
+
+
+def test_caller_gives_up_when_no_connection_frees_up(pool, monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_POOL_TIMEOUT_SECONDS", 0.1)
+
+    with database.db_connection(prepare=False), database.db_connection(prepare=False):
+        with pytest.raises(psycopg2.pool.PoolError):
+            with database.db_connection(prepare=False):
+                pass
+
+
+def test_locks_use_their_own_connections(pool):
+    locks = [database.acquire_advisory_lock(f"key{i}") for i in range(3)]
+
+    # Every lock connection is in use, so the third build runs without a lock
+    assert locks[2] is None
+    with database.db_connection(prepare=False), database.db_connection(prepare=False):
+        assert pool.used == 4
+
+    for i, conn in enumerate(locks[:2]):
+        database.release_advisory_lock(conn, f"key{i}")
+    assert database.acquire_advisory_lock("key2") is not None
+
+
+def test_more_concurrent_cold_builds_than_connections_finish(pool, monkeypatch):
+    monkeypatch.setattr(shared.settings, "SHARED_STORE_ENABLED", False)
+    monkeypatch.setattr(timetable, "cache_backend", PostgresCacheBackend())
+
+    async def get_workbook_index(full_path, content_hash):
+        return None
+
+    def lecture_response(index, class_pattern):
+        time.sleep(0.1)
+        return class_pattern.encode()
+
+    monkeypatch.setattr(timetable, "get_workbook_index", get_workbook_index)
+    monkeypatch.setattr(timetable, "_lecture_response", lecture_response)
+    classes = [f"EL {i}" for i in range(6 * database.settings.DB_POOL_MAX)]
+
+    async def build(class_pattern):
+        request = timetable.TimeTableRequest(filename="Draft_1", class_pattern=class_pattern)
+        return await timetable._build_response(request, "Draft_1", "Draft_1.xlsx", "abc")
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(build(class_pattern) for class_pattern in classes)), 10)
+
+    assert asyncio.run(run()) == [class_pattern.encode() for class_pattern in classes]
+    assert pool.used == 0
+
+
+def test_bulk_write_sends_one_row_per_cache_key(pool, mocker):
+    execute_values = mocker.patch.object(database, "execute_values")
+
+    database.add_tables_to_cache([("EL 3", "first"), ("EL  3", "second"), ("CE 4", "third")], "Draft_1", False, "abc")
+
+    rows = execute_values.call_args.args[2]
+    assert [(key, table) for key, table, _, _ in rows] == [("Draft_1-abc-EL3-lecture", "second"), ("Draft_1-abc-CE4-lecture", "third")]
@@ -0,0 +1,113 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.cache.backends import PostgresCacheBackend
+from api.extract.draft_diff import DraftDiff
+from api.extract.timetable_response import lecture_response, with_version
+from api.extract.workbook_index import DayGrid, WorkbookIndex
+from api.routes.diff import router as diff_router
+from api.warmup import _carry_over
+
+DRAFTS = Path(__file__).parents[1] / "drafts"
+
+SLOTS = ["7:00-8:00", "8:00-9:00"]
+
+app = FastAPI()
+app.include_router(diff_router)
+
+client = TestClient(app)
+
+
+def _index(content_hash: str, cells: list, rooms: list = ["LH 1", "LH 2", "LH 3"]) -> WorkbookIndex:
+    grids = [DayGrid(day, SLOTS, rooms) for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]]
+    return WorkbookIndex(content_hash, grids, cells)
+
+
+def test_changed_classes_are_exactly_the_edited_ones():
+    old = _index("old", [(0, 0, 0, "EL 372\nANNAN"), (0, 1, 0, "CE 274\nASARE"), (1, 0, 1, "MN 154\nAFFUL")])
+    new = _index("new", [(0, 0, 0, "EL 372\nANNAN"), (0, 1, 0, "CE 276\nASARE"), (2, 0, 1, "MN 154\nAFFUL")])
+
+    diff = DraftDiff(old, new)
+
+    assert not diff.structural
+    assert diff.changed_classes(["EL 3", "CE 2", "MN 1"]) == ["CE 2", "MN 1"]
+    assert [(change["day"], change["old"], change["new"]) for change in diff.class_changes("MN 1")] == [
+        ("Tuesday", ["MN 154\nAFFUL"], []),
+        ("Wednesday", [], ["MN 154\nAFFUL"]),
+    ]
+    for class_pattern in ["EL 3", "CE 2", "MN 1"]:
+        same = lecture_response(old.time_table(class_pattern), "v") == lecture_response(new.time_table(class_pattern), "v")
+        assert same == (class_pattern not in diff.changed_classes([class_pattern]))
+
+
+def test_moved_rows_change_only_the_reordered_slot():
+    old = _index("old", [(0, 0, 0, "EL 372"), (0, 1, 0, "EL 374")], rooms=["LH 1", "LH 2"])
+    new = _index("new", [(0, 0, 0, "EL 374"), (0, 1, 0, "EL 372")], rooms=["LH 2", "LH 1"])
+
+    diff = DraftDiff(old, new)
+
+    assert diff.changed_classes(["EL 3"]) == ["EL 3"]
+    assert lecture_response(old.time_table("EL 3"), "v") != lecture_response(new.time_table("EL 3"), "v")
+
+
+def test_new_time_slots_are_structural():
+    old = _index("old", [(0, 0, 0, "EL 372")])
+    new = WorkbookIndex("new", [DayGrid(grid.day, ["6:00-7:00", *SLOTS], grid.rooms) for grid in old.grids], [(0, 0, 1, "EL 372")])
+
+    diff = DraftDiff(old, new)
+
+    assert diff.structural
+    assert diff.changed_classes(["CE 2"]) == ["CE 2"]
+
+
+def test_with_version_only_rewrites_the_version():
+    body = b'{"data":[{"day":"Monday","data":[]}],"version":"abc"}'
+
+    assert with_version(body, "abc", "def") == b'{"data":[{"day":"Monday","data":[]}],"version":"def"}'
+    assert with_version(body, "xyz", "def") is None
+
+
+def test_carry_over_copies_unchanged_classes(mocker):
+    mocker.patch.object(PostgresCacheBackend, "get_many", return_value={("EL 3", False): b'{"data":[],"version":"old"}'})
+    add = mocker.patch.object(PostgresCacheBackend, "add_many")
+
+    carried = asyncio.run(_carry_over("Draft_1", ["EL 3", "CE 2"], "old", "new"))
+
+    assert carried == {"EL 3"}
+    add.assert_called_once()
+    assert add.call_args.args[:4] == ([("EL 3", b'{"data":[],"version":"new"}')], "Draft_1", False, "new")
+
+
+def test_diff_endpoint():
+    against = client.get("/diff", params={"filename": "Draft_2.xlsx", "base": "Draft_1.xlsx", "class_pattern": "EL 3"})
+    gone = client.get("/diff", params={"filename": "Draft_2.xlsx", "since": "0" * 32})
+    neither = client.get("/diff", params={"filename": "Draft_2.xlsx"})
+
+    assert against.status_code == 200
+    assert against.json()["class_pattern"] == "EL 3"
+    assert against.json()["change_count"] == len(against.json()["changes"])
+    assert gone.status_code == 404
+    assert neither.status_code == 422
+
+
+def test_diff_endpoint_tells_exam_drafts_from_malformed_classes():
+    exam = client.get("/diff", params={"filename": "Draft_1_ex.xlsx", "base": "Draft_1.xlsx"})
+    malformed = client.get("/diff", params={"filename": "Draft_2.xlsx", "base": "Draft_1.xlsx", "class_pattern": "EL3"})
+
+    assert exam.status_code == malformed.status_code == 422
+    assert exam.json()["detail"] == "Diffs are only available for lecture timetables"
+    assert malformed.json()["detail"] == "class_pattern must be a department and a year, e.g. EL 3"
+
+
+@pytest.mark.parametrize("since", ["../../../etc/passwd", "0" * 31, "A" * 32, "0" * 32 + "/x"])
+def test_diff_endpoint_rejects_versions_that_are_not_hashes(mocker, since):
+    read_snapshot = mocker.patch("api.extract.snapshot.read_snapshot")
+
+    response = client.get("/diff", params={"filename": "Draft_2.xlsx", "since": since})
+
+    assert response.status_code == 422
+    read_snapshot.assert_not_called()
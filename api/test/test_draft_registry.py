@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from api.cache.registry import DraftRegistry
+from api.extract.workbook_index import file_content_hash
+
+
+@pytest.fixture
+def draft(tmp_path):
+    path = tmp_path / "Draft_1.xlsx"
+    path.write_bytes(b"first version")
+    return path
+
+
+def test_unchanged_draft_is_hashed_once(draft):
+    registry = DraftRegistry()
+
+    first = registry.content_hash(draft)
+    second = registry.content_hash(draft)
+
+    assert first == second == file_content_hash(str(draft))
+    assert registry.hashes_computed == 1
+    assert registry.peek(draft) == first
+
+
+def test_changed_draft_is_hashed_again(draft):
+    registry = DraftRegistry()
+    first = registry.content_hash(draft)
+
+    draft.write_bytes(b"second version, longer")
+
+    assert registry.peek(draft) is None
+    assert registry.content_hash(draft) == file_content_hash(str(draft)) != first
+    assert registry.hashes_computed == 2
+
+
+def test_missing_draft_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        DraftRegistry().content_hash(tmp_path / "missing.xlsx")
+
+
+def test_watcher_rehashes_written_draft(draft):
+    pytest.importorskip("watchdog")
+    registry = DraftRegistry()
+    registry.content_hash(draft)
+    assert registry.start_watching(draft.parent)
+    try:
+        draft.write_bytes(b"second version, longer")
+        expected = file_content_hash(str(draft))
+        deadline = time.monotonic() + 5
+        while registry.peek(draft) != expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert registry.peek(draft) == expected
+    finally:
+        registry.stop_watching()
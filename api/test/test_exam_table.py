@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from api.cache import registry
+from api.extract import extract_exam_table
+from api.extract.extract_exam_table import (
+    ExamIndex,
+    _clean_exam_table,
+    _read_exam_sheet,
+    get_exam_index,
+)
+
+DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1_ex.xlsx")
+
+
+@pytest.fixture(scope="module")
+def sheet():
+    return _read_exam_sheet(DRAFT)
+
+
+@pytest.fixture(scope="module")
+def index(sheet):
+    return ExamIndex("test", _clean_exam_table(sheet))
+
+
+def _full_scan(sheet, class_pattern):
+    """The exams of a class, cleaned and filtered row by row over the whole sheet."""
+    df = sheet.iloc[3:-3].reset_index(drop=True)
+    df.columns = df.iloc[0]
+    df = df[1:].reset_index(drop=True)
+    period_mapping = {'M': ('7:00 AM', '10:00 AM'), 'A': ('11:00 AM', '2:00 PM'), 'E': ('3:00 PM', '6:00 PM')}
+    df['PERIOD'] = df['PERIOD'].astype(str)
+    df = df[df['PERIOD'].isin(period_mapping.keys())]
+    df['START'], df['END'] = zip(*df['PERIOD'].map(period_mapping))
+    df = df.drop(columns=['PERIOD'])
+
+    def format_date_with_suffix(date):
+        day = date.day
+        suffix = 'th' if 11 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+        return date.strftime(f"%A, {day}{suffix} %B %Y")
+
+    df['DATE'] = pd.to_datetime(df['DATE']).apply(format_date_with_suffix)
+    return df[df['CLASS'].str.startswith(class_pattern)].drop(columns=['NO'])
+
+
+@pytest.mark.parametrize("class_pattern", ["EL 3", "CE 4", "MN 1A", "MN", "el 3", "ZZ 9"])
+def test_lookup_matches_full_scan(sheet, index, class_pattern):
+    expected = _full_scan(sheet.copy(), class_pattern)
+
+    actual = index.lookup(class_pattern)
+
+    assert actual.equals(expected)
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.to_json(orient="records") == expected.to_json(orient="records")
+
+
+def test_get_exam_index_reads_once(mocker, monkeypatch):
+    monkeypatch.setattr(extract_exam_table, "_cache", OrderedDict())
+    monkeypatch.setattr(registry.draft_registry, "_entries", {})
+    spy = mocker.spy(ExamIndex, "from_file")
+    hashes = mocker.spy(registry, "file_content_hash")
+
+    first = get_exam_index(DRAFT)
+    second = get_exam_index(DRAFT)
+
+    assert first is second
+    assert spy.call_count == 1
+    # The file is hashed once, then the lookups only stat it
+    assert hashes.call_count == 1
@@ -0,0 +1,34 @@
+from api.cache.memory import LRUCache
+
+def test_evicts_least_recently_used_beyond_max_bytes():
+    cache = LRUCache(max_bytes=300, ttl_seconds=60)
+    cache.set(("Draft_1", "a", "EL3", False), "x", size=100)
+    cache.set(("Draft_1", "a", "CE4", False), "y", size=100)
+    cache.get(("Draft_1", "a", "EL3", False))
+
+    cache.set(("Draft_1", "a", "MN1", False), "z", size=150)
+
+    assert cache.get(("Draft_1", "a", "CE4", False)) is None
+    assert cache.get(("Draft_1", "a", "EL3", False)) == "x"
+    assert cache.size == 250
+    assert cache.stats.evictions == 1
+
+def test_expired_entries_are_misses():
+    cache = LRUCache(max_bytes=1000, ttl_seconds=0)
+    cache.set(("Draft_1", "a", "EL3", False), "x", size=10)
+
+    assert cache.get(("Draft_1", "a", "EL3", False)) is None
+    assert cache.stats.misses == 1
+    assert len(cache) == 0
+
+def test_new_version_drops_entries_of_old_version():
+    cache = LRUCache(max_bytes=1000, ttl_seconds=60)
+    cache.track_version("Draft_1", "a")
+    cache.set(("Draft_1", "a", "EL3", False), "old", size=10)
+    cache.set(("Draft_2", "b", "EL3", False), "other", size=10)
+
+    cache.track_version("Draft_1", "c")
+
+    assert cache.get(("Draft_1", "a", "EL3", False)) is None
+    assert cache.get(("Draft_2", "b", "EL3", False)) == "other"
+    assert cache.size == 10
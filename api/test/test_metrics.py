@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.metrics as metrics
+from api.cache.memory import CacheStats
+from api.metrics import Histogram, MetricsMiddleware, render_metrics, stage, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test timings.", "stage", buckets=(0.01, 0.1))
+    histogram.observe("parse", 0.005)
+    histogram.observe("parse", 0.05)
+    histogram.observe("parse", 3.0)
+
+    lines = histogram.render()
+
+    assert lines[:2] == ["# HELP test_seconds Test timings.", "# TYPE test_seconds histogram"]
+    assert lines[2:5] == [
+        'test_seconds_bucket{stage="parse",le="0.01"} 1',
+        'test_seconds_bucket{stage="parse",le="0.1"} 2',
+        'test_seconds_bucket{stage="parse",le="+Inf"} 3',
+    ]
+    assert lines[5] == 'test_seconds_sum{stage="parse"} 3.055'
+    assert lines[6] == 'test_seconds_count{stage="parse"} 3'
+
+
+def test_timed_times_functions_and_coroutines():
+    metrics.stage_seconds.clear()
+
+    @timed("test_sync")
+    def add(a, b):
+        return a + b
+
+    @timed("test_async")
+    async def add_later(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert asyncio.run(add_later(1, 2)) == 3
+
+    rendered = "\n".join(metrics.stage_seconds.render())
+    assert 'easechaos_stage_seconds_count{stage="test_sync"} 1' in rendered
+    assert 'easechaos_stage_seconds_count{stage="test_async"} 1' in rendered
+
+
+def test_disabled_timing_leaves_functions_untouched(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+
+    def lookup():
+        return "cells"
+
+    assert timed("match")(lookup) is lookup
+    assert stage("match") is stage("parse")
+
+
+def test_middleware_sends_server_timing_of_request_stages():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=True)
+
+    @app.get("/table")
+    async def table():
+        with stage("match"):
+            pass
+        with stage("transform"):
+            pass
+        return {"data": []}
+
+    response = TestClient(app).get("/table")
+
+    assert response.status_code == 200
+    names = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert names == ["match", "transform", "total"]
+
+
+def test_middleware_labels_unmatched_paths():
+    metrics.request_seconds.clear()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=False)
+
+    @app.get("/healthcheck")
+    def health_check():
+        return {"status": "healthy"}
+
+    client = TestClient(app)
+    assert "server-timing" not in client.get("/healthcheck").headers
+    client.get("/no/such/draft")
+
+    rendered = "\n".join(metrics.request_seconds.render())
+    assert 'easechaos_request_seconds_count{route="/healthcheck"} 1' in rendered
+    assert 'easechaos_request_seconds_count{route="unmatched"} 1' in rendered
+
+
+def test_render_metrics_includes_cache_counters():
+    l1, l2 = CacheStats("l1"), CacheStats("l2")
+    l1.hits, l1.misses, l2.evictions = 5, 2, 1
+
+    body = render_metrics([l1, l2])
+
+    assert "# TYPE easechaos_cache_hits_total counter" in body
+    assert 'easechaos_cache_hits_total{tier="l1"} 5' in body
+    assert 'easechaos_cache_misses_total{tier="l1"} 2' in body
+    assert 'easechaos_cache_evictions_total{tier="l2"} 1' in body
+    assert body.endswith("\n")
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import executors, profiler
+from api.profiler import ProfilerBusy, SamplingProfiler
+from api.routes.profiler import router as profiler_router
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def sample_busy_thread() -> SamplingProfiler:
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+    sampler = SamplingProfiler(0.001)
+    worker.start()
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    stop.set()
+    worker.join()
+    return sampler
+
+
+def test_sampler_collapses_stacks_of_busy_threads():
+    sampler = sample_busy_thread()
+
+    lines = [line for line in sampler.collapsed().splitlines() if line.startswith("busy;")]
+
+    assert lines
+    assert all(";busy_loop (" in line and "test_profiler.py:" in line for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) <= sampler.sample_count
+
+
+def test_sampler_exports_speedscope_profiles():
+    sampler = sample_busy_thread()
+
+    document = sampler.speedscope("test")
+
+    assert document["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    frames = document["shared"]["frames"]
+    busy = next(profile for profile in document["profiles"] if profile["name"] == "busy")
+    assert busy["type"] == "sampled" and busy["unit"] == "seconds"
+    assert len(busy["samples"]) == len(busy["weights"])
+    assert all(0 <= frame < len(frames) for sample in busy["samples"] for frame in sample)
+    assert any(frames[sample[-1]]["name"].startswith("busy_loop") for sample in busy["samples"])
+
+
+def test_profile_ends_after_the_requested_number_of_requests():
+    async def run():
+        task = asyncio.ensure_future(profiler.profile(seconds=10, requests=2, interval_seconds=0.01))
+        await asyncio.sleep(0.05)
+        assert executors.parse_inline
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(seconds=1)
+        profiler.request_done()
+        profiler.request_done()
+        return await asyncio.wait_for(task, 2)
+
+    result = asyncio.run(run())
+
+    assert result.stopped - result.started < 2
+    assert not executors.parse_inline
+    assert profiler.session is None
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(profiler_router, prefix="/api/v1")
+    return TestClient(app)
+
+
+def test_profile_endpoint_is_hidden_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(profiler.settings, "PROFILER_TOKEN", "")
+
+    response = client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": ""})
+
+    assert response.status_code == 404
+
+
+def test_profile_endpoint_requires_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiler.settings, "PROFILER_TOKEN", "secret")
+
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}).status_code == 403
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/api/v1/admin/profile", params={"seconds": 0.1, "format": "speedscope"}, headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json()["exporter"] == "easechaos"
+    assert int(response.headers["X-Profile-Samples"]) > 0
+
+
+def test_profile_endpoint_limits_the_window(client, monkeypatch):
+    monkeypatch.setattr(profiler.settings, "PROFILER_TOKEN", "secret")
+
+    response = client.get("/api/v1/admin/profile", params={"seconds": 3600}, headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 422
@@ -0,0 +1,192 @@
+import asyncio
+import errno
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.cache import shared
+from api.cache.backends import PostgresCacheBackend
+from api.cache.memory import response_cache
+from api.cache.shared import SharedResponseStore, build_lock, store_path
+from api.extract import snapshot
+from api.extract.snapshot import snapshot_path, snapshot_skipped
+from api.extract.workbook_index import WorkbookIndex
+from api.routes import timetable
+from api.routes.timetable import DRAFTS_FOLDER, router as timetable_router
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+
+def test_responses_stored_by_one_worker_are_read_by_another(tmp_path):
+    draft = str(tmp_path / "Draft_1.xlsx")
+    writer = SharedResponseStore(1 << 20, 4)
+    reader = SharedResponseStore(1 << 20, 4)
+    assert reader.get(draft, "EL 3", False, "abc") is None
+
+    assert writer.add_many([("EL 3", b'{"data":[]}'), ("CE 2", b'{"data":[1]}')], draft, False, "abc") == 2
+    assert reader.get(draft, "EL3", False, "abc") == b'{"data":[]}'
+    assert reader.get(draft, "EL 3", True, "abc") is None
+
+    # Responses already in the store are not appended again, new ones bump the generation
+    assert writer.add(b'{"data":[]}', draft, "EL 3", False, "abc") == 0
+    assert writer.add(b'{"data":[2]}', draft, "EL 3", True, "abc") == 1
+    assert reader.get(draft, "EL 3", True, "abc") == b'{"data":[2]}'
+    assert reader._files["abc"].generation == 2
+    assert reader.stats.hits == 2 and reader.stats.misses == 2
+
+
+def test_responses_written_by_another_process_are_seen(tmp_path):
+    draft = str(tmp_path / "Draft_1.xlsx")
+    store = SharedResponseStore(1 << 20, 4)
+    store.add(b"first", draft, "EL 3", False, "abc")
+
+    script = (
+        "import sys; from api.cache.shared import SharedResponseStore; "
+        "SharedResponseStore(1 << 20, 4).add(b'second', sys.argv[1], 'CE 2', False, 'abc')"
+    )
+    subprocess.run([sys.executable, "-c", script, draft], cwd=PROJECT_ROOT, env=os.environ.copy(), check=True)
+
+    assert store.get(draft, "CE 2", False, "abc") == b"second"
+    assert store.get(draft, "EL 3", False, "abc") == b"first"
+
+
+def test_full_store_skips_responses(tmp_path):
+    draft = str(tmp_path / "Draft_1.xlsx")
+    store = SharedResponseStore(64, 4)
+
+    assert store.add(b"x" * 100, draft, "EL 3", False, "abc") == 0
+    assert store.get(draft, "EL 3", False, "abc") is None
+
+
+def test_full_disk_fails_the_append_without_publishing_it(tmp_path, monkeypatch):
+    draft = str(tmp_path / "Draft_1.xlsx")
+    store = SharedResponseStore(1 << 20, 4)
+    store.add(b"first", draft, "EL 3", False, "abc")
+
+    def no_space(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(shared.os, "pwrite", no_space)
+
+    assert store.add_many([("CE 2", b"second"), ("ME 1", b"third")], draft, False, "abc") == 0
+    assert store.stats.errors == 1
+    assert store.get(draft, "CE 2", False, "abc") is None
+    assert store.get(draft, "EL 3", False, "abc") == b"first"
+    assert store._files["abc"].generation == 1
+
+
+def test_prune_deletes_the_stores_of_replaced_versions(tmp_path):
+    draft = str(tmp_path / "Draft_1.xlsx")
+    store = SharedResponseStore(1 << 20, 4)
+    store.add(b"old", draft, "EL 3", False, "old")
+    store.add(b"new", draft, "EL 3", False, "new")
+
+    removed = store.prune(tmp_path, {"new"})
+
+    assert removed == [store_path(draft, "old")]
+    assert store.get(draft, "EL 3", False, "old") is None
+    assert store.get(draft, "EL 3", False, "new") == b"new"
+
+
+def test_build_lock_is_held_by_one_worker_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared.settings, "SHARED_STORE_BUILD_WAIT_SECONDS", 0.1)
+    draft = str(tmp_path / "Draft_1.xlsx")
+
+    async def run():
+        async with build_lock(draft, "abc") as first:
+            async with build_lock(draft, "abc") as second:
+                pass
+        async with build_lock(draft, "abc") as third:
+            pass
+        return first, second, third
+
+    assert asyncio.run(run()) == (True, False, True)
+
+
+def _counted_parse(monkeypatch, seconds: float = 0.0) -> dict:
+    """Parse in the event loop's thread, counting the parses and how many ran at once."""
+    parses = {"count": 0, "running": 0, "most_at_once": 0}
+
+    async def run_parse(func, *args):
+        parses["count"] += 1
+        parses["running"] += 1
+        parses["most_at_once"] = max(parses["most_at_once"], parses["running"])
+        try:
+            await asyncio.sleep(seconds)
+            return func(*args)
+        finally:
+            parses["running"] -= 1
+
+    monkeypatch.setattr(timetable, "run_parse", run_parse)
+    return parses
+
+
+def test_workers_map_the_snapshot_of_a_draft_with_numeric_cells(tmp_path, monkeypatch):
+    # Draft_2 has a column of room capacities
+    draft = tmp_path / "Draft_2.xlsx"
+    shutil.copy(DRAFTS_FOLDER / "Draft_2.xlsx", draft)
+    parses = _counted_parse(monkeypatch)
+
+    asyncio.run(timetable._parse_workbook(str(draft), "abc"))
+    index = asyncio.run(timetable._parse_workbook(str(draft), "abc"))
+
+    assert parses["count"] == 1
+    assert snapshot_path(str(draft), "abc").exists()
+    assert not snapshot_skipped(str(draft), "abc")
+    assert isinstance(index.cells, snapshot.SnapshotCells)
+
+
+def test_workers_parse_at_once_a_draft_that_has_no_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared.settings, "SHARED_STORE_BUILD_WAIT_SECONDS", 5.0)
+    draft = str(tmp_path / "Draft_2.xlsx")
+    shutil.copy(DRAFTS_FOLDER / "Draft_2.xlsx", draft)
+    parsed = WorkbookIndex.from_file(draft, "abc")
+    monkeypatch.setattr(WorkbookIndex, "from_file", lambda filename, content_hash: parsed)
+    monkeypatch.setattr(snapshot, "write_snapshot", lambda index, path: False)
+    parses = _counted_parse(monkeypatch, 0.2)
+
+    async def parse_at_once(workers: int):
+        return await asyncio.gather(*(timetable._parse_workbook(draft, "abc") for _ in range(workers)))
+
+    async def run():
+        # The first parse holds the lock, the waiters find it wrote no snapshot and parse together
+        await parse_at_once(3)
+        first = dict(parses)
+        # Once the snapshot is known to be skipped, nobody waits for the lock of a worker still building
+        async with build_lock(draft, "abc"):
+            await asyncio.wait_for(parse_at_once(2), 2.0)
+        return first
+
+    first = asyncio.run(run())
+
+    assert first["count"] == 3 and first["most_at_once"] == 2
+    assert parses["count"] == 5 and parses["most_at_once"] == 2
+    assert snapshot_skipped(draft, "abc")
+
+
+def test_timetable_is_served_from_the_shared_store(tmp_path, mocker):
+    shutil.copy(DRAFTS_FOLDER / "Draft_1.xlsx", tmp_path / "Draft_1.xlsx")
+    mocker.patch.object(timetable, "DRAFTS_FOLDER", tmp_path)
+    mocker.patch.object(timetable, "shared_store", SharedResponseStore(1 << 20, 4))
+    get = mocker.patch.object(PostgresCacheBackend, "get", return_value=None)
+    mocker.patch.object(PostgresCacheBackend, "add")
+    app = FastAPI()
+    app.include_router(timetable_router)
+    client = TestClient(app)
+    response_cache.clear()
+
+    first = client.get("/get_time_table", params={"filename": "Draft_1", "class_pattern": "EL 3"})
+    lookups = get.await_count
+    response_cache.clear()
+    second = client.get("/get_time_table", params={"filename": "Draft_1", "class_pattern": "EL 3"})
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert get.await_count == lookups
+    assert timetable.shared_store.stats.hits == 1
+    response_cache.clear()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from api.cache.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_build():
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "table"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("EL3", build) for _ in range(50)))
+        assert not flight.in_flight("EL3")
+        return results
+
+    assert asyncio.run(main()) == ["table"] * 50
+    assert len(calls) == 1
+
+def test_different_keys_build_separately():
+    calls = []
+
+    async def build(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("EL3", lambda: build("EL3")),
+            flight.do("CE4", lambda: build("CE4")),
+        )
+
+    assert asyncio.run(main()) == ["EL3", "CE4"]
+    assert sorted(calls) == ["CE4", "EL3"]
+
+def test_waiters_share_the_exception():
+    async def build():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad draft")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("EL3", build) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_cancelled_caller_does_not_cancel_the_build():
+    async def build():
+        await asyncio.sleep(0.02)
+        return "table"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("EL3", build))
+        second = asyncio.ensure_future(flight.do("EL3", build))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "table"
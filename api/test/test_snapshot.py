@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from api.extract.snapshot import (
+    SnapshotCells,
+    load_workbook_index,
+    prune_snapshots,
+    read_snapshot,
+    snapshot_path,
+    write_snapshot,
+)
+from api.extract.workbook_index import WorkbookIndex
+
+DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1.xlsx")
+NUMERIC_DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_2.xlsx")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return WorkbookIndex.from_file(DRAFT, "test")
+
+
+def test_snapshot_round_trip(tmp_path, index):
+    path = tmp_path / "test.wbi"
+
+    assert write_snapshot(index, path)
+    loaded = read_snapshot(path, "test")
+
+    assert isinstance(loaded.cells, SnapshotCells)
+    assert list(loaded.cells) == index.cells
+    assert loaded.class_tokens() == index.class_tokens()
+    for class_pattern in ["EL 3", "CE 4", "el 3", "XX 9"]:
+        assert loaded.time_table(class_pattern).equals(index.time_table(class_pattern))
+
+
+def test_snapshot_round_trip_keeps_numeric_cells(tmp_path):
+    # Draft_2 has a column of room capacities
+    index = WorkbookIndex.from_file(NUMERIC_DRAFT, "test")
+    numbers = [cell for cell in index.cells if not isinstance(cell[3], str)]
+    assert numbers
+    path = tmp_path / "test.wbi"
+
+    assert write_snapshot(index, path)
+    loaded = read_snapshot(path, "test")
+
+    assert list(loaded.cells) == index.cells
+    assert [type(cell[3]) for cell in loaded.cells] == [type(cell[3]) for cell in index.cells]
+    assert loaded.class_tokens() == index.class_tokens()
+    for class_pattern in index.class_tokens():
+        assert loaded.time_table(class_pattern).equals(index.time_table(class_pattern))
+
+
+def test_snapshot_tells_numbers_from_their_text(tmp_path, index):
+    cells = [(0, 0, 0, "160"), (0, 1, 0, 160), (0, 2, 0, 160.0), (0, 3, 0, 0.1)]
+    path = tmp_path / "test.wbi"
+
+    assert write_snapshot(WorkbookIndex("test", index.grids, cells), path)
+    loaded = list(read_snapshot(path, "test").cells)
+
+    assert loaded == cells
+    assert [type(cell[3]) for cell in loaded] == [str, int, float, float]
+
+
+def test_snapshot_of_other_version_is_ignored(tmp_path, index):
+    path = tmp_path / "test.wbi"
+    write_snapshot(index, path)
+
+    assert read_snapshot(path, "other") is None
+    assert read_snapshot(tmp_path / "missing.wbi", "test") is None
+
+
+def test_load_workbook_index_writes_then_maps_snapshot(tmp_path, mocker, index):
+    draft = tmp_path / "Draft_1.xlsx"
+    draft.write_bytes(Path(DRAFT).read_bytes())
+    parse = mocker.patch.object(WorkbookIndex, "from_file", return_value=index)
+
+    first = load_workbook_index(str(draft), "test")
+    second = load_workbook_index(str(draft), "test")
+
+    assert parse.call_count == 1
+    assert first is index
+    assert isinstance(second.cells, SnapshotCells)
+    assert snapshot_path(str(draft), "test").exists()
+    assert prune_snapshots(tmp_path, {"current"}) == [snapshot_path(str(draft), "test")]
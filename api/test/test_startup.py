@@ -0,0 +1,67 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from api import startup
+from api.cache.backends import PostgresCacheBackend
+from api.cache.registry import settings as registry_settings
+from api.warmup import settings as warmup_settings
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "icalendar", "regex", "psycopg2", "redis"]
+
+
+def test_importing_the_app_loads_no_parsing_library():
+    script = f"import sys, app; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=PROJECT_ROOT, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == ""
+
+
+def test_worker_is_alive_at_once_and_ready_after_startup(mocker, monkeypatch):
+    start = mocker.patch.object(PostgresCacheBackend, "start")
+    mocker.patch.object(PostgresCacheBackend, "close")
+    monkeypatch.setattr(registry_settings, "DRAFTS_WATCH", False)
+    monkeypatch.setattr(warmup_settings, "WARMUP_ENABLED", False)
+    monkeypatch.setitem(startup.worker_status, "ready", False)
+
+    from app import app
+
+    with TestClient(app) as client:
+        assert client.get("/api/v1/health/live").json() == {"status": "alive"}
+
+        deadline = time.monotonic() + 30
+        ready = client.get("/api/v1/health/ready")
+        while ready.status_code == 503 and time.monotonic() < deadline:
+            assert ready.headers["Retry-After"] == "1"
+            time.sleep(0.05)
+            ready = client.get("/api/v1/health/ready")
+
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert ready.json()["preloaded"] is True
+    assert ready.json()["cache_backend_connected"] is True
+    start.assert_awaited_once()
+
+
+def test_readiness_reports_a_failed_cache_backend(mocker, monkeypatch):
+    mocker.patch.object(PostgresCacheBackend, "start", side_effect=OSError("connection refused"))
+    monkeypatch.setattr(registry_settings, "DRAFTS_WATCH", False)
+    monkeypatch.setattr(warmup_settings, "WARMUP_ENABLED", False)
+    monkeypatch.setattr(startup.settings, "STARTUP_PRELOAD", False)
+    monkeypatch.setattr(startup, "worker_status", dict(startup.worker_status, ready=False, preloaded=False))
+
+    asyncio.run(startup._start_worker())
+
+    assert startup.worker_status["ready"] is True
+    assert startup.worker_status["cache_backend_connected"] is False
+    assert startup.worker_status["preloaded"] is False
@@ -1,6 +1,10 @@
+import json
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
-from routes.timetable import router as timetable_router, TimeTableRequest
+from api.routes.timetable import router as timetable_router, TimeTableRequest, DRAFTS_FOLDER
+from api.cache.backends import PostgresCacheBackend
+from api.cache.shared import settings as shared_settings
+from api.extract.workbook_index import file_content_hash
 import pytest
 
 app = FastAPI()
@@ -8,29 +12,168 @@ app.include_router(timetable_router)
 
 client = TestClient(app)
 
+DRAFT_1_HASH = file_content_hash(str(DRAFTS_FOLDER / "Draft_1.xlsx"))
+
+@pytest.fixture(autouse=True)
+def disable_shared_store(monkeypatch):
+    monkeypatch.setattr(shared_settings, "SHARED_STORE_ENABLED", False)
+
 @pytest.fixture
 def mock_get_table_from_cache(mocker):
-    return mocker.patch("api.config.redis_config.get_table_from_cache")
+    return mocker.patch.object(PostgresCacheBackend, "get")
 
 @pytest.fixture
 def mock_add_table_to_cache(mocker):
-    return mocker.patch("api.config.redis_config.add_table_to_cache")
+    return mocker.patch.object(PostgresCacheBackend, "add")
 
-@pytest.fixture
-def mock_get_time_table(mocker):
-    return mocker.patch("extract.extract_table.get_time_table")
+def test_get_time_table_endpoint(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    request = TimeTableRequest(filename="Draft_1.xlsx", class_pattern="EL 3")
+    mock_get_table_from_cache.return_value = None
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump())
+
+    # Assert
+    assert response.status_code == 200
+    body = response.json()
+    assert [day["day"] for day in body["data"]] == ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    assert any(slot["value"] for day in body["data"] for slot in day["data"])
+    mock_get_table_from_cache.assert_called_once_with("Draft_1", "EL 3", False, DRAFT_1_HASH)
+    mock_add_table_to_cache.assert_called_once()
 
-def test_get_time_table_endpoint(mock_get_table_from_cache, mock_add_table_to_cache, mock_get_time_table):
+def test_get_time_table_endpoint_cache_hit(mock_get_table_from_cache, mock_add_table_to_cache):
     # Arrange
-    request = TimeTableRequest(filename="test.xlsx", class_pattern="class1")
+    request = TimeTableRequest(filename="Draft_1.xlsx", class_pattern="EL 3")
+    mock_get_table_from_cache.return_value = b'{"data":[{"day":"Monday","data":[{"start":"7:00","end":"9:00","value":"EL 372 (LH 1)"}]}],"version":"abc"}'
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump())
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == mock_get_table_from_cache.return_value
+    mock_add_table_to_cache.assert_not_called()
+
+def test_get_time_table_endpoint_parser_busy(mocker, mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    request = TimeTableRequest(filename="Draft_1_ex.xlsx", class_pattern="EL 3", is_exam=True)
     mock_get_table_from_cache.return_value = None
-    mock_get_time_table.return_value.to_json.return_value = '{"column1": "value1"}'
+    mocker.patch("api.executors.settings.PARSE_QUEUE_DEPTH", 0)
+    mocker.patch("api.extract.extract_exam_table.cached_exam_index", return_value=None)
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump())
+
+    # Assert
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    mock_add_table_to_cache.assert_not_called()
+
+def test_get_time_table_endpoint_memory_hit(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    request = TimeTableRequest(filename="Draft_1.xlsx", class_pattern="EL 3")
+    mock_get_table_from_cache.return_value = b'{"data":[],"version":"abc"}'
+    first = client.post("/get_time_table", json=request.model_dump())
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump())
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == first.json()
+    mock_get_table_from_cache.assert_called_once()
+
+
+def test_get_time_table_endpoint_sends_etag(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    mock_get_table_from_cache.return_value = b'{"data":[],"version":"abc"}'
 
     # Act
-    response = client.post("/get_time_table", json=request.dict())
+    response = client.get("/get_time_table", params={"filename": "Draft_1.xlsx", "class_pattern": "EL 3"})
 
     # Assert
     assert response.status_code == 200
-    assert response.json() == {"column1": "value1"}
-    mock_get_table_from_cache.assert_called_once_with("class1", "test.xlsx")
-    mock_add_table_to_cache.assert_called_once_with(table='{"column1": "value1"}', class_pattern="class1", filename="test.xlsx")
\ No newline at end of file
+    assert response.headers["ETag"] == f'"{DRAFT_1_HASH}-lecture-EL3"'
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+def test_get_time_table_endpoint_not_modified(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    request = TimeTableRequest(filename="Draft_1.xlsx", class_pattern="EL 3")
+    etag = f'"{DRAFT_1_HASH}-lecture-EL3"'
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump(), headers={"If-None-Match": f'"stale", W/{etag}'})
+
+    # Assert
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    mock_get_table_from_cache.assert_not_called()
+
+def test_get_time_table_endpoint_changed_version(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    request = TimeTableRequest(filename="Draft_1.xlsx", class_pattern="EL 3")
+    mock_get_table_from_cache.return_value = b'{"data":[],"version":"abc"}'
+
+    # Act
+    response = client.post("/get_time_table", json=request.model_dump(), headers={"If-None-Match": '"stale-lecture-EL3"'})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.content == b'{"data":[],"version":"abc"}'
+
+def test_get_time_tables_endpoint_streams_ndjson(mocker, mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    cached = b'{"data":[],"version":"abc"}'
+    mock_get_tables_from_cache = mocker.patch.object(PostgresCacheBackend, "get_many", return_value={("CE 4", False): cached})
+    mock_add_tables_to_cache = mocker.patch.object(PostgresCacheBackend, "add_many")
+    request = {
+        "filename": "Draft_1.xlsx",
+        "classes": [{"class_pattern": "CE 4"}, {"class_pattern": "EL 3"}, {"class_pattern": "EL 3"}, {"class_pattern": "EL  3"}],
+    }
+
+    # Act
+    response = client.post("/get_time_tables", json=request)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["class_pattern"] for line in lines] == ["CE 4", "EL 3"]
+    assert lines[0] == {"class_pattern": "CE 4", "is_exam": False, "status": 200, "data": [], "version": "abc"}
+    assert lines[1]["version"] == DRAFT_1_HASH and lines[1]["data"]
+    mock_get_tables_from_cache.assert_called_once_with("Draft_1", [("CE 4", False), ("EL 3", False)], DRAFT_1_HASH)
+    mock_get_table_from_cache.assert_not_called()
+    tables = mock_add_tables_to_cache.call_args_list[0].args[0]
+    assert [class_pattern for class_pattern, _ in tables] == ["EL 3"]
+
+def test_calendar_endpoint_recurs_weekly(mock_get_table_from_cache, mock_add_table_to_cache):
+    # Arrange
+    mock_get_table_from_cache.return_value = b'{"data":[{"day":"Monday","data":[{"start":"7:00","end":"9:00","value":"EL 372\\n(LH 1)"},{"start":"9:00","end":"10:00","value":""}]}],"version":"abc"}'
+    params = {"filename": "Draft_1.xlsx", "class_pattern": "EL 3", "start_date": "2025-01-08", "end_date": "2025-04-30"}
+
+    # Act
+    response = client.get("/calendar.ics", params=params)
+    cached = client.get("/calendar.ics", params=params)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    body = response.content.decode()
+    assert body.count("BEGIN:VEVENT") == 1
+    assert "SUMMARY:EL 372 (LH 1)" in body
+    assert "DTSTART:20250113T070000" in body
+    assert "DTEND:20250113T090000" in body
+    assert "RRULE:FREQ=WEEKLY;UNTIL=20250430T235959" in body
+    assert cached.content == response.content
+    mock_get_table_from_cache.assert_called_once()
+
+def test_calendar_endpoint_rejects_reversed_range(mock_get_table_from_cache):
+    params = {"filename": "Draft_1.xlsx", "class_pattern": "EL 3", "start_date": "2025-04-30", "end_date": "2025-01-08"}
+
+    response = client.get("/calendar.ics", params=params)
+
+    assert response.status_code == 422
+    mock_get_table_from_cache.assert_not_called()
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.extract.timetable_response import (
+    DAYS,
+    build_response,
+    lecture_response,
+    shape_lecture_frame,
+)
+from api.extract.workbook_index import WorkbookIndex
+
+DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1.xlsx")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return WorkbookIndex.from_file(DRAFT, "test")
+
+
+@pytest.mark.parametrize("class_pattern", ["EL 3", "CE 4", "MN 1", "XX 9"])
+def test_lecture_response_matches_records_shaping(index, class_pattern):
+    table = index.time_table(class_pattern)
+
+    assert lecture_response(table, "v") == build_response(table.to_json(orient="records"), False, "v")
+
+
+def test_merges_only_contiguous_equal_slots():
+    columns = ["7:00-8:00", "8:00-9:00", "10:00-11:00", "11:00-12:00", "12:00-1:00", "bad", "1:00-2:00"]
+    table = pd.DataFrame(np.nan, index=DAYS, columns=columns, dtype=object)
+    table.loc["Monday"] = ["A", "A", "A", "B", "B", "B", "B"]
+
+    monday = shape_lecture_frame(table)[0]
+
+    assert monday == {
+        "day": "Monday",
+        "data": [
+            {"start": "7:00", "end": "9:00", "value": "A"},
+            {"start": "10:00", "end": "11:00", "value": "A"},
+            {"start": "11:00", "end": "14:00", "value": "B"},
+        ],
+    }
+    assert lecture_response(table, "v") == build_response(table.to_json(orient="records"), False, "v")
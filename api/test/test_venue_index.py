@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.extract.venue_index import VenueIndex, find_lecturers, normalize_name
+from api.extract.workbook_index import WorkbookIndex, find_class_tokens
+from api.routes.venues import router as venues_router
+
+DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1.xlsx")
+
+app = FastAPI()
+app.include_router(venues_router)
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def index():
+    return WorkbookIndex.from_file(DRAFT, "test")
+
+
+@pytest.fixture(scope="module")
+def venues(index):
+    return VenueIndex(index)
+
+
+@pytest.mark.parametrize("text, lecturers", [
+    ("ES 274\nGYIMAH", ["GYIMAH"]),
+    ("GL 3B 358\nADOMAKO-ANSAH / AGYEKUM", ["ADOMAKO-ANSAH", "AGYEKUM"]),
+    ("GM 1A 174  QUAICOE", ["QUAICOE"]),
+    ("CY 1A 158 (P) APPIAH AGYARKO", ["APPIAH AGYARKO"]),
+    ("B     R      E      A      K", []),
+])
+def test_find_lecturers(text, lecturers):
+    assert find_lecturers(text) == lecturers
+
+
+def test_room_occupancy_matches_grid(index, venues):
+    expected = [
+        value
+        for grid_id, row, slot, value in index.cells
+        if str(index.grids[grid_id].rooms[row]).strip() == "LH 2" and find_class_tokens(value)
+    ]
+
+    bookings = venues.room_occupancy(" LH  2")
+
+    assert [booking["value"] for booking in bookings] == [normalize_name(value) for value in expected]
+    assert all(booking["room"] == "LH 2" for booking in bookings)
+
+
+def test_free_rooms_are_the_unbooked_rooms(venues):
+    booked = {b["room"] for b in venues.bookings if b["day"] == "Monday" and b["start"] == "7:00"}
+
+    free = venues.free_rooms("monday", "07:00")
+
+    assert free == sorted(set(venues.rooms) - booked)
+    assert venues.free_rooms("Sunday", "7:00") is None
+
+
+def test_utilization_counts_booked_slots(venues):
+    utilization = {row["room"]: row for row in venues.utilization()}
+
+    for room in ("LH 1", "CB 1", "VLE"):
+        booked = {(b["day"], b["start"]) for b in venues.room_occupancy(room)}
+        assert utilization[room]["booked_slots"] == len(booked)
+        assert utilization[room]["total_slots"] == len(venues.slots)
+
+
+def test_lecturer_occupancy_ignores_case(venues):
+    bookings = venues.lecturer_occupancy("quaicoe")
+
+    assert bookings
+    assert all("QUAICOE" in booking["lecturers"] for booking in bookings)
+    assert venues.lecturer_occupancy("Nobody") is None
+
+
+def test_rooms_endpoints():
+    free = client.get("/rooms/free", params={"filename": "Draft_1.xlsx", "day": "Monday", "start": "7:00"})
+    occupancy = client.get("/rooms/occupancy", params={"filename": "Draft_1", "room": "LH 1"})
+    missing = client.get("/rooms/occupancy", params={"filename": "Draft_1", "room": "Nowhere"})
+    exams = client.get("/rooms", params={"filename": "Draft_1_ex.xlsx"})
+
+    assert free.status_code == 200
+    assert "LH 1" not in free.json()["rooms"]
+    assert occupancy.status_code == 200
+    assert occupancy.json()["data"][0]["start"] == "7:00"
+    assert missing.status_code == 404
+    assert exams.status_code == 422
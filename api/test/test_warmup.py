@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import warmup
+from api.cache.backends import PostgresCacheBackend
+from api.cache.registry import draft_registry
+from api.cache.shared import SharedResponseStore, STORE_FOLDER
+from api.routes.timetable import DRAFTS_FOLDER
+
+
+@pytest.fixture
+def drafts(tmp_path, monkeypatch):
+    for name in ("Draft_1.xlsx", "Draft_1_ex.xlsx"):
+        shutil.copy(DRAFTS_FOLDER / name, tmp_path / name)
+    monkeypatch.setattr(warmup, "_published_hashes", {})
+    monkeypatch.setattr(warmup, "_previous_hashes", {})
+    monkeypatch.setattr(warmup, "warmup_status", {})
+    monkeypatch.setattr(warmup, "shared_store", SharedResponseStore(64 * 1024 * 1024, 4))
+    return tmp_path
+
+
+@pytest.fixture
+def add_many(mocker):
+    return mocker.patch.object(PostgresCacheBackend, "add_many")
+
+
+def test_list_classes_of_lecture_and_exam_drafts(drafts):
+    path = drafts / "Draft_1.xlsx"
+    is_exam, classes = warmup._list_classes(str(path), draft_registry.content_hash(path))
+    assert is_exam is False
+    assert "EL 3" in classes and len(classes) == len(set(classes))
+
+    path = drafts / "Draft_1_ex.xlsx"
+    is_exam, classes = warmup._list_classes(str(path), draft_registry.content_hash(path))
+    assert is_exam is True
+    assert "CE 2" in classes
+
+
+def test_warm_file_builds_every_class_in_chunks(drafts, add_many, monkeypatch):
+    monkeypatch.setattr(warmup.settings, "WARMUP_CHUNK_SIZE", 30)
+    path = drafts / "Draft_1.xlsx"
+    _, classes = warmup._list_classes(str(path), draft_registry.content_hash(path))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        status = asyncio.run(warmup.warm_file(path, executor))
+
+    # One bulk write per chunk, each for the whole chunk and with the warm-up expiry
+    assert add_many.await_count == -(-len(classes) // 30)
+    written = [table for call in add_many.await_args_list for table in call.args[0]]
+    assert sorted(class_pattern for class_pattern, _ in written) == sorted(classes)
+    assert {call.args[1:5] for call in add_many.await_args_list} == {("Draft_1", False, status["version"], warmup.settings.WARMUP_EXPIRE_SECONDS)}
+    assert all(json.loads(body)["version"] == status["version"] for _, body in written)
+
+    assert warmup.warmup_status["Draft_1.xlsx"] is status
+    assert status["classes"] == status["built"] == len(classes)
+    assert status["done"] is True and status["is_exam"] is False and status["carried_over"] == 0
+    assert warmup.shared_store.get(str(path), "EL 3", False, status["version"]) == dict(written)["EL 3"]
+
+
+def test_warm_drafts_publishes_new_and_changed_drafts_once(drafts, add_many, monkeypatch):
+    monkeypatch.setattr(warmup.settings, "WARMUP_WORKERS", 1)
+
+    reports = asyncio.run(warmup.warm_drafts(drafts))
+
+    assert [(report["filename"], report["is_exam"], report["done"]) for report in reports] == [
+        ("Draft_1.xlsx", False, True),
+        ("Draft_1_ex.xlsx", True, True),
+    ]
+    assert {call.args[2] for call in add_many.await_args_list} == {False, True}
+
+    # Unchanged drafts are not published again, unless forced
+    add_many.reset_mock()
+    assert asyncio.run(warmup.warm_drafts(drafts)) == []
+    add_many.assert_not_awaited()
+    assert len(asyncio.run(warmup.warm_drafts(drafts, force=True))) == 2
+
+
+def test_warm_drafts_prunes_only_when_the_drafts_change(drafts, add_many, mocker, monkeypatch):
+    monkeypatch.setattr(warmup.settings, "WARMUP_WORKERS", 1)
+    prune = mocker.patch.object(warmup, "prune_snapshots")
+
+    asyncio.run(warmup.warm_drafts(drafts))
+    asyncio.run(warmup.warm_drafts(drafts))
+    assert prune.call_count == 1
+
+    (drafts / "Draft_1_ex.xlsx").unlink()
+    asyncio.run(warmup.warm_drafts(drafts))
+    asyncio.run(warmup.warm_drafts(drafts))
+
+    assert prune.call_count == 2
+    assert prune.call_args.args == (drafts, {warmup._published_hashes["Draft_1.xlsx"]})
+    assert list(warmup._published_hashes) == ["Draft_1.xlsx"]
+
+
+def test_only_one_worker_watches_the_drafts(tmp_path, mocker, monkeypatch):
+    monkeypatch.setattr(warmup.settings, "WARMUP_POLL_SECONDS", 0.01)
+    warm_drafts = mocker.patch.object(warmup, "warm_drafts")
+
+    async def watch():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(warmup.watch_drafts(tmp_path), 0.2)
+
+    fd = warmup._take_watch_lock(tmp_path)
+    assert warmup._take_watch_lock(tmp_path) is None
+    asyncio.run(watch())
+    warm_drafts.assert_not_awaited()
+
+    # The lock survives the pruning of the shared stores, and another worker takes over once it is released
+    SharedResponseStore(1 << 20, 4).prune(tmp_path, set())
+    assert (tmp_path / STORE_FOLDER / warmup.WATCH_LOCK).exists()
+    os.close(fd)
+    asyncio.run(watch())
+    warm_drafts.assert_awaited_with(tmp_path)
+    fd = warmup._take_watch_lock(tmp_path)
+    assert fd is not None
+    os.close(fd)
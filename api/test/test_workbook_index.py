@@ -0,0 +1,98 @@
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+import regex as re
+
+from api.cache import registry
+from api.extract.extract_lectures_table import (
+    _build_class_pattern,
+    _get_daily_table,
+    _match_cells,
+    _merge_daily_tables,
+    _read_daily_frames,
+    compile_class_pattern,
+)
+from api.extract import workbook_index
+from api.extract.workbook_index import WorkbookIndex, get_workbook_index
+
+DRAFT = str(Path(__file__).parents[1] / "drafts" / "Draft_1.xlsx")
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return _read_daily_frames(DRAFT)
+
+
+@pytest.fixture(scope="module")
+def index(frames):
+    return WorkbookIndex.from_frames(frames, "test")
+
+
+@pytest.mark.parametrize("class_pattern", ["EL 3", "CE 4", "MN 1", "el 3", "GL 2", "XX 9"])
+def test_time_table_matches_sheet_scan(frames, index, class_pattern):
+    expected = _merge_daily_tables(
+        {sheet: _get_daily_table(df, class_pattern) for sheet, df in frames.items()}
+    )
+
+    actual = index.time_table(class_pattern)
+
+    assert actual.equals(expected)
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.to_json(orient="records") == expected.to_json(orient="records")
+
+
+def test_get_workbook_index_parses_once(mocker, monkeypatch, tmp_path):
+    # A copy of the draft has no snapshot yet, and an empty cache has no index of it
+    draft = shutil.copy(DRAFT, tmp_path / "Draft_1.xlsx")
+    monkeypatch.setattr(workbook_index, "_cache", OrderedDict())
+    spy = mocker.spy(WorkbookIndex, "from_file")
+    hashes = mocker.spy(registry, "file_content_hash")
+
+    first = get_workbook_index(str(draft))
+    second = get_workbook_index(str(draft))
+
+    assert first is second
+    assert spy.call_count == 1
+    # The draft is hashed once, then the lookups only stat it
+    assert hashes.call_count == 1
+
+
+@pytest.mark.parametrize("class_pattern", ["EL 3", "ce 4", "XX 9"])
+def test_cell_matches_equal_cell_by_cell_search(frames, class_pattern):
+    combined_pattern = _build_class_pattern(class_pattern)
+    for df in frames.values():
+        expected = df.map(lambda x: bool(re.search(combined_pattern, str(x), re.IGNORECASE)))
+
+        actual = _match_cells(df, compile_class_pattern(class_pattern))
+
+        assert (actual == expected.to_numpy(dtype=bool)).all()
+
+
+def test_class_pattern_is_compiled_once():
+    assert compile_class_pattern("EL 3") is compile_class_pattern("EL 3")
+
+
+# Guards the openpyxl internals the streamed reader relies on, so an openpyxl upgrade fails here
+@pytest.mark.parametrize("draft", ["Draft_1.xlsx", "Draft_2.xlsx"])
+def test_streamed_frames_match_full_workbook_load(draft):
+    path = str(Path(DRAFT).parent / draft)
+    frames = _read_daily_frames(path)
+    workbook = openpyxl.load_workbook(path)
+    assert list(frames) == workbook.sheetnames
+    for sheet in workbook.sheetnames:
+        for mc in workbook[sheet].merged_cells.ranges.copy():
+            if mc.max_col - mc.min_col == 1:
+                merged_value = workbook[sheet].cell(mc.min_row, mc.min_col).value
+                workbook[sheet].unmerge_cells(mc.coord)
+                workbook[sheet].cell(mc.min_row, mc.min_col).value = merged_value
+                workbook[sheet].cell(mc.max_row, mc.max_col).value = merged_value
+        data = workbook[sheet].values
+        header = next(data)
+        expected = pd.DataFrame(data, columns=header).dropna(axis=1, how="all")
+
+        assert frames[sheet].equals(expected)
+        assert list(frames[sheet].columns) == list(expected.columns)
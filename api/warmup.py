@@ -0,0 +1,253 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+from api.cache.registry import draft_registry
+from api.cache.backends import cache_backend
+from api.cache.shared import STORE_FOLDER, shared_store
+from api.extract.draft_diff import DraftDiff
+from api.extract.extract_exam_table import get_exam_classes, get_exam_index, is_exam_workbook
+from api.extract.timetable_response import build_response, lecture_response, with_version
+from api.extract.snapshot import prune_snapshots, read_snapshot, snapshot_path
+from api.extract.content_hash import file_content_hash
+from api.extract.workbook_index import cached_workbook_index, get_workbook_index
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DRAFTS_FOLDER = Path(__file__).parent / "drafts"
+
+# Held by the one worker of the host that watches the drafts folder, with a suffix the pruning leaves alone
+WATCH_LOCK = "warmup.watch"
+
+class WarmupSettings(BaseSettings):
+    WARMUP_ENABLED: bool = True
+    WARMUP_WORKERS: int = 2
+    WARMUP_CHUNK_SIZE: int = 20
+    WARMUP_POLL_SECONDS: float = 30.0
+    WARMUP_EXPIRE_SECONDS: int = 86400
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"  # Ignore extra fields in the environment
+
+settings = WarmupSettings()
+
+# content hash of every draft that has been published to the cache, by filename
+_published_hashes = {}
+
+# content hash of the version each draft replaced, kept so changes can be diffed against it
+_previous_hashes = {}
+
+# progress and timing of the latest warm-up of every draft, by filename
+warmup_status = {}
+
+def _list_classes(filename: str, content_hash: str) -> tuple:
+    """Get the timetable type and every class of a draft. Runs in a worker process."""
+    if is_exam_workbook(filename):
+        return True, get_exam_classes(filename)
+    return False, get_workbook_index(filename, content_hash).class_tokens()
+
+def _build_tables(filename: str, is_exam: bool, content_hash: str, class_patterns: list) -> list:
+    """Build the cached responses for a chunk of classes. Runs in a worker process."""
+    # the draft is read once per worker process and every class is a lookup
+    index = get_exam_index(filename, content_hash) if is_exam else get_workbook_index(filename, content_hash)
+    tables = []
+    for class_pattern in class_patterns:
+        try:
+            if is_exam:
+                body = build_response(index.lookup(class_pattern).to_json(orient="records"), True, content_hash)
+            else:
+                body = lecture_response(index.time_table(class_pattern), content_hash)
+        except Exception as e:
+            logger.error(f"Error building timetable for {class_pattern} in {filename}: {e}")
+            continue
+        tables.append((class_pattern, body))
+    return tables
+
+def _changed_classes(filename: str, content_hash: str, previous_hash: str, class_patterns: list) -> list | None:
+    """
+    Get the classes whose timetable changed since the previous version of a draft. Runs in a worker process.
+
+    Returns None if the previous version is neither in memory nor in a snapshot.
+    """
+    previous = cached_workbook_index(previous_hash) or read_snapshot(snapshot_path(filename, previous_hash), previous_hash)
+    if previous is None:
+        return None
+    return DraftDiff(previous, get_workbook_index(filename, content_hash)).changed_classes(class_patterns)
+
+async def _carry_over(base_filename: str, class_patterns: list, previous_hash: str, content_hash: str) -> set:
+    """
+    Copy the cached timetables of unchanged classes to the new version of a draft.
+
+    Returns the classes that were copied; the others were not cached and must be built.
+    """
+    cached = await cache_backend.get_many(base_filename, [(class_pattern, False) for class_pattern in class_patterns], previous_hash)
+    tables = []
+    for (class_pattern, _), body in cached.items():
+        body = with_version(body, previous_hash, content_hash)
+        if body is not None:
+            tables.append((class_pattern, body))
+    await cache_backend.add_many(tables, base_filename, False, content_hash, settings.WARMUP_EXPIRE_SECONDS)
+    return {class_pattern for class_pattern, _ in tables}
+
+async def warm_file(path: Path, executor: ProcessPoolExecutor, content_hash: str | None = None, previous_hash: str | None = None) -> dict:
+    """
+    Build every class timetable of a draft in the process pool and bulk load them into the cache.
+
+    When the draft replaced a version that is still available, only the classes whose
+    timetable changed are built and the cached timetables of the others are carried over.
+    """
+    started = time.perf_counter()
+    name = path.name
+    base_filename = path.stem
+    filename = str(path)
+    if content_hash is None:
+        content_hash = await asyncio.to_thread(file_content_hash, filename)
+
+    is_exam, classes = await asyncio.wrap_future(executor.submit(_list_classes, filename, content_hash))
+    listed = time.perf_counter()
+
+    status = {
+        "filename": name,
+        "version": content_hash,
+        "is_exam": is_exam,
+        "classes": len(classes),
+        "built": 0,
+        "carried_over": 0,
+        "done": False,
+        "list_seconds": round(listed - started, 3),
+    }
+    warmup_status[name] = status
+    logger.info(f"Warming {name} ({'exam' if is_exam else 'lecture'}): {len(classes)} classes")
+
+    to_build = classes
+    if previous_hash is not None and previous_hash != content_hash and not is_exam:
+        changed = await asyncio.wrap_future(executor.submit(_changed_classes, filename, content_hash, previous_hash, classes))
+        if changed is not None:
+            changed = set(changed)
+            carried = await _carry_over(base_filename, [c for c in classes if c not in changed], previous_hash, content_hash)
+            to_build = [c for c in classes if c not in carried]
+            status["previous_version"] = previous_hash
+            status["changed"] = len(changed)
+            status["carried_over"] = len(carried)
+            logger.info(f"Warming {name}: {len(changed)} classes changed, {len(carried)} carried over")
+
+    chunk_size = max(settings.WARMUP_CHUNK_SIZE, 1)
+    futures = [
+        asyncio.wrap_future(executor.submit(_build_tables, filename, is_exam, content_hash, to_build[i : i + chunk_size]))
+        for i in range(0, len(to_build), chunk_size)
+    ]
+    for future in asyncio.as_completed(futures):
+        tables = await future
+        await cache_backend.add_many(tables, base_filename, is_exam, content_hash, settings.WARMUP_EXPIRE_SECONDS)
+        await asyncio.to_thread(shared_store.add_many, tables, filename, is_exam, content_hash)
+        status["built"] += len(tables)
+        logger.info(f"Warming {name}: {status['built']}/{len(to_build)} classes built")
+
+    status["done"] = True
+    status["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Warmed {name}: {status['built']} classes built, {status['carried_over']} carried over in {status['seconds']}s")
+    return status
+
+async def warm_drafts(folder: Path = DRAFTS_FOLDER, force: bool = False) -> list:
+    """
+    Warm the cache for every draft that is new or whose content changed since it was last published.
+
+    Returns the warm-up report of every draft that was published.
+    """
+    drafts = sorted(folder.glob("*.xlsx"))
+    changed = []
+    current = set()
+    for path in drafts:
+        content_hash = await asyncio.to_thread(draft_registry.content_hash, path)
+        current.add(content_hash)
+        if force or _published_hashes.get(path.name) != content_hash:
+            changed.append((path, content_hash))
+
+    # Snapshots and shared stores of deleted drafts and of versions older than the one a draft replaced are never read again,
+    # and there are none to delete unless a draft was added, removed or changed
+    names = {path.name for path in drafts}
+    removed = [name for name in _published_hashes if name not in names]
+    if changed or removed:
+        for name in removed:
+            del _published_hashes[name]
+            _previous_hashes.pop(name, None)
+        kept = {content_hash for hashes in (_published_hashes, _previous_hashes) for content_hash in hashes.values()}
+        await asyncio.to_thread(prune_snapshots, folder, current | kept)
+        await asyncio.to_thread(shared_store.prune, folder, current | kept)
+
+    if not changed:
+        return []
+
+    reports = []
+    executor = ProcessPoolExecutor(max_workers=settings.WARMUP_WORKERS)
+    try:
+        for path, content_hash in changed:
+            previous_hash = _published_hashes.get(path.name)
+            try:
+                reports.append(await warm_file(path, executor, content_hash, None if force else previous_hash))
+            except Exception as e:
+                logger.error(f"Error warming {path.name}: {e}")
+                continue
+            if previous_hash is not None and previous_hash != content_hash:
+                _previous_hashes[path.name] = previous_hash
+            _published_hashes[path.name] = content_hash
+    finally:
+        await asyncio.to_thread(executor.shutdown)
+    return reports
+
+def _take_watch_lock(folder: Path) -> int | None:
+    """Take the host-wide lock of the drafts watcher without waiting. Returns its descriptor, or None if another worker holds it."""
+    path = Path(folder) / STORE_FOLDER / WATCH_LOCK
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+async def watch_drafts(folder: Path = DRAFTS_FOLDER):
+    """
+    Publish new and changed drafts to the cache in the background, polling the drafts folder.
+
+    Only the worker holding the watch lock of the host polls, so the drafts are parsed and
+    published once per host. The others try to take the lock at every poll and take over
+    when its holder exits.
+    """
+    fd = None
+    try:
+        while True:
+            try:
+                if fd is None:
+                    fd = await asyncio.to_thread(_take_watch_lock, folder)
+                if fd is not None:
+                    await warm_drafts(folder)
+            except Exception as e:
+                logger.error(f"Error warming drafts: {e}")
+            await asyncio.sleep(settings.WARMUP_POLL_SECONDS)
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+async def _warm_once() -> list:
+    await cache_backend.start()
+    try:
+        return await warm_drafts(force=True)
+    finally:
+        await cache_backend.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for report in asyncio.run(_warm_once()):
+        print(report)
@@ -1,8 +1,30 @@
-from fastapi import FastAPI, APIRouter
+from contextlib import asynccontextmanager
+
+import logging
+
+from fastapi import FastAPI, APIRouter, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes.timetable import router as timetable_router
+from fastapi.responses import JSONResponse
+from api.cache.memory import response_cache
+from api.cache.shared import shared_store
+from api.metrics import MetricsMiddleware, render_metrics, settings as metrics_settings
+from api.routes.clashes import router as clashes_router
+from api.routes.diff import router as diff_router
+from api.routes.profiler import router as profiler_router
+from api.routes.timetable import l2_stats, router as timetable_router
+from api.routes.venues import router as venues_router
+from api.startup import start_worker, stop_worker, worker_status
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve liveness probes right away, the worker reports ready once its startup finished in the background
+    start_worker()
+    yield
+    await stop_worker()
+
+app = FastAPI(lifespan=lifespan)
 
 app_router = APIRouter(prefix="/api/v1")
 
@@ -14,6 +36,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Without metrics or Server-Timing, requests skip the timing middleware entirely
+if metrics_settings.METRICS_ENABLED or metrics_settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 def root():
     return {"Hello": "World"}
@@ -23,5 +49,36 @@ def health_check():
     """A function to check the health of the server."""
     return {"status": "healthy"}
 
+@app.get("/api/v1/health/live")
+def liveness():
+    """Liveness probe: the worker is serving requests."""
+    return {"status": "alive"}
+
+@app.get("/api/v1/health/ready")
+def readiness():
+    """Readiness probe: the worker connected its cache backend and loaded the parsing libraries."""
+    if not worker_status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **worker_status}, headers={"Retry-After": "1"})
+    return {"status": "ready", **worker_status}
+
+@app.get("/metrics")
+def metrics():
+    """Stage and request latency histograms and cache counters, in the Prometheus text format."""
+    if not metrics_settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body = render_metrics([response_cache.stats, shared_store.stats, l2_stats])
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/v1/warmup")
+def warmup_report():
+    """Progress and timing of the latest cache warm-up of every draft."""
+    from api.warmup import warmup_status
+
+    return list(warmup_status.values())
+
 app.include_router(router=app_router)
-app.include_router(timetable_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(timetable_router, prefix="/api/v1")
+app.include_router(venues_router, prefix="/api/v1")
+app.include_router(clashes_router, prefix="/api/v1")
+app.include_router(diff_router, prefix="/api/v1")
+app.include_router(profiler_router, prefix="/api/v1")
@@ -0,0 +1,77 @@
+"""
+Time of finding a class in the day sheets of a workbook, before and after compiling the
+class expression once.
+
+The legacy path rebuilt the class expression for every call and searched it cell by cell
+through `DataFrame.map`. The current sheet scan compiles each expression once and searches
+every distinct cell text once, and the workbook index only searches the cells that share a
+department and year token with the class. Every result is checked against the legacy one.
+
+    python -m benchmarks.bench_class_match [draft] [repeat]
+"""
+import sys
+import time
+from pathlib import Path
+
+import regex as re
+
+from api.extract.extract_lectures_table import (
+    _build_class_pattern,
+    _get_daily_table,
+    _merge_daily_tables,
+    _read_daily_frames,
+)
+from api.extract.workbook_index import WorkbookIndex
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "api" / "drafts"
+
+
+def legacy_daily_table(df, class_pattern):
+    """`_get_daily_table` as it was, with a per-cell callback and an uncompiled expression."""
+    df = df.copy()
+    time_row = next(
+        row for row in df.iterrows()
+        if any(re.match(r"^\d{1,2}:\d{1,2}-\d{1,2}:\d{1,2}$", str(cell).strip()) for cell in row[1])
+    )
+    new_cols = time_row[1].to_list()
+    new_cols.pop(0)
+    new_cols.insert(0, "Classroom")
+    df.columns = new_cols
+    df.set_index("Classroom", inplace=True)
+    df = df.iloc[time_row[0] + 1 :]
+    combined_pattern = _build_class_pattern(class_pattern)
+    df = df.mask(~df.map(lambda x: bool(re.search(combined_pattern, str(x), re.IGNORECASE))))
+    return df.dropna(how="all")
+
+
+def seconds_per_class(func, classes: list, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for class_pattern in classes:
+            func(class_pattern)
+    return (time.perf_counter() - started) / (repeat * len(classes))
+
+
+def main(draft: str = "Draft_1", repeat: int = 1):
+    frames = _read_daily_frames(str(DRAFTS_FOLDER / f"{draft}.xlsx"))
+    index = WorkbookIndex.from_frames(frames, draft)
+    classes = index.class_tokens()
+
+    for class_pattern in classes:
+        for df in frames.values():
+            assert legacy_daily_table(df, class_pattern).equals(_get_daily_table(df, class_pattern))
+        legacy = _merge_daily_tables({sheet: legacy_daily_table(df, class_pattern) for sheet, df in frames.items()})
+        assert index.time_table(class_pattern).equals(legacy)
+
+    legacy = seconds_per_class(lambda c: [legacy_daily_table(df, c) for df in frames.values()], classes, repeat)
+    scan = seconds_per_class(lambda c: [_get_daily_table(df, c) for df in frames.values()], classes, repeat)
+    indexed = seconds_per_class(index.match, classes, repeat)
+
+    print(f"{draft}: {len(classes)} classes, {len(frames)} sheets, identical results")
+    print(f"legacy DataFrame.map scan: {legacy * 1e3:8.2f} ms/class")
+    print(f"compiled sheet scan:       {scan * 1e3:8.2f} ms/class ({legacy / scan:.1f}x)")
+    print(f"workbook index match:      {indexed * 1e3:8.2f} ms/class ({legacy / indexed:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -0,0 +1,72 @@
+"""
+Per-request CPU of a hot cache hit, before and after caching the serialized response.
+
+The legacy path is what every request did when the cache held the DataFrame records:
+decode them, convert and merge the time slots, and serialize the payload through
+FastAPI's JSONResponse. The current path looks the bytes up in the in-process cache
+and hands them to a raw Response.
+
+    python -m benchmarks.bench_response_cache [draft] [iterations]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from api.cache.memory import LRUCache
+from api.extract.timetable_response import build_response, shape_lecture_table
+from api.extract.workbook_index import WorkbookIndex, file_content_hash
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "api" / "drafts"
+
+
+def legacy_hit(records: str, content_hash: str) -> bytes:
+    table_data = shape_lecture_table(json.loads(records))
+    return JSONResponse(content={"data": table_data, "version": content_hash}).body
+
+
+def cached_hit(cache: LRUCache, key: tuple) -> bytes:
+    return Response(content=cache.get(key), media_type="application/json").body
+
+
+def cpu_per_call(func, iterations: int) -> float:
+    """Mean CPU time of a call, in microseconds."""
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main(draft: str = "Draft_1", iterations: int = 2000):
+    path = str(DRAFTS_FOLDER / f"{draft}.xlsx")
+    content_hash = file_content_hash(path)
+    index = WorkbookIndex.from_file(path, content_hash)
+    classes = index.class_tokens()
+
+    cache = LRUCache(max_bytes=256 * 1024 * 1024, ttl_seconds=3600)
+    records = {}
+    for class_pattern in classes:
+        records[class_pattern] = index.time_table(class_pattern).to_json(orient="records")
+        body = build_response(records[class_pattern], False, content_hash)
+        assert body == legacy_hit(records[class_pattern], content_hash)
+        cache.set((draft, content_hash, class_pattern, False), body, size=len(body))
+
+    per_class = max(iterations // len(classes), 1)
+    legacy = sum(
+        cpu_per_call(lambda: legacy_hit(records[c], content_hash), per_class) for c in classes
+    ) / len(classes)
+    cached = sum(
+        cpu_per_call(lambda: cached_hit(cache, (draft, content_hash, c, False)), per_class) for c in classes
+    ) / len(classes)
+
+    print(f"{draft}: {len(classes)} classes, {per_class} hits each")
+    print(f"legacy hit (decode, shape, serialize): {legacy:8.1f} us CPU/request")
+    print(f"cached response bytes:                 {cached:8.1f} us CPU/request")
+    print(f"saved per request:                     {legacy - cached:8.1f} us ({legacy / cached:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -0,0 +1,101 @@
+"""
+Serve every class of a draft from several worker processes at once, with and without the
+shared store of the host.
+
+Each worker starts without any parsed workbook, snapshot or cached response and asks for
+every class of the draft, starting at a different class so the workers overlap. The shared
+cache is a per-worker fake, so only the shared store can spare a worker a build. Reports
+how many times the host parsed the draft and built a response, the time until every
+worker was done and the peak memory of the workers.
+
+    python -m benchmarks.bench_shared_store [draft] [workers]
+"""
+import asyncio
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "api" / "drafts"
+
+
+def worker(drafts: str, draft: str, classes: list, shared: bool, offset: int, start_at: float) -> dict:
+    """Serve every class of a draft in this process, once `start_at` is reached."""
+    from api import executors
+    from api.cache import shared as shared_module
+    from api.routes import timetable
+    from benchmarks.bench_suite import offline_app
+
+    shared_module.settings.SHARED_STORE_ENABLED = shared
+    # Parse in this process, so its memory is counted
+    executors.parse_inline = True
+
+    counts = {"parses": 0, "builds": 0}
+    run_parse, lecture_response = timetable.run_parse, timetable._lecture_response
+
+    async def counted_parse(func, *args):
+        counts["parses"] += 1
+        return await run_parse(func, *args)
+
+    def counted_response(*args):
+        counts["builds"] += 1
+        return lecture_response(*args)
+
+    timetable.run_parse, timetable._lecture_response = counted_parse, counted_response
+
+    async def serve() -> float:
+        _, _, content_hash = await timetable.resolve_draft(draft)
+        started = time.perf_counter()
+        for class_pattern in classes[offset:] + classes[:offset]:
+            request = timetable.TimeTableRequest(filename=draft, class_pattern=class_pattern)
+            await timetable.get_json_table(request, content_hash)
+        return time.perf_counter() - started
+
+    with offline_app(Path(drafts), 0.0):
+        time.sleep(max(start_at - time.time(), 0))
+        seconds = asyncio.run(serve())
+
+    return {**counts, "seconds": seconds, "shared_hits": shared_module.shared_store.stats.hits, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run(drafts: Path, draft: str, classes: list, workers: int, shared: bool) -> list:
+    shutil.rmtree(drafts / ".snapshots", ignore_errors=True)
+    start_at = time.time() + 5
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        futures = [
+            pool.submit(worker, str(drafts), draft, classes, shared, i * len(classes) // workers, start_at)
+            for i in range(workers)
+        ]
+        return [future.result() for future in futures]
+
+
+def main(draft: str = "Draft_1", workers: int = 4):
+    from api.extract.workbook_index import WorkbookIndex
+
+    classes = WorkbookIndex.from_file(str(DRAFTS_FOLDER / f"{draft}.xlsx")).class_tokens()
+    print(f"{draft}: {len(classes)} classes, {workers} workers")
+
+    with tempfile.TemporaryDirectory() as folder:
+        drafts = Path(folder)
+        shutil.copy2(DRAFTS_FOLDER / f"{draft}.xlsx", drafts / f"{draft}.xlsx")
+
+        for label, shared in (("per worker", False), ("shared store", True)):
+            results = run(drafts, draft, classes, workers, shared)
+            print(
+                f"  {label:12}  parses {sum(r['parses'] for r in results):3}  builds {sum(r['builds'] for r in results):5}"
+                f"  shared hits {sum(r['shared_hits'] for r in results):5}"
+                f"  slowest worker {max(r['seconds'] for r in results):6.2f} s"
+                f"  peak memory per worker {statistics.fmean(r['max_rss_mb'] for r in results):6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    for name, value in (("DB_HOST", "localhost"), ("DB_PORT", "5432"), ("DB_NAME", "easechaos"), ("DB_USER", "postgres"), ("DB_PASSWORD", "password")):
+        os.environ.setdefault(name, value)
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -0,0 +1,92 @@
+"""
+Time from starting a worker process to its first healthcheck and to its readiness, before
+and after loading the parsing libraries lazily.
+
+Each run starts a fresh Python process that imports the app, runs its lifespan startup and
+polls the healthcheck and readiness endpoints through ASGI. The legacy startup is measured
+by importing every parsing library before the app, as the app itself used to. The shared
+cache backend is left unreachable and the warm-up is disabled, so nothing needs the network.
+
+    python -m benchmarks.bench_startup [runs]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parents[1]
+
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "icalendar", "regex", "psycopg2"]
+
+
+async def child(eager: bool):
+    """Start a worker in this process and print its timings, in seconds since the process started."""
+    import httpx
+
+    if eager:
+        from api.startup import PRELOAD_MODULES, preload_modules
+
+        preload_modules()
+        assert all(name in sys.modules for name in PRELOAD_MODULES)
+
+    from app import app
+
+    imported = time.time()
+    heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/api/v1/healthcheck")
+            assert response.status_code == 200
+            healthy = time.time()
+
+            while (await client.get("/api/v1/health/ready")).status_code != 200:
+                await asyncio.sleep(0.005)
+            ready = time.time()
+
+    print(json.dumps({"imported": imported, "healthy": healthy, "ready": ready, "heavy_loaded": heavy_loaded}))
+
+
+def run(eager: bool) -> dict:
+    env = dict(
+        os.environ,
+        DB_HOST="127.0.0.1",
+        DB_PORT="9",
+        DB_NAME="easechaos",
+        DB_USER="postgres",
+        DB_PASSWORD="password",
+        DRAFTS_WATCH="false",
+        WARMUP_ENABLED="false",
+        METRICS_ENABLED="true",
+    )
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"] + (["--eager"] if eager else [])
+    started = time.time()
+    result = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "import_seconds": timings["imported"] - started,
+        "healthy_seconds": timings["healthy"] - started,
+        "ready_seconds": timings["ready"] - started,
+        "heavy_loaded": timings["heavy_loaded"],
+    }
+
+
+def main(runs: int = 5):
+    for label, eager in (("legacy (eager imports)", True), ("lazy imports", False)):
+        results = [run(eager) for _ in range(runs)]
+        print(f"{label}: {runs} runs, parsing libraries loaded at import: {', '.join(results[0]['heavy_loaded']) or 'none'}")
+        for key in ("import_seconds", "healthy_seconds", "ready_seconds"):
+            values = [result[key] * 1e3 for result in results]
+            print(f"  {key.removesuffix('_seconds'):8} median {statistics.median(values):7.1f} ms   min {min(values):7.1f} ms")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        asyncio.run(child("--eager" in sys.argv))
+    else:
+        main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,357 @@
+"""
+The offline benchmark suite of the timetable API, with results written as JSON so runs
+on different commits can be compared.
+
+Micro-benchmarks time the extract functions and the endpoint transform on the bundled
+drafts. The load generator then drives the whole app in-process through its ASGI
+interface, with many concurrent clients, in four cache states:
+
+- cold: no cached response, no parsed workbook, no snapshot and no known file hash
+- warm-shared: every response in the shared store of the host, none in the in-process one
+- warm-l2: every response in the shared cache only
+- warm-l1: every response in the in-process cache
+
+The shared cache is a Redis backend over an in-memory fake client, which also holds the
+build locks with the same round trips as Redis, so nothing needs the network. The drafts are copied to a temporary folder, so
+the snapshots and shared stores written by cold requests never touch `api/drafts`.
+
+    python -m benchmarks.bench_suite [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# The settings classes require the connection variables to be present at import time
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+os.environ.setdefault("DB_NAME", "easechaos")
+os.environ.setdefault("DB_USER", "postgres")
+os.environ.setdefault("DB_PASSWORD", "password")
+
+from api.cache.backends import RedisCacheBackend, settings as backend_settings  # noqa: E402
+from api.cache.memory import response_cache  # noqa: E402
+from api.cache.registry import draft_registry  # noqa: E402
+from api.cache.shared import shared_store  # noqa: E402
+from api.executors import shutdown_executors  # noqa: E402
+from api.extract import extract_exam_table, workbook_index  # noqa: E402
+from api.extract.extract_exam_table import ExamIndex, get_exam_classes, get_exam_timetable  # noqa: E402
+from api.extract.extract_lectures_table import _get_daily_table, _read_daily_frames, get_time_table  # noqa: E402
+from api.extract.snapshot import SNAPSHOT_FOLDER  # noqa: E402
+from api.extract.timetable_response import build_response, lecture_response  # noqa: E402
+from api.extract.workbook_index import WorkbookIndex, file_content_hash  # noqa: E402
+from api.routes import timetable  # noqa: E402
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "api" / "drafts"
+
+
+class FakePipeline:
+    def __init__(self, client: "FakeRedis"):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        await self.client.round_trip()
+        self.client.store.update(self.commands)
+
+
+class FakeRedis:
+    """The part of the redis.asyncio client the cache backend uses, over a dict and with a simulated round trip."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.store = {}
+
+    async def round_trip(self):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+    async def get(self, key):
+        await self.round_trip()
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        await self.round_trip()
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, px=None):
+        await self.round_trip()
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        # Only the lock release script is run
+        await self.round_trip()
+        if self.store.get(key) != token:
+            return 0
+        del self.store[key]
+        return 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@contextmanager
+def offline_app(drafts: Path, l2_latency_seconds: float):
+    """Serve the drafts of a folder with a fake shared cache holding the build locks, restoring the routes afterwards."""
+    backend = RedisCacheBackend(backend_settings.CACHE_COMPRESSION_LEVEL)
+    backend._client = FakeRedis(l2_latency_seconds)
+    backend._errors = (zlib.error,)
+
+    saved = timetable.cache_backend, timetable.DRAFTS_FOLDER
+    timetable.cache_backend, timetable.DRAFTS_FOLDER = backend, drafts
+    try:
+        yield backend
+    finally:
+        timetable.cache_backend, timetable.DRAFTS_FOLDER = saved
+
+
+def forget_parses(drafts: Path):
+    """Drop every parsed workbook, its snapshot and shared store, and the known hash of every draft."""
+    with workbook_index._cache_lock:
+        workbook_index._cache.clear()
+    with extract_exam_table._cache_lock:
+        extract_exam_table._cache.clear()
+    shared_store.prune(drafts, set())
+    shutil.rmtree(drafts / SNAPSHOT_FOLDER, ignore_errors=True)
+    draft_registry.clear()
+
+
+def summarize(seconds: list, wall_seconds: float | None = None) -> dict:
+    """Latency percentiles in milliseconds of a list of timings, and the throughput when a wall time is given."""
+    ordered = sorted(seconds)
+
+    def percentile(p: float) -> float:
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1e3
+
+    summary = {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1e3,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1e3,
+    }
+    if wall_seconds is not None:
+        summary["rps"] = len(ordered) / wall_seconds
+    return {key: round(value, 4) for key, value in summary.items()}
+
+
+def time_calls(func, args: list, repeat: int, before=None) -> list:
+    """Time `func(*a)` for every argument tuple, `repeat` times, calling `before()` untimed ahead of each call."""
+    timings = []
+    for _ in range(repeat):
+        for a in args:
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            func(*a)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def micro_benchmarks(drafts: Path, draft: str, exam_draft: str, repeat: int, cold_repeat: int) -> dict:
+    path = str(drafts / f"{draft}.xlsx")
+    exam_path = str(drafts / f"{exam_draft}.xlsx")
+    content_hash = file_content_hash(path)
+    exam_hash = file_content_hash(exam_path)
+
+    index = WorkbookIndex.from_file(path, content_hash)
+    classes = index.class_tokens()
+    exam_classes = get_exam_classes(exam_path)
+    frames = list(_read_daily_frames(path).values())
+
+    def cold():
+        forget_parses(drafts)
+
+    tables = {c: index.time_table(c) for c in classes}
+    exams = ExamIndex.from_file(exam_path, exam_hash)
+    exam_tables = {c: exams.lookup(c).to_json(orient="records") for c in exam_classes}
+
+    results = {
+        "_get_daily_table": time_calls(_get_daily_table, [(df, c) for df in frames for c in classes[:10]], repeat),
+        "get_time_table.cold": time_calls(get_time_table, [(path, classes[0])], cold_repeat, before=cold),
+        "get_time_table.warm": time_calls(get_time_table, [(path, c) for c in classes], repeat),
+        "get_exam_timetable.cold": time_calls(get_exam_timetable, [(exam_path, exam_classes[0])], cold_repeat, before=cold),
+        "get_exam_timetable.warm": time_calls(get_exam_timetable, [(exam_path, c) for c in exam_classes], repeat),
+        "transform.lecture": time_calls(lecture_response, [(tables[c], content_hash) for c in classes], repeat),
+        "transform.exam": time_calls(build_response, [(exam_tables[c], True, exam_hash) for c in exam_classes], repeat),
+    }
+    forget_parses(drafts)
+    return {name: summarize(timings) for name, timings in results.items()}
+
+
+async def run_load(client: httpx.AsyncClient, urls: list, concurrency: int) -> tuple:
+    """Request every URL once from `concurrency` concurrent clients, returning the latencies and the wall time."""
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    timings = []
+
+    async def worker():
+        while not queue.empty():
+            url = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(url)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}: {response.text[:200]}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, time.perf_counter() - started
+
+
+async def load_benchmarks(drafts: Path, draft: str, exam_draft: str, rounds: int, concurrency: int, l2_latency_seconds: float) -> dict:
+    from app import app
+
+    classes = WorkbookIndex.from_file(str(drafts / f"{draft}.xlsx")).class_tokens()
+    exam_classes = get_exam_classes(str(drafts / f"{exam_draft}.xlsx"))
+    urls = [
+        *(httpx.URL("/api/v1/get_time_table", params={"filename": draft, "class_pattern": c}) for c in classes),
+        *(httpx.URL("/api/v1/get_time_table", params={"filename": exam_draft, "class_pattern": c, "is_exam": True}) for c in exam_classes),
+    ]
+
+    results = {}
+    with offline_app(drafts, l2_latency_seconds) as backend:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def measure(state: str, before):
+                timings, wall = [], 0.0
+                for _ in range(rounds):
+                    before()
+                    round_timings, round_wall = await run_load(client, urls, concurrency)
+                    timings += round_timings
+                    wall += round_wall
+                results[state] = summarize(timings, wall)
+
+            def cold():
+                response_cache.clear()
+                backend._client.store.clear()
+                forget_parses(drafts)
+
+            # The first parse also starts the process pool, which no later request pays for
+            cold()
+            await run_load(client, urls, concurrency)
+
+            await measure("cold", cold)
+            await measure("warm-shared", response_cache.clear)
+
+            def warm_l2():
+                response_cache.clear()
+                shared_store.prune(drafts, set())
+
+            await measure("warm-l2", warm_l2)
+            await measure("warm-l1", lambda: None)
+
+    forget_parses(drafts)
+    response_cache.clear()
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict):
+    """Print the p50 and p99 latency of every benchmark against a baseline run."""
+    print(f"\ncompared to {baseline.get('commit') or 'baseline'}:")
+    for group in ("micro", "load"):
+        for name, summary in results[group].items():
+            old = baseline.get(group, {}).get(name)
+            if old is None:
+                continue
+            changes = "  ".join(
+                f"{metric} {old[metric]:9.3f} -> {summary[metric]:9.3f} ({summary[metric] / old[metric] - 1:+6.1%})"
+                for metric in ("p50_ms", "p99_ms")
+                if old.get(metric)
+            )
+            print(f"{group}.{name:28} {changes}")
+
+
+def print_results(results: dict):
+    print(f"{'benchmark':36} {'count':>6} {'p50 ms':>10} {'p99 ms':>10} {'rps':>10}")
+    for group in ("micro", "load"):
+        for name, summary in results[group].items():
+            rps = f"{summary['rps']:10.1f}" if "rps" in summary else ""
+            print(f"{group + '.' + name:36} {summary['count']:6} {summary['p50_ms']:10.3f} {summary['p99_ms']:10.3f} {rps}")
+
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--draft", default="Draft_1", help="lecture draft to benchmark")
+    parser.add_argument("--exam-draft", default="Draft_1_ex", help="exam draft to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over every class of a warm micro-benchmark")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="calls of a cold micro-benchmark")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over every class per cache state")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients of the load generator")
+    parser.add_argument("--l2-latency-ms", type=float, default=0.0, help="simulated round trip of the shared cache")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        drafts = Path(folder)
+        for draft in {args.draft, args.exam_draft}:
+            shutil.copy2(DRAFTS_FOLDER / f"{draft}.xlsx", drafts / f"{draft}.xlsx")
+
+        results = {
+            "commit": git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "micro": {},
+            "load": {},
+        }
+        if not args.skip_micro:
+            results["micro"] = micro_benchmarks(drafts, args.draft, args.exam_draft, args.repeat, args.cold_repeat)
+        if not args.skip_load:
+            results["load"] = asyncio.run(load_benchmarks(
+                drafts, args.draft, args.exam_draft, args.rounds, args.concurrency, args.l2_latency_ms / 1e3
+            ))
+            shutdown_executors()
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
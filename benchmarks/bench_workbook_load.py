@@ -0,0 +1,74 @@
+"""
+Time and peak memory of reading the day sheets of a workbook, before and after
+streaming them in read-only mode.
+
+The legacy loader materialized the whole workbook with openpyxl so that it could unmerge
+the two-column merged cells in place. The current loader streams one sheet at a time from
+its XML and resolves the merges on a NumPy grid. The frames of both are checked equal.
+
+    python -m benchmarks.bench_workbook_load [draft]
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+from api.extract.extract_lectures_table import _iter_daily_frames
+from api.extract.workbook_index import WorkbookIndex
+
+DRAFTS_FOLDER = Path(__file__).parents[1] / "api" / "drafts"
+
+
+def legacy_daily_frames(filename: str) -> dict:
+    """`_read_daily_frames` as it was, on a fully loaded workbook."""
+    workbook = openpyxl.load_workbook(filename)
+    dfs = {}
+    for sheet in workbook.sheetnames:
+        merged_cells = workbook[sheet].merged_cells.ranges
+        for mc in merged_cells.copy():
+            if mc.max_col - mc.min_col == 1:
+                merged_value = workbook[sheet].cell(mc.min_row, mc.min_col).value
+                workbook[sheet].unmerge_cells(mc.coord)
+                workbook[sheet].cell(mc.min_row, mc.min_col).value = merged_value
+                workbook[sheet].cell(mc.max_row, mc.max_col).value = merged_value
+
+        data = workbook[sheet].values
+        header = next(data)
+        df = pd.DataFrame(data, columns=header)
+        dfs[sheet] = df.dropna(axis=1, how="all")
+
+    return dfs
+
+
+def measure(func) -> tuple:
+    """Wall time in seconds and peak traced memory in MiB of a call."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main(draft: str = "Draft_1"):
+    filename = str(DRAFTS_FOLDER / f"{draft}.xlsx")
+
+    legacy, legacy_seconds, legacy_peak = measure(lambda: legacy_daily_frames(filename))
+    streamed, streamed_seconds, streamed_peak = measure(lambda: dict(_iter_daily_frames(filename)))
+    _, index_seconds, index_peak = measure(lambda: WorkbookIndex.from_file(filename, draft))
+
+    assert list(legacy) == list(streamed)
+    assert all(legacy[sheet].equals(streamed[sheet]) for sheet in legacy)
+
+    print(f"{draft}: {len(streamed)} sheets, identical frames")
+    print(f"legacy full load:       {legacy_seconds:6.2f} s, peak {legacy_peak:7.1f} MiB")
+    print(f"streamed read-only:     {streamed_seconds:6.2f} s, peak {streamed_peak:7.1f} MiB")
+    print(f"workbook index (total): {index_seconds:6.2f} s, peak {index_peak:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])